@@ -1,5 +1,6 @@
 # C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/app/__init__.py
 
+import json
 import os
 from flask import Flask, g, session
 
@@ -11,7 +12,46 @@ def create_app(test_config=None):
     # Set default configuration
     app.config.from_mapping(
         SECRET_KEY='dev',  # Change this for production
-        DATABASE=os.path.join(app.instance_path, 'app.sqlite')
+        DATABASE=os.path.join(app.instance_path, 'app.sqlite'),
+        # SQLite connection tuning (see app/db.py). WAL lets readers keep
+        # working while a bulk import holds the write lock.
+        SQLITE_JOURNAL_MODE='WAL',
+        SQLITE_SYNCHRONOUS='NORMAL',
+        SQLITE_CACHE_SIZE=-16000,  # Negative values are in KiB (~16 MB)
+        SQLITE_MMAP_SIZE=256 * 1024 * 1024,
+        SQLITE_TEMP_STORE='MEMORY',
+        SQLITE_BUSY_TIMEOUT=5000,  # Milliseconds to wait for a lock
+        # Single-writer queue (see app/db_writer.py).
+        DB_WRITER_MAX_BATCH=64,  # Max queued writes committed together
+        DB_WRITER_BUSY_RETRIES=5,
+        DB_WRITER_RETRY_BACKOFF=0.05,  # Initial backoff in seconds, doubled per retry
+        DB_WRITER_TIMEOUT=None,  # Seconds a caller waits for its write; None waits indefinitely
+        # Rows per page on the /metrics tables, and the most a client may ask for.
+        METRICS_PAGE_SIZE=50,
+        METRICS_MAX_PAGE_SIZE=500,
+        METRIC_DETAILS_MAX_BATCH=500,  # Metrics per batched /metric-details request
+        SEARCH_SUGGESTIONS_LIMIT=20,  # Default and maximum results per /search-suggestions call
+        SEARCH_SUGGESTIONS_MAX_LIMIT=100,
+        FULL_TEXT_SEARCH_PAGE_SIZE=20,  # Results per /search page
+        HISTORY_COUNT_CAP=10000,  # The activity log shows "more than N" past this many matches
+        # Cached read-service results per worker (see app/utils/cache.py); 0 disables the cache.
+        CACHE_MAX_ENTRIES=512,
+        # Background jobs for uploads (see app/jobs.py). The jobs database and upload
+        # directory default to the main database's directory.
+        JOBS_DATABASE=None,
+        JOBS_DIR=None,
+        JOB_WORKERS=2,  # Job threads per worker process
+        JOB_POLL_INTERVAL=1.0,  # Seconds between checks for jobs queued by other processes
+        JOB_MAX_ATTEMPTS=3,  # Runs of a job interrupted by a worker restart before it is failed
+        # Coverage targets of the gap analysis (see plan_coverage_gaps in app/services/database.py).
+        # A policy selects metrics by 'metric_type' and 'priority' and lists the 'regions' and
+        # 'engines' they must be covered for; a missing or None key matches everything, e.g.
+        # {'priority': 'P1', 'regions': ['US', 'DE']}: P1 metrics on every supported engine in US and DE.
+        COVERAGE_POLICIES=[],
+        PLAN_GAPS_AFTER_IMPORT=True,  # Rerun the gap analysis after every coverage or metric import
+        SNAPSHOT_INTERVAL_HOURS=24,  # Hours between scheduled coverage snapshots (see app/jobs.py); None disables them
+        # Processes used by the probe/rotation extractions on files larger than one chunk; 1 runs them inline.
+        EXTRACTION_WORKERS=min(4, os.cpu_count() or 1),
     )
 
     if test_config is None:
@@ -27,7 +67,7 @@ def create_app(test_config=None):
         pass
 
     # Move imports inside the factory function to avoid circular dependencies.
-    from . import db
+    from . import db, db_writer, jobs
     from .db_migrations import run_migrations
     from .routes import auth, main, planning, user_management, management
     from . import commands
@@ -36,6 +76,8 @@ def create_app(test_config=None):
     # Initialize the database and run migrations within the app context
     with app.app_context():
         db.init_app(app)
+        db_writer.init_app(app)
+        jobs.init_app(app)
         run_migrations()
 
     # Register blueprints and commands
@@ -66,6 +108,7 @@ def create_app(test_config=None):
     # Register the filters with the Jinja environment
     app.jinja_env.filters['sort_details'] = sort_details_filter
     app.jinja_env.filters['strip_tcid_prefix'] = db_service._strip_tcid_prefix
+    app.jinja_env.filters['from_json'] = json.loads
 
     @app.before_request
     def load_logged_in_user():
@@ -1,6 +1,11 @@
 # C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/app/commands.py
 
+import os
+import re
+import shutil
+import tempfile
 import click
+from flask import current_app
 from .db_migrations import run_migrations # Import the new migration runner
 
 # The old init_db function is no longer needed, as run_migrations handles it.
@@ -18,6 +23,289 @@ def init_db_command():
         click.echo(f'An error occurred during migration: {e}', err=True)
 
 
+# --- Query plan checks ---
+
+# Tables that are expected to grow large; a plain full scan of any of them fails the check.
+HOT_TABLES = {'coverage_to_metric_link', 'planning', 'edit_history'}
+
+# Every read service exercised by `flask check-query-plans`. Each entry is called
+# inside a request context against a scratch database seeded by _seed_plan_check_db.
+QUERY_PLAN_CHECKS = [
+    ('get_planning_page_data', lambda db: db.get_planning_page_data()),
+    ('get_report_data', lambda db: db.get_report_data()),
+    ('get_general_stats', lambda db: db.get_general_stats()),
+    ('get_metric_page_counts', lambda db: db.get_metric_page_counts()),
+    ('get_coverage_page', lambda db: db.get_coverage_page()),
+    ('get_coverage_page (filtered)', lambda db: db.get_coverage_page(region='US', engine='google', search='sample')),
+    ('get_metric_definitions_page', lambda db: db.get_metric_definitions_page('glean', region='US')),
+    ('get_metric_breakdowns', lambda db: db.get_metric_breakdowns([('search.glean.sample', 'Glean')])),
+    ('get_search_suggestions', lambda db: db.get_search_suggestions()),
+    ('search_full_text', lambda db: db.search_full_text('sample', 'metric')),
+    ('get_metric_status_details', lambda db: db.get_metric_status_details('glean', 'search.glean.sample')),
+    ('get_history', lambda db: db.get_history()),
+    ('get_history (user)', lambda db: db.get_history(user_id=1)),
+    ('get_history (action)', lambda db: db.get_history(action='add_coverage')),
+    ('get_history (search)', lambda db: db.get_history(search_term='sample')),
+    ('get_history_count', lambda db: db.get_history_count()),
+    ('get_history_count (action)', lambda db: db.get_history_count(action='add_coverage')),
+    ('get_history_count (search)', lambda db: db.get_history_count(search_term='sample', cap=10000)),
+    ('get_history (cursor)', lambda db: db.get_history(cursor=db.encode_history_cursor('2024-01-01 00:00:00', 5))),
+    ('get_distinct_actions', lambda db: db.get_distinct_actions()),
+    ('get_metric_types', lambda db: db.get_metric_types()),
+    ('get_single_metric', lambda db: db.get_single_metric('glean', 'search.glean.sample')),
+    ('get_all_exceptions', lambda db: db.get_all_exceptions()),
+    ('get_all_users', lambda db: db.get_all_users()),
+    ('get_supported_engines', lambda db: db.get_supported_engines()),
+    ('get_supported_regions', lambda db: db.get_supported_regions()),
+    ('get_coverage_matrix_slice', lambda db: db.get_coverage_matrix_slice(priority='P1', regions=['US'])),
+    ('get_coverage_trend', lambda db: db.get_coverage_trend(90, 'Glean')),
+    ('get_metric_coverage_history', lambda db: db.get_metric_coverage_history('search.glean.sample', 'Glean')),
+    ('iter_export (coverage)', lambda db: list(db.iter_export('coverage', region='US'))),
+    ('iter_export (planning)', lambda db: list(db.iter_export('planning'))),
+]
+
+# Checks whose queries read a hot table in full by design (bulk exports); a scan of these tables is expected.
+FULL_PASS_TABLES = {
+    'iter_export (coverage)': {'coverage_to_metric_link'},
+    'iter_export (planning)': {'planning'},
+}
+
+_TABLE_ALIAS_REGEX = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+# "SCAN l" since SQLite 3.36, "SCAN TABLE coverage_to_metric_link AS l" before.
+_FULL_SCAN_REGEX = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+
+
+def _seed_plan_check_db(conn):
+    """Inserts one row into each table the read services touch."""
+    conn.executescript("""
+        INSERT INTO glean_metrics (glean_name, metric_type) VALUES ('search.glean.sample', 'counter');
+        INSERT INTO legacy_metrics (legacy_name, metric_type) VALUES ('search.telemetry.sample', 'scalar');
+        INSERT INTO coverage (tc_id, tcid_title) VALUES ('1', 'Sample');
+        INSERT INTO coverage_to_metric_link (coverage_id, metric_name, metric_type, region, engine)
+            VALUES (1, 'search.glean.sample', 'Glean', 'US', 'google');
+        INSERT INTO planning (metric_name, metric_type, region, engine) VALUES ('search.glean.sample', 'Glean', 'DE', 'bing');
+        INSERT INTO exceptions (tc_id) VALUES ('2');
+        INSERT INTO edit_history (user_id, action, table_name, record_pk, details)
+            VALUES (1, 'add_coverage', 'coverage', '1', 'sample');
+    """)
+    conn.commit()
+
+
+def _find_full_scans(sql, plan_rows):
+    """Returns the hot tables that the plan reads with a plain (index-less) full scan."""
+    aliases = {}
+    for table, alias in _TABLE_ALIAS_REGEX.findall(sql):
+        aliases[table] = table
+        if alias and alias.upper() not in ('WHERE', 'ON', 'JOIN', 'LEFT', 'INNER', 'GROUP', 'ORDER', 'LIMIT'):
+            aliases[alias] = table
+    scans = []
+    for row in plan_rows:
+        match = _FULL_SCAN_REGEX.match(row['detail'])
+        if match and aliases.get(match.group(1)) in HOT_TABLES:
+            scans.append(aliases[match.group(1)])
+    return scans
+
+
+def run_query_plan_check(conn, name, call):
+    """
+    Runs one QUERY_PLAN_CHECKS entry on `conn` (the request's connection, seeded
+    by _seed_plan_check_db) and explains every query it issued. Returns
+    (statement_count, failures), with one (sql, scanned_tables, plan_rows)
+    failure per query that fell back to a full scan of a hot table.
+    """
+    from .services import database as db_service
+
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        call(db_service)
+    finally:
+        conn.set_trace_callback(None)
+
+    failures = []
+    for sql in statements:
+        if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+            continue
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+        scans = [table for table in _find_full_scans(sql, plan) if table not in FULL_PASS_TABLES.get(name, ())]
+        if scans:
+            failures.append((sql, sorted(set(scans)), plan))
+    return len(statements), failures
+
+
+@click.command('check-query-plans')
+def check_query_plans_command():
+    """
+    Runs EXPLAIN QUERY PLAN on every query issued by the read services and
+    exits with an error if any of them falls back to a full scan of a hot table.
+    """
+    from . import create_app
+    from .db import get_db, close_thread_connections
+
+    scratch_dir = tempfile.mkdtemp()
+    try:
+        app = create_app({
+            'DATABASE': os.path.join(scratch_dir, 'plan_check.sqlite'),
+            'SECRET_KEY': 'plan-check',
+            'TESTING': True,
+            'CACHE_MAX_ENTRIES': 0,  # Every check must actually run its queries.
+        })
+        failures = 0
+        with app.test_request_context():
+            conn = get_db()
+            _seed_plan_check_db(conn)
+            for name, call in QUERY_PLAN_CHECKS:
+                statement_count, check_failures = run_query_plan_check(conn, name, call)
+                for sql, scans, plan in check_failures:
+                    click.echo(f"FAIL {name}: full scan of {', '.join(scans)}", err=True)
+                    click.echo(f"     {' '.join(sql.split())}", err=True)
+                    for row in plan:
+                        click.echo(f"       {row['detail']}", err=True)
+                if not check_failures:
+                    click.echo(f"ok   {name} ({statement_count} statements)")
+                failures += len(check_failures)
+        close_thread_connections()
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    if failures:
+        raise click.ClickException(f"{failures} quer{'y' if failures == 1 else 'ies'} fell back to a full scan.")
+    click.echo('All query plans use indexes.')
+
+
+# --- Extraction benchmark ---
+
+def _write_benchmark_export(path, rows):
+    """Writes a synthetic TestRail export with quoted, multi-line step fields."""
+    import csv
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['ID', 'Title', 'Steps', 'Expected Result'])
+        for i in range(rows):
+            writer.writerow([
+                f'C{i}',
+                f'Verify search.glean.impression_{i % 97} for US google',
+                f'1. Open the browser\n2. Search with bing in DE\n3. Check browser.telemetry.search_{i % 31}',
+                'The probe is recorded with the expected value, "engine" and region JP.',
+            ])
+
+
+@click.command('benchmark-extraction')
+@click.option('--rows', default=200000, show_default=True, help='Rows in the synthetic export.')
+@click.option('--workers', default='1,2,4', show_default=True, help='Comma-separated worker counts to time.')
+def benchmark_extraction_command(rows, workers):
+    """
+    Times probe extraction of a synthetic TestRail export at each worker
+    count (EXTRACTION_WORKERS) and reports throughput and speedup.
+    """
+    import time
+    from . import create_app
+    from .db import close_thread_connections
+    from .services import database as db_service
+
+    worker_counts = [int(count) for count in workers.split(',') if count.strip()]
+    scratch_dir = tempfile.mkdtemp()
+    try:
+        export_path = os.path.join(scratch_dir, 'export.csv')
+        _write_benchmark_export(export_path, rows)
+        click.echo(f"{rows} rows, {os.path.getsize(export_path) / 1e6:.1f} MB, {os.cpu_count()} CPUs")
+
+        app = create_app({
+            'DATABASE': os.path.join(scratch_dir, 'benchmark.sqlite'),
+            'SECRET_KEY': 'benchmark',
+            'TESTING': True,
+        })
+        baseline = None
+        with app.app_context():
+            for count in worker_counts:
+                app.config['EXTRACTION_WORKERS'] = count
+                start = time.perf_counter()
+                output_bytes = 0
+                with open(export_path, 'rb') as stream:
+                    for chunk in db_service.extract_probes_from_csv(stream):
+                        output_bytes += len(chunk)
+                elapsed = time.perf_counter() - start
+                baseline = baseline or elapsed
+                click.echo(f"workers={count:<3} {elapsed:7.2f}s  {rows / elapsed:10.0f} rows/s  "
+                           f"speedup x{baseline / elapsed:.2f}  ({output_bytes / 1e6:.1f} MB out)")
+            close_thread_connections()
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+
+# --- Bulk export ---
+
+@click.command('export-data')
+@click.argument('dataset')
+@click.option('--format', 'export_format', default='csv', show_default=True, help='csv or ndjson.')
+@click.option('--gzip', 'compress', is_flag=True, help='Compress the output with gzip.')
+@click.option('--output', '-o', type=click.Path(dir_okay=False), help='File to write; defaults to stdout.')
+@click.option('--metric-type', help='Only Glean or Legacy rows.')
+@click.option('--region', help='Only rows for this region.')
+@click.option('--engine', help='Only rows for this engine.')
+@click.option('--updated-since', help='Only rows changed at or after this ISO date/time (UTC); not for planning.')
+@click.option('--include-deleted', is_flag=True, help='Also export deleted rows.')
+def export_data_command(dataset, export_format, compress, output, **filters):
+    """
+    Streams DATASET (coverage, metrics, planning or exceptions) as CSV or
+    NDJSON, like the /export/<dataset> endpoint. Rows are written as they
+    are read, so memory use stays flat however large the dataset is.
+    """
+    from .services import database as db_service
+
+    try:
+        chunks = db_service.iter_export(dataset, export_format=export_format, compress=compress, **filters)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+    stream = open(output, 'wb') if output else click.get_binary_stream('stdout')
+    try:
+        for chunk in chunks:
+            stream.write(chunk if compress else chunk.encode('utf-8'))
+    finally:
+        if output:
+            stream.close()
+
+
+# --- Coverage gap planning ---
+
+@click.command('plan-gaps')
+def plan_gaps_command():
+    """
+    Compares the coverage with COVERAGE_POLICIES and adds a planning entry
+    for every required combination that is neither covered nor planned.
+    """
+    from .services import database as db_service
+
+    policies = current_app.config.get('COVERAGE_POLICIES')
+    if not policies:
+        raise click.ClickException('No coverage policies are configured (COVERAGE_POLICIES).')
+    try:
+        result = db_service.plan_coverage_gaps(policies, None)
+    except ValueError as e:
+        raise click.ClickException(f"Invalid coverage policy: {e}")
+    click.echo(f"{result['gaps']} missing combinations: {result['added']} newly planned, "
+               f"{result['already_planned']} already planned.")
+
+
+# --- Coverage snapshots ---
+
+@click.command('snapshot-coverage')
+def snapshot_coverage_command():
+    """Records a coverage snapshot now, like the scheduled ones (see SNAPSHOT_INTERVAL_HOURS)."""
+    from .services import database as db_service
+
+    result = db_service.take_coverage_snapshot('cli')
+    totals = ', '.join(f"{metric_type} {values['covered_count']}/{values['metric_count']} covered"
+                       for metric_type, values in result['totals'].items())
+    click.echo(f"Snapshot {result['snapshot_id']}: {result['changed']} metrics changed; {totals}.")
+
+
 def register_commands(app):
     """Register all CLI commands with the Flask app."""
-    app.cli.add_command(init_db_command)
\ No newline at end of file
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(check_query_plans_command)
+    app.cli.add_command(benchmark_extraction_command)
+    app.cli.add_command(export_data_command)
+    app.cli.add_command(plan_gaps_command)
+    app.cli.add_command(snapshot_coverage_command)
@@ -1,33 +1,121 @@
 # C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/app/db.py
 
+import os
 import sqlite3
+import threading
 from flask import current_app, g
 
+# Connections are kept per worker thread (and per database file) so that a
+# request reuses the connection its thread opened earlier instead of paying
+# the connect + PRAGMA cost on every page load.
+_local = threading.local()
+
+# Maps each tunable PRAGMA to the app config key that controls it.
+PRAGMA_CONFIG_KEYS = {
+    'journal_mode': 'SQLITE_JOURNAL_MODE',
+    'synchronous': 'SQLITE_SYNCHRONOUS',
+    'cache_size': 'SQLITE_CACHE_SIZE',
+    'mmap_size': 'SQLITE_MMAP_SIZE',
+    'temp_store': 'SQLITE_TEMP_STORE',
+    'busy_timeout': 'SQLITE_BUSY_TIMEOUT',
+}
+
+
+def _thread_connections():
+    """
+    Returns the {database path: connection} map for the current thread.
+    A connection inherited through fork() (e.g. gunicorn --preload) is never
+    reused; the child process starts with an empty map.
+    """
+    pid = os.getpid()
+    if getattr(_local, 'pid', None) != pid:
+        _local.pid = pid
+        _local.connections = {}
+    return _local.connections
+
+
+def connect(database, config, **kwargs):
+    """Opens a new connection to `database` and applies the configured PRAGMAs."""
+    busy_timeout_ms = int(config.get('SQLITE_BUSY_TIMEOUT') or 0)
+    conn = sqlite3.connect(
+        database,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        timeout=busy_timeout_ms / 1000,
+        **kwargs
+    )
+    conn.row_factory = sqlite3.Row
+
+    for pragma, config_key in PRAGMA_CONFIG_KEYS.items():
+        value = config.get(config_key)
+        if value is None:
+            continue
+        # PRAGMA values cannot be bound as parameters, so only plain
+        # integers and keywords (WAL, NORMAL, MEMORY, ...) are accepted.
+        if not isinstance(value, int) and not str(value).isalnum():
+            raise ValueError(f"Invalid value for {config_key}: {value!r}")
+        conn.execute(f"PRAGMA {pragma} = {value}")
+
+    return conn
+
+
+def get_thread_connection(database):
+    """Returns the current thread's pooled connection to `database`, opening it on first use."""
+    connections = _thread_connections()
+    conn = connections.get(database)
+    if conn is None:
+        conn = connect(database, current_app.config)
+        connections[database] = conn
+    return conn
+
+
 def get_db():
     """
     Connect to the application's configured database. The connection
-    is unique for each request and will be reused if this is called
-    again.
+    is owned by the current worker thread and will be reused by every
+    later request served on that thread.
     """
     if 'db' not in g:
-        g.db = sqlite3.connect(
-            current_app.config['DATABASE'],
-            detect_types=sqlite3.PARSE_DECLTYPES
-        )
-        g.db.row_factory = sqlite3.Row
+        g.db = get_thread_connection(current_app.config['DATABASE'])
 
     return g.db
 
 
+def reset_connection(conn):
+    """
+    Returns a pooled connection to a clean state: any transaction the
+    request left open is rolled back and the row factory is restored.
+    A connection that cannot be reset is closed and dropped from the pool.
+    """
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+        conn.row_factory = sqlite3.Row
+    except sqlite3.Error:
+        connections = _thread_connections()
+        for database, pooled in list(connections.items()):
+            if pooled is conn:
+                del connections[database]
+        conn.close()
+
+
 def close_db(e=None):
     """
-    If this request connected to the database, close the
-    connection.
+    If this request used the database, reset its connection so the next
+    request on this thread starts from a clean state. The connection
+    itself stays open for reuse.
     """
     db = g.pop('db', None)
 
     if db is not None:
-        db.close()
+        reset_connection(db)
+
+
+def close_thread_connections():
+    """Closes every connection owned by the current thread."""
+    connections = _thread_connections()
+    while connections:
+        _, conn = connections.popitem()
+        conn.close()
 
 
 def init_app(app):
@@ -35,4 +123,4 @@ def init_app(app):
     Register database functions with the Flask app. This is called by
     the application factory.
     """
-    app.teardown_appcontext(close_db)
\ No newline at end of file
+    app.teardown_appcontext(close_db)
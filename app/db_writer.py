@@ -0,0 +1,277 @@
+# C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/app/db_writer.py
+
+import functools
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from flask import current_app, g
+from .db import connect
+
+# Primary result codes for "another connection holds the lock".
+SQLITE_BUSY = 5
+SQLITE_LOCKED = 6
+
+
+def is_busy_error(error):
+    """Returns True if a sqlite3 error means the database was locked by someone else."""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xFF in (SQLITE_BUSY, SQLITE_LOCKED)
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+class WriterConnection(sqlite3.Connection):
+    """
+    Connection owned by the writer thread. Service functions keep calling
+    commit() and rollback() as they always have; while a job is running
+    those calls are scoped to the job's savepoint, and the real COMMIT is
+    issued once for the whole batch by the writer.
+
+    Statements passed to defer() (e.g. audit log inserts) are buffered and
+    run with one executemany() per statement when the job finishes, inside
+    the job's savepoint. A rollback discards them.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.job_savepoint = None
+        self._deferred = {}
+
+    def defer(self, sql, params):
+        """Buffers `sql` with `params` until the end of the current job."""
+        if self.job_savepoint is None:
+            self.execute(sql, params)
+        else:
+            self._deferred.setdefault(sql, []).append(params)
+
+    def flush_deferred(self):
+        """Runs the buffered statements, one executemany() per distinct statement."""
+        deferred, self._deferred = self._deferred, {}
+        for sql, rows in deferred.items():
+            self.executemany(sql, rows)
+
+    def discard_deferred(self):
+        self._deferred = {}
+
+    def commit(self):
+        if self.job_savepoint is None:
+            super().commit()
+
+    def rollback(self):
+        if self.job_savepoint is None:
+            super().rollback()
+        else:
+            self.discard_deferred()
+            self.execute(f"ROLLBACK TO {self.job_savepoint}")
+
+
+class _WriteJob:
+    __slots__ = ('fn', 'args', 'kwargs', 'future')
+
+    def __init__(self, fn, args, kwargs):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+
+
+class DatabaseWriter:
+    """
+    Serializes every write in this process through one dedicated connection.
+
+    Jobs are queued by request threads and executed in order on the writer
+    thread. Whatever is queued while a batch is running is picked up as the
+    next batch and committed with a single COMMIT (group commit). Each job
+    runs inside its own savepoint, so a failing job is rolled back on its
+    own and its exception is handed back to the caller. BEGIN and COMMIT are
+    retried with exponential backoff when another process holds the lock.
+
+    A job holds the writer until it returns. The CSV imports are one job
+    each (so a failed import writes nothing), which means other writes
+    queue behind a large import until it commits.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+
+    def in_writer_thread(self):
+        """Returns True when called from this process's writer thread."""
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, fn, *args, **kwargs):
+        """Queues `fn(*args, **kwargs)` for the writer thread and returns a Future."""
+        job = _WriteJob(fn, args, kwargs)
+        self._ensure_started().put(job)
+        return job.future
+
+    def run(self, fn, *args, **kwargs):
+        """Runs `fn` on the writer thread and returns its result (or raises its error)."""
+        future = self.submit(fn, *args, **kwargs)
+        return future.result(timeout=self.app.config.get('DB_WRITER_TIMEOUT'))
+
+    def _ensure_started(self):
+        pid = os.getpid()
+        with self._lock:
+            # A writer thread does not survive fork(); each worker process starts its own.
+            if self._pid != pid or self._thread is None or not self._thread.is_alive():
+                self._pid = pid
+                self._queue = queue.Queue()
+                self._thread = threading.Thread(
+                    target=self._run, args=(self._queue,), name='db-writer', daemon=True
+                )
+                self._thread.start()
+            return self._queue
+
+    def _run(self, job_queue):
+        config = self.app.config
+        with self.app.app_context():
+            try:
+                conn = connect(config['DATABASE'], config, factory=WriterConnection, isolation_level=None)
+            except sqlite3.Error as e:
+                self.app.logger.error(f"Database writer could not connect: {e}")
+                self._fail_pending(job_queue, e)
+                return
+            # Service functions call get_db(); on this thread that is the writer connection.
+            g.db = conn
+
+            max_batch = max(1, int(config.get('DB_WRITER_MAX_BATCH') or 1))
+            while True:
+                batch = [job_queue.get()]
+                while len(batch) < max_batch:
+                    try:
+                        batch.append(job_queue.get_nowait())
+                    except queue.Empty:
+                        break
+                try:
+                    self._process_batch(conn, batch)
+                except Exception as e:
+                    self.app.logger.error(f"Database writer failed to process a batch: {e}")
+                    self._abandon_transaction(conn)
+                    for job in batch:
+                        if not job.future.done():
+                            job.future.set_exception(e)
+
+    def _abandon_transaction(self, conn):
+        """
+        Rolls back whatever a failed batch left open (e.g. a ROLLBACK TO or
+        RELEASE that raised), so the next batch can BEGIN again instead of
+        every later write failing.
+        """
+        conn.job_savepoint = None
+        conn.discard_deferred()
+        if conn.in_transaction:
+            try:
+                conn.rollback()
+            except sqlite3.Error as e:
+                self.app.logger.error(f"Database writer could not roll back a failed batch: {e}")
+
+    def _fail_pending(self, job_queue, error):
+        while True:
+            try:
+                job = job_queue.get_nowait()
+            except queue.Empty:
+                return
+            if job.future.set_running_or_notify_cancel():
+                job.future.set_exception(error)
+
+    def _retry_busy(self, operation):
+        """Runs `operation`, retrying with jittered exponential backoff while the database is busy."""
+        retries = int(self.app.config.get('DB_WRITER_BUSY_RETRIES') or 0)
+        delay = float(self.app.config.get('DB_WRITER_RETRY_BACKOFF') or 0.05)
+        for attempt in range(retries + 1):
+            try:
+                return operation()
+            except sqlite3.OperationalError as e:
+                if attempt == retries or not is_busy_error(e):
+                    raise
+                time.sleep(delay + random.uniform(0, delay))
+                delay *= 2
+
+    def _process_batch(self, conn, batch):
+        jobs = [job for job in batch if job.future.set_running_or_notify_cancel()]
+        if not jobs:
+            return
+
+        try:
+            self._retry_busy(lambda: conn.execute("BEGIN IMMEDIATE"))
+        except sqlite3.Error as e:
+            for job in jobs:
+                job.future.set_exception(e)
+            return
+
+        changes_before = conn.total_changes
+        outcomes = []
+        for index, job in enumerate(jobs):
+            savepoint = f"write_job_{index}"
+            conn.execute(f"SAVEPOINT {savepoint}")
+            conn.job_savepoint = savepoint
+            try:
+                result = job.fn(*job.args, **job.kwargs)
+                conn.flush_deferred()
+                outcomes.append((True, result))
+            except Exception as e:
+                conn.discard_deferred()
+                conn.execute(f"ROLLBACK TO {savepoint}")
+                outcomes.append((False, e))
+            finally:
+                conn.job_savepoint = None
+                conn.execute(f"RELEASE {savepoint}")
+
+        if conn.total_changes != changes_before:
+            # Invalidates cached reads in every process (see app/utils/cache.py).
+            conn.execute("UPDATE data_version SET version = version + 1")
+
+        try:
+            self._retry_busy(conn.commit)
+        except sqlite3.Error as e:
+            conn.rollback()
+            for job in jobs:
+                job.future.set_exception(e)
+            return
+
+        for job, (succeeded, value) in zip(jobs, outcomes):
+            if succeeded:
+                job.future.set_result(value)
+            else:
+                job.future.set_exception(value)
+
+
+def get_writer():
+    """Returns the current app's database writer."""
+    return current_app.extensions['db_writer']
+
+
+def write_operation(fn):
+    """
+    Decorator for service functions that modify the database. The call is
+    executed on the writer thread and its return value (or exception) is
+    passed back to the caller. Calls made from the writer thread itself,
+    e.g. log_edit() inside another write, run inline.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        writer = get_writer()
+        if writer.in_writer_thread():
+            return fn(*args, **kwargs)
+        try:
+            return writer.run(fn, *args, **kwargs)
+        finally:
+            # Reads later in this request must see the version this write produced.
+            g.pop('data_version', None)
+    return wrapper
+
+
+def init_app(app):
+    """Attach a database writer to the app. This is called by the application factory."""
+    app.extensions['db_writer'] = DatabaseWriter(app)
@@ -0,0 +1,395 @@
+# C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/app/jobs.py
+
+import json
+import os
+import threading
+import time
+import uuid
+from flask import current_app
+from .db import connect, get_thread_connection
+
+JOB_STATUSES = ('queued', 'running', 'done', 'failed')
+
+# Jobs live in their own SQLite file (JOBS_DATABASE) rather than the main
+# database: progress updates are written while an import holds the writer
+# transaction, so they cannot go through the writer queue themselves.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued' CHECK(status IN ('queued', 'running', 'done', 'failed')),
+    user_id INTEGER,
+    filename TEXT, -- Name of the uploaded file, for display
+    options TEXT, -- JSON
+    rows_done INTEGER NOT NULL DEFAULT 0,
+    rows_total INTEGER, -- NULL while unknown
+    result TEXT, -- JSON summary returned by the job handler
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    owner_pid INTEGER, -- Process running the job
+    created_at TIMESTAMP DEFAULT (datetime('now')),
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs (user_id, created_at);
+"""
+
+
+# --- Job kinds ---
+
+def _plan_gaps_after_import(result, user_id):
+    """
+    Reruns the coverage gap analysis after an import when COVERAGE_POLICIES
+    are configured, adding its counts to the import's result.
+    """
+    policies = current_app.config.get('COVERAGE_POLICIES')
+    if not policies or not current_app.config.get('PLAN_GAPS_AFTER_IMPORT'):
+        return result
+    from .services import database as db_service
+    gaps = db_service.plan_coverage_gaps(policies, user_id)
+    result['summary'] += (f" Coverage policies: {gaps['gaps']} missing combinations, "
+                          f"{gaps['added']} newly planned.")
+    result['planned'] = gaps['added']
+    return result
+
+
+def _metric_import(metric_type):
+    def run(stream, out, user_id, options, progress):
+        from .services import database as db_service
+        if options.get('mode') == 'upsert':
+            report, added, updated, unchanged, errors = db_service.bulk_upsert_metrics_from_csv(
+                metric_type, stream, user_id, progress=progress)
+            out.write(report)
+            return _plan_gaps_after_import({
+                'summary': f"Import complete: {added} new metrics added, {updated} updated, "
+                           f"{unchanged} unchanged, and {errors} errors encountered.",
+                'added': added, 'updated': updated, 'unchanged': unchanged, 'errors': errors,
+            }, user_id)
+        report, successes, duplicates, errors, unchanged = db_service.bulk_import_metrics_from_csv(
+            metric_type, stream, user_id, progress=progress)
+        out.write(report)
+        return _plan_gaps_after_import({
+            'summary': f"Import complete: {successes} new metrics added, {duplicates} duplicates found, "
+                       f"{errors} errors encountered, and {unchanged} unchanged rows skipped.",
+            'added': successes, 'duplicates': duplicates, 'errors': errors, 'unchanged': unchanged,
+        }, user_id)
+    return run
+
+
+def _coverage_import(stream, out, user_id, options, progress):
+    from .services import database as db_service
+    report, successes, duplicates, errors, unchanged = db_service.bulk_import_coverage_from_csv(
+        stream, user_id, progress=progress)
+    out.write(report)
+    return _plan_gaps_after_import({
+        'summary': f"Import complete: {successes} new links created, {duplicates} duplicates found, "
+                   f"{errors} errors encountered, and {unchanged} unchanged rows skipped.",
+        'added': successes, 'duplicates': duplicates, 'errors': errors, 'unchanged': unchanged,
+    }, user_id)
+
+
+def _rotation_preview(stream, out, user_id, options, progress):
+    from .services import database as db_service
+    report, counts = db_service.preview_rotation_import(stream, progress=progress)
+    out.write(report)
+    return {
+        'summary': f"Dry run: {counts['new']} new links, {counts['present']} already present, "
+                   f"{counts['invalid']} with an invalid metric, {counts['excepted']} on excepted TCIDs "
+                   f"and {counts['errors']} rows with errors. Nothing has been imported yet.",
+        **counts,
+    }
+
+
+def _rotation_commit(stream, out, user_id, options, progress):
+    from .services import database as db_service
+    report, successes, duplicates, errors = db_service.commit_rotation_import(stream, user_id, progress=progress)
+    out.write(report)
+    return _plan_gaps_after_import({
+        'summary': f"Import complete: {successes} new links created, {duplicates} duplicates found, "
+                   f"and {errors} errors encountered.",
+        'added': successes, 'duplicates': duplicates, 'errors': errors,
+    }, user_id)
+
+
+def _extraction(extract):
+    def run(stream, out, user_id, options, progress):
+        from .services import database as db_service
+        rows_done = [0]
+
+        def track(done, total):
+            rows_done[0] = done
+            progress(done, total)
+
+        # The extraction is a generator; its chunks go straight to the report file.
+        for chunk in getattr(db_service, extract)(stream, progress=track):
+            out.write(chunk)
+        return {'summary': f"Extraction complete: {rows_done[0]} rows processed.", 'rows': rows_done[0]}
+    return run
+
+
+# kind -> (label, handler, download filename). A handler reads the uploaded file
+# from a binary stream, writes its report CSV to `out` and returns a result dict
+# with a 'summary'.
+JOB_KINDS = {
+    'import_glean': ('Glean metric import', _metric_import('glean'), 'import_report.csv'),
+    'import_legacy': ('Legacy metric import', _metric_import('legacy'), 'import_report.csv'),
+    'import_coverage': ('Coverage import', _coverage_import, 'import_report.csv'),
+    'extract_probes': ('Probe extraction', _extraction('extract_probes_from_csv'), 'extracted_probes.csv'),
+    'extract_rotation': ('Rotation extraction', _extraction('extract_from_rotation_csv'),
+                         'extracted_rotation_coverage.csv'),
+    # A preview's report is the input of the commit job queued from its page.
+    'preview_rotation': ('Rotation import (dry run)', _rotation_preview, 'rotation_import_diff.csv'),
+    'commit_rotation': ('Rotation import', _rotation_commit, 'import_report.csv'),
+}
+
+
+def _pid_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # Exists, but owned by someone else
+    return True
+
+
+class JobRunner:
+    """
+    Runs uploads (imports and extractions) outside the request that
+    submitted them.
+
+    A submitted file is saved under JOBS_DIR and a 'queued' row is added to
+    the jobs table; the request returns the job ID straight away. Each
+    process runs JOB_WORKERS threads that claim queued jobs with one atomic
+    UPDATE, so several gunicorn workers can share the queue without a
+    broker. Progress and the result summary are written back to the row and
+    the report is saved next to the upload for later download.
+
+    Idle workers also take the scheduled coverage snapshots
+    (SNAPSHOT_INTERVAL_HOURS).
+
+    A job left 'running' by a process that no longer exists (a worker killed
+    or restarted mid-job) is put back in the queue, up to JOB_MAX_ATTEMPTS
+    times. Imports run as a single transaction, so a rerun starts clean.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._lock = threading.Lock()
+        self._pid = None
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._next_snapshot_check = 0.0
+
+    # --- Paths and connections ---
+
+    @property
+    def jobs_dir(self):
+        return self.app.config['JOBS_DIR']
+
+    def upload_path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.upload")
+
+    def report_path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.report.csv")
+
+    def _connection(self):
+        return get_thread_connection(self.app.config['JOBS_DATABASE'])
+
+    def create_schema(self):
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        conn = connect(self.app.config['JOBS_DATABASE'], self.app.config)
+        try:
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    # --- Public API (request threads) ---
+
+    def submit(self, kind, file_storage, user_id, options=None):
+        """Saves the uploaded file, queues a job of `kind` for it and returns the job ID."""
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = uuid.uuid4().hex
+        file_storage.save(self.upload_path(job_id))
+        conn = self._connection()
+        conn.execute(
+            "INSERT INTO jobs (job_id, kind, user_id, filename, options) VALUES (?, ?, ?, ?, ?)",
+            (job_id, kind, user_id, file_storage.filename, json.dumps(options or {}))
+        )
+        conn.commit()
+        self.ensure_started()
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id):
+        """Returns the job as a dict, or None if it does not exist."""
+        row = self._connection().execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def recent(self, user_id, limit=10):
+        """Returns the latest jobs submitted by `user_id`, newest first."""
+        rows = self._connection().execute(
+            "SELECT * FROM jobs WHERE user_id = ? ORDER BY created_at DESC, rowid DESC LIMIT ?",
+            (user_id, limit)
+        ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def _to_dict(self, row):
+        job = dict(row)
+        job['options'] = json.loads(job['options'] or '{}')
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        job['label'] = JOB_KINDS.get(job['kind'], (job['kind'],))[0]
+        job['has_report'] = job['status'] == 'done' and os.path.exists(self.report_path(job['job_id']))
+        return job
+
+    # --- Workers ---
+
+    def ensure_started(self):
+        """Starts this process's worker threads if they are not running yet."""
+        pid = os.getpid()
+        with self._lock:
+            # Threads do not survive fork(); each worker process starts its own.
+            if self._pid == pid and all(thread.is_alive() for thread in self._threads):
+                return
+            self._pid = pid
+            count = max(1, int(self.app.config.get('JOB_WORKERS') or 1))
+            self._threads = [
+                threading.Thread(target=self._run, name=f'job-worker-{n}', daemon=True) for n in range(count)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def _run(self):
+        poll_interval = float(self.app.config.get('JOB_POLL_INTERVAL') or 1.0)
+        conn = connect(self.app.config['JOBS_DATABASE'], self.app.config)
+        while True:
+            try:
+                self._requeue_orphans(conn)
+                job = self._claim(conn)
+            except Exception as e:
+                self.app.logger.error(f"Job worker could not read the queue: {e}")
+                conn.rollback()
+                job = None
+            if job is None:
+                self._take_scheduled_snapshot()
+                self._wakeup.wait(poll_interval)
+                self._wakeup.clear()
+                continue
+            # A fresh app context per job, like a request: its own g, cached data version and teardown.
+            with self.app.app_context():
+                self._execute(conn, job)
+
+    def _take_scheduled_snapshot(self):
+        """
+        Takes a coverage snapshot when none was taken in the last
+        SNAPSHOT_INTERVAL_HOURS. Idle workers check at most once a minute;
+        take_coverage_snapshot itself makes sure concurrent checks record one.
+        """
+        interval = self.app.config.get('SNAPSHOT_INTERVAL_HOURS')
+        with self._lock:
+            if not interval or time.monotonic() < self._next_snapshot_check:
+                return
+            self._next_snapshot_check = time.monotonic() + 60
+        from .services import database as db_service
+        with self.app.app_context():
+            try:
+                db_service.take_coverage_snapshot('schedule', min_interval_hours=interval)
+            except Exception as e:
+                self.app.logger.error(f"Scheduled coverage snapshot failed: {e}")
+
+    def _requeue_orphans(self, conn):
+        max_attempts = int(self.app.config.get('JOB_MAX_ATTEMPTS') or 1)
+        running = conn.execute("SELECT job_id, owner_pid, attempts FROM jobs WHERE status = 'running'").fetchall()
+        # Each UPDATE re-checks the owner it saw, so a job another thread has just claimed is left alone.
+        for job in running:
+            if job['owner_pid'] is not None and _pid_alive(job['owner_pid']):
+                continue
+            if job['attempts'] >= max_attempts:
+                conn.execute("""
+                    UPDATE jobs SET status = 'failed', error = 'The job was interrupted too many times.',
+                        finished_at = datetime('now')
+                    WHERE job_id = ? AND status = 'running' AND owner_pid IS ?
+                """, (job['job_id'], job['owner_pid']))
+            else:
+                conn.execute("""
+                    UPDATE jobs SET status = 'queued', owner_pid = NULL, rows_done = 0
+                    WHERE job_id = ? AND status = 'running' AND owner_pid IS ?
+                """, (job['job_id'], job['owner_pid']))
+        conn.commit()
+
+    def _claim(self, conn):
+        job = conn.execute("""
+            UPDATE jobs SET status = 'running', owner_pid = ?, attempts = attempts + 1, started_at = datetime('now')
+            WHERE job_id = (SELECT job_id FROM jobs WHERE status = 'queued' ORDER BY created_at, rowid LIMIT 1)
+              AND status = 'queued'
+            RETURNING *
+        """, (os.getpid(),)).fetchone()
+        conn.commit()
+        return job
+
+    def _progress_callback(self, job_id):
+        def progress(rows_done, rows_total):
+            # Called from whichever thread runs the work (for imports, the database writer).
+            conn = self._connection()
+            conn.execute("UPDATE jobs SET rows_done = ?, rows_total = ? WHERE job_id = ?", (rows_done, rows_total, job_id))
+            conn.commit()
+        return progress
+
+    def _execute(self, conn, job):
+        job_id = job['job_id']
+        _, handler, _ = JOB_KINDS[job['kind']]
+        partial_path = self.report_path(job_id) + '.part'
+        try:
+            with open(self.upload_path(job_id), 'rb') as stream, \
+                    open(partial_path, 'w', newline='', encoding='utf-8') as out:
+                result = handler(stream, out, job['user_id'], json.loads(job['options'] or '{}'),
+                                 self._progress_callback(job_id))
+            # Only a complete report becomes downloadable.
+            os.replace(partial_path, self.report_path(job_id))
+            conn.execute("""
+                UPDATE jobs SET status = 'done', result = ?, rows_done = COALESCE(rows_total, rows_done),
+                    finished_at = datetime('now')
+                WHERE job_id = ?
+            """, (json.dumps(result), job_id))
+        except Exception as e:
+            self.app.logger.error(f"Job {job_id} ({job['kind']}) failed: {e}")
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = datetime('now') WHERE job_id = ?",
+                (str(e), job_id)
+            )
+        conn.commit()
+        for path in (self.upload_path(job_id), partial_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def get_job_runner():
+    """Returns the current app's job runner."""
+    return current_app.extensions['job_runner']
+
+
+def init_app(app):
+    """
+    Attach a job runner to the app and create the jobs table. Unless
+    configured, the jobs database and upload directory sit next to the main
+    database. Worker threads
+    start with the first request, so queued jobs left by a previous process
+    are picked up once the app is serving again. This is called by the
+    application factory.
+    """
+    database_dir = os.path.dirname(app.config['DATABASE'])
+    if not app.config.get('JOBS_DATABASE'):
+        app.config['JOBS_DATABASE'] = os.path.join(database_dir, 'jobs.sqlite')
+    if not app.config.get('JOBS_DIR'):
+        app.config['JOBS_DIR'] = os.path.join(database_dir, 'jobs')
+
+    runner = JobRunner(app)
+    runner.create_schema()
+    app.extensions['job_runner'] = runner
+    app.before_request(runner.ensure_started)
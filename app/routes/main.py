@@ -1,55 +1,207 @@
 # C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/app/routes/main.py
 
-from flask import Blueprint, render_template, jsonify, current_app, session, request, flash, redirect, url_for, g
+from flask import (
+    Blueprint, render_template, jsonify, current_app, session, request, flash, redirect, url_for, g,
+    stream_with_context
+)
 from ..services import database as db
 from ..utils.decorators import login_required
-import math
+from ..utils.cache import conditional_view
 
 bp = Blueprint('main', __name__)
 
 
 @bp.route('/metrics')
 @login_required
+@conditional_view
 def metrics():
-    """Renders the main metrics view page with all data."""
-    coverage_data, metric_types = db.get_all_coverage_details()
-    glean_metrics = db.get_glean_metrics()
-    legacy_metrics = db.get_legacy_metrics()
+    """Renders the metrics view page. The tables are filled page by page from metrics_data."""
+    counts = db.get_metric_page_counts()
 
     return render_template(
         'metrics.html',
-        glean_metrics=glean_metrics,
-        legacy_metrics=legacy_metrics,
-        coverage=coverage_data,
-        metric_types=metric_types,
-        glean_count=len(glean_metrics),
-        legacy_count=len(legacy_metrics),
-        coverage_count=len(coverage_data),
+        metric_types=db.get_metric_types(),
+        supported_engines=db.get_supported_engines(),
+        glean_count=counts['glean'],
+        legacy_count=counts['legacy'],
+        coverage_count=counts['coverage'],
+        page_size=current_app.config['METRICS_PAGE_SIZE'],
         tc_base_url=current_app.config.get('TC_BASE_URL', ''),
         show_management=session.get('show_management', False)
     )
 
 
+@bp.route('/metrics/data/<string:table>')
+@login_required
+@conditional_view
+def metrics_data(table):
+    """
+    Returns one page of the coverage, glean or legacy table as JSON.
+    Query parameters: page, per_page, metric_type, region, engine, search, sort, direction.
+    """
+    max_page_size = current_app.config['METRICS_MAX_PAGE_SIZE']
+    per_page = request.args.get('per_page', current_app.config['METRICS_PAGE_SIZE'], type=int)
+    filters = {
+        'page': request.args.get('page', 1, type=int),
+        'per_page': max(1, min(per_page, max_page_size)),
+        'metric_type': request.args.get('metric_type', '').strip() or None,
+        'region': request.args.get('region', '').strip() or None,
+        'engine': request.args.get('engine', '').strip() or None,
+        'search': request.args.get('search', '').strip() or None,
+        'descending': request.args.get('direction', 'asc') == 'desc',
+    }
+    sort = request.args.get('sort')
+
+    try:
+        if table == 'coverage':
+            result = db.get_coverage_page(sort=sort or 'metric_name', **filters)
+        elif table in db.METRIC_DEFINITION_TABLES:
+            result = db.get_metric_definitions_page(table, sort=sort or 'name', **filters)
+        else:
+            return jsonify({'success': False, 'error': f"Unknown table '{table}'."}), 404
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    return jsonify(result)
+
+
+@bp.route('/metric-details/<string:metric_type>/<path:metric_name>')
+@login_required
+@conditional_view
+def metric_details(metric_type, metric_name):
+    """Returns the existing and planned coverage breakdown of one metric as JSON."""
+    breakdown = db.get_metric_breakdowns([(metric_name, metric_type)])[0]
+    return jsonify(breakdown)
+
+
+@bp.route('/metric-details', methods=['POST'])
+@login_required
+def metric_details_batch():
+    """
+    Returns the coverage breakdowns of several metrics as JSON.
+    Expects {"metrics": [{"metric_name": ..., "metric_type": ...}, ...]}.
+    """
+    data = request.get_json(silent=True) or {}
+    requested = data.get('metrics')
+    if not isinstance(requested, list):
+        return jsonify({'success': False, 'error': "Expected a 'metrics' list."}), 400
+
+    max_batch = current_app.config['METRIC_DETAILS_MAX_BATCH']
+    if len(requested) > max_batch:
+        return jsonify({'success': False, 'error': f"At most {max_batch} metrics per request."}), 400
+
+    metrics = []
+    for item in requested:
+        if not isinstance(item, dict) or not isinstance(item.get('metric_name'), str) \
+                or not isinstance(item.get('metric_type'), str):
+            return jsonify({'success': False, 'error': 'Each metric needs a metric_name and a metric_type.'}), 400
+        metrics.append((item['metric_name'], item['metric_type']))
+
+    return jsonify({'success': True, 'metrics': db.get_metric_breakdowns(metrics)})
+
+
 @bp.route('/reports')
 @login_required
+@conditional_view
 def reports():
     """Renders the reports page."""
-    report_data, metric_types, metric_to_tcids = db.get_report_data()
+    report_data, metric_types = db.get_report_data()
     stats = db.get_general_stats()
+    trend = db.get_coverage_trend()
 
     return render_template(
         'reports.html',
         report_data=report_data,
-        metric_to_tcids=metric_to_tcids,
         metric_types=metric_types,
         total_glean_metrics=stats['total_glean_metrics'],
         total_legacy_metrics=stats['total_legacy_metrics'],
         glean_covered_tcs=stats['glean_covered_tcs'],
         legacy_covered_tcs=stats['legacy_covered_tcs'],
+        trend=trend,
         tc_base_url=current_app.config.get('TC_BASE_URL', '')
     )
 
 
+def _matrix_filters():
+    """Reads the coverage matrix filters from the query string; region and engine may repeat or be comma-separated."""
+    def values(name):
+        return [value.strip() for raw in request.args.getlist(name) for value in raw.split(',') if value.strip()]
+    return {
+        'metric_type': request.args.get('metric_type') or None,
+        'priority': request.args.get('priority') or None,
+        'regions': values('region'),
+        'engines': values('engine'),
+        'status': request.args.get('status', 'uncovered'),
+    }
+
+
+@bp.route('/reports/coverage-matrix')
+@login_required
+@conditional_view
+def coverage_matrix_data():
+    """
+    Returns a slice of the metric x region x engine coverage matrix as JSON.
+    Query parameters: metric_type, priority, region, engine, status (uncovered or covered).
+    """
+    try:
+        return jsonify(db.get_coverage_matrix_slice(**_matrix_filters()))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+
+@bp.route('/reports/matrix')
+@login_required
+@conditional_view
+def coverage_matrix():
+    """Renders the region x engine heatmap of the coverage matrix, with the same filters as coverage_matrix_data."""
+    filters = _matrix_filters()
+    try:
+        matrix = db.get_coverage_matrix_slice(**filters)
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('main.coverage_matrix'))
+    return render_template('coverage_matrix.html', matrix=matrix, filters=filters)
+
+
+@bp.route('/reports/coverage-trend')
+@login_required
+@conditional_view
+def coverage_trend():
+    """
+    Returns coverage per metric type over time, from the coverage snapshots, as JSON.
+    Query parameters: days (default 90) and metric_type (Glean or Legacy; both when omitted).
+    """
+    try:
+        days = int(request.args.get('days', 90))
+        return jsonify(db.get_coverage_trend(days, request.args.get('metric_type') or None))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+
+@bp.route('/reports/coverage-trend/<string:metric_type>/<path:metric_name>')
+@login_required
+@conditional_view
+def metric_coverage_history(metric_type, metric_name):
+    """Returns the snapshots in which one metric's coverage counts changed, as JSON."""
+    return jsonify({
+        'metric_name': metric_name,
+        'metric_type': metric_type.capitalize(),
+        'history': db.get_metric_coverage_history(metric_name, metric_type),
+    })
+
+
+@bp.route('/reports/snapshots', methods=['POST'])
+@login_required
+def take_snapshot():
+    """Records a coverage snapshot on demand."""
+    if g.user['role'] == 'readonly':
+        flash('You do not have permission to take snapshots.', 'error')
+        return redirect(url_for('main.reports'))
+    result = db.take_coverage_snapshot('manual', g.user['user_id'])
+    flash(f"Snapshot recorded: {result['changed']} metrics changed since the previous one.", 'success')
+    return redirect(url_for('main.reports'))
+
+
 @bp.route('/activity-log')
 @login_required
 def activity_log():
@@ -59,8 +211,9 @@ def activity_log():
         return redirect(url_for('main.metrics'))
 
     # Get filter parameters from the request URL
-    page = request.args.get('page', 1, type=int)
     per_page = 50  # Or make this configurable
+    cursor = request.args.get('cursor', type=str) or None
+    newer = request.args.get('dir') == 'newer'
     user_id_filter = request.args.get('user_id', type=int) if request.args.get('user_id') else None
     action_filter = request.args.get('action', type=str) if request.args.get('action') else None
     start_date_filter = request.args.get('start_date', type=str) if request.args.get('start_date') else None
@@ -71,28 +224,6 @@ def activity_log():
     filter_users = db.get_all_users()
     filter_actions = db.get_distinct_actions()
 
-    # Fetch the total count of items that match the filters
-    total_items = db.get_history_count(
-        user_id=user_id_filter,
-        action=action_filter,
-        start_date=start_date_filter,
-        end_date=end_date_filter,
-        search_term=search_term
-    )
-    total_pages = math.ceil(total_items / per_page) if total_items > 0 else 1
-    page = max(1, min(page, total_pages))  # Ensure page is within valid range
-
-    # Fetch the paginated history items
-    history_items = db.get_history(
-        page=page,
-        per_page=per_page,
-        user_id=user_id_filter,
-        action=action_filter,
-        start_date=start_date_filter,
-        end_date=end_date_filter,
-        search_term=search_term
-    )
-
     current_filters = {
         'user_id': user_id_filter,
         'action': action_filter,
@@ -100,13 +231,34 @@ def activity_log():
         'end_date': end_date_filter,
         'search': search_term
     }
+    history_filters = {
+        'user_id': user_id_filter,
+        'action': action_filter,
+        'start_date': start_date_filter,
+        'end_date': end_date_filter,
+        'search_term': search_term
+    }
+
+    # Counting stops at the cap, so deep filters never scan the whole history just for the total.
+    count_cap = current_app.config['HISTORY_COUNT_CAP']
+    total_items = db.get_history_count(cap=count_cap, **history_filters)
+
+    # Fetch one page of history items, positioned by the cursor
+    history_items, older_cursor, newer_cursor = db.get_history(
+        per_page=per_page,
+        cursor=cursor,
+        newer=newer,
+        **history_filters
+    )
 
     return render_template(
         'activity_log.html',
         history=history_items,
-        page=page,
-        total_pages=total_pages,
+        older_cursor=older_cursor,
+        newer_cursor=newer_cursor,
         total_items=total_items,
+        total_is_capped=total_items > count_cap,
+        count_cap=count_cap,
         filter_users=filter_users,
         filter_actions=filter_actions,
         current_filters=current_filters
@@ -114,6 +266,7 @@ def activity_log():
 
 
 @bp.route('/<string:metric_type>/<path:metric_name>/status')
+@conditional_view
 def metric_status(metric_type, metric_name):
     """Renders a read-only status page for a single metric."""
     metric_data = db.get_metric_status_details(metric_type, metric_name)
@@ -131,9 +284,85 @@ def metric_status(metric_type, metric_name):
     )
 
 
+@bp.route('/search')
+@login_required
+@conditional_view
+def full_text_search():
+    """
+    Ranked full-text search over metrics and test case titles, as JSON.
+    Query parameters: q, type (see db.FULL_TEXT_SEARCH_TYPES), page, per_page.
+    """
+    per_page = request.args.get('per_page', current_app.config['FULL_TEXT_SEARCH_PAGE_SIZE'], type=int)
+    try:
+        result = db.search_full_text(
+            request.args.get('q', ''),
+            search_type=request.args.get('type', 'all'),
+            page=request.args.get('page', 1, type=int),
+            per_page=max(1, min(per_page, current_app.config['METRICS_MAX_PAGE_SIZE']))
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    tc_base_url = current_app.config.get('TC_BASE_URL', '')
+    results = []
+    for item in result['results']:
+        if item['kind'] == 'tcid':
+            url = f"{tc_base_url}{db._strip_tcid_prefix(item['name'])}"
+        else:
+            url = url_for('main.metric_status', metric_type=item['kind'], metric_name=item['name'])
+        results.append(dict(item, url=url))
+    return jsonify(dict(result, results=results))
+
+
 @bp.route('/search-suggestions')
 @login_required
+@conditional_view
 def search_suggestions():
-    """Provides a JSON list of search terms for autofill."""
-    suggestions = db.get_search_suggestions()
-    return jsonify(suggestions)
\ No newline at end of file
+    """
+    Provides a JSON list of search terms for autofill.
+    Query parameters: q (prefix), type (see db.SUGGESTION_TYPES) and limit.
+    """
+    max_limit = current_app.config['SEARCH_SUGGESTIONS_MAX_LIMIT']
+    limit = request.args.get('limit', current_app.config['SEARCH_SUGGESTIONS_LIMIT'], type=int)
+    try:
+        suggestions = db.get_search_suggestions(
+            prefix=request.args.get('q', ''),
+            suggestion_type=request.args.get('type', 'all'),
+            limit=max(1, min(limit, max_limit))
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify(suggestions)
+
+
+@bp.route('/export/<string:dataset>')
+@login_required
+def export(dataset):
+    """
+    Streams a whole dataset (see db.EXPORT_DATASETS) as a download, for
+    dashboards and nightly syncs. Query parameters: format (csv or ndjson),
+    gzip (1 to compress), metric_type, region, engine, updated_since (ISO
+    date, UTC; not for planning) and include_deleted (1 to keep deleted rows).
+    """
+    export_format = request.args.get('format', 'csv')
+    compress = request.args.get('gzip') in ('1', 'true')
+    try:
+        chunks = db.iter_export(
+            dataset,
+            export_format=export_format,
+            compress=compress,
+            metric_type=request.args.get('metric_type') or None,
+            region=request.args.get('region') or None,
+            engine=request.args.get('engine') or None,
+            updated_since=request.args.get('updated_since') or None,
+            include_deleted=request.args.get('include_deleted') in ('1', 'true'),
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    filename = f"{dataset}.{export_format}" + ('.gz' if compress else '')
+    return current_app.response_class(
+        stream_with_context(chunks),
+        mimetype='application/gzip' if compress else db.EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
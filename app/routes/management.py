@@ -1,15 +1,14 @@
 # C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/app/routes/management.py
 
 from flask import (
-    Blueprint, flash, g, redirect, render_template, request, url_for, session,
-    make_response, current_app
+    Blueprint, flash, g, redirect, render_template, request, url_for, jsonify, send_file
 )
+from werkzeug.datastructures import FileStorage
 from werkzeug.security import generate_password_hash
 
+from ..jobs import JOB_KINDS, get_job_runner
 from ..services import database as db
 from ..utils.decorators import admin_required
-import os
-import datetime
 
 bp = Blueprint('management', __name__, url_prefix='/manage')
 
@@ -18,50 +17,104 @@ bp = Blueprint('management', __name__, url_prefix='/manage')
 @admin_required
 def index():
     """Renders the main data management page."""
-    import_results = session.get('import_results')
     return render_template(
         'index.html',
         supported_engines=db.get_supported_engines(),
+        supported_regions=db.get_supported_regions(),
         exceptions=db.get_all_exceptions(),
-        import_results=import_results
+        recent_jobs=get_job_runner().recent(g.user['user_id'])
     )
 
 
-@bp.route('/clear-import-results')
+# --- Background Jobs ---
+
+def _queue_upload(kind, options=None):
+    """
+    Validates the uploaded CSV and queues it as a background job of `kind`.
+    Browsers are sent to the job's progress page; clients asking for JSON get
+    the job ID and its status URL with a 202.
+    """
+    file = request.files.get('file')
+    if file is None or file.filename == '':
+        flash('No file selected for uploading.', 'error')
+        return redirect(url_for('management.index'))
+    if not file.filename.endswith('.csv'):
+        flash('Invalid file type. Please upload a .csv file.', 'error')
+        return redirect(url_for('management.index'))
+
+    job_id = get_job_runner().submit(kind, file, g.user['user_id'], options)
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({
+            'job_id': job_id,
+            'status_url': url_for('management.job_status', job_id=job_id),
+        }), 202
+    return redirect(url_for('management.job_page', job_id=job_id))
+
+
+def _job_json(job):
+    return {
+        'job_id': job['job_id'],
+        'kind': job['kind'],
+        'label': job['label'],
+        'filename': job['filename'],
+        'status': job['status'],
+        'rows_done': job['rows_done'],
+        'rows_total': job['rows_total'],
+        'result': job['result'],
+        'error': job['error'],
+        'report_url': url_for('management.job_report', job_id=job['job_id']) if job['has_report'] else None,
+    }
+
+
+@bp.route('/jobs/<job_id>')
 @admin_required
-def clear_import_results():
-    """Clears the import results from the session."""
-    if 'import_results' in session:
-        # Clean up the report file if it exists
-        results = session.pop('import_results')
-        if results.get('report_filename'):
-            try:
-                os.remove(os.path.join(current_app.instance_path, results['report_filename']))
-            except OSError:
-                pass  # Ignore if file doesn't exist
-    return redirect(url_for('management.index'))
+def job_page(job_id):
+    """Shows a background job's progress; the page polls job_status until it finishes."""
+    job = get_job_runner().get(job_id)
+    if job is None:
+        flash('Job not found.', 'error')
+        return redirect(url_for('management.index'))
+    return render_template('job.html', job=job)
+
+
+@bp.route('/jobs/<job_id>/status')
+@admin_required
+def job_status(job_id):
+    """Returns a background job's status, progress and result summary as JSON."""
+    job = get_job_runner().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found.'}), 404
+    return jsonify(_job_json(job))
 
 
-@bp.route('/download-last-report')
+@bp.route('/jobs/<job_id>/report')
 @admin_required
-def download_last_report():
-    """Downloads the last generated import report."""
-    import_results = session.get('import_results')
-    if not import_results or not import_results.get('report_filename'):
+def job_report(job_id):
+    """Downloads the report (or extraction output) of a finished job."""
+    runner = get_job_runner()
+    job = runner.get(job_id)
+    if job is None or not job['has_report']:
         flash('No report available for download.', 'error')
         return redirect(url_for('management.index'))
 
-    try:
-        with open(os.path.join(current_app.instance_path, import_results['report_filename']), 'r') as f:
-            csv_content = f.read()
-    except FileNotFoundError:
-        flash('Report file not found. It may have been cleared.', 'error')
+    _, _, download_name = JOB_KINDS[job['kind']]
+    return send_file(runner.report_path(job_id), mimetype='text/csv', as_attachment=True, download_name=download_name)
+
+
+@bp.route('/jobs/<job_id>/commit', methods=['POST'])
+@admin_required
+def commit_job(job_id):
+    """Queues the import of the new links found by a finished rotation import dry run."""
+    runner = get_job_runner()
+    job = runner.get(job_id)
+    if job is None or job['kind'] != 'preview_rotation' or not job['has_report']:
+        flash('Only a finished rotation import dry run can be committed.', 'error')
         return redirect(url_for('management.index'))
 
-    response = make_response(csv_content)
-    response.headers["Content-Disposition"] = f"attachment; filename=import_report_{import_results['timestamp']}.csv"
-    response.headers["Content-Type"] = "text/csv"
-    return response
+    with open(runner.report_path(job_id), 'rb') as report:
+        commit_id = runner.submit('commit_rotation', FileStorage(report, filename=job['filename']),
+                                  g.user['user_id'], {'preview_job': job_id})
+    return redirect(url_for('management.job_page', job_id=commit_id))
 
 
 # --- Metric Management ---
@@ -108,75 +161,15 @@ def edit_metric(metric_type, metric_name):
 @bp.route('/bulk-import/glean', methods=['POST'])
 @admin_required
 def bulk_import_glean():
-    """Handles the bulk import of Glean metrics from a CSV file."""
-    if 'file' not in request.files:
-        flash('No file part in the request.', 'error')
-        return redirect(url_for('management.index'))
-    file = request.files['file']
-    if file.filename == '':
-        flash('No file selected for uploading.', 'error')
-        return redirect(url_for('management.index'))
-
-    if file and file.filename.endswith('.csv'):
-        report_content, successes, duplicates, errors = db.bulk_import_metrics_from_csv('glean', file.stream,
-                                                                                        g.user['user_id'])
-
-        timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-        report_filename = f"report_{timestamp}.csv"
-        with open(os.path.join(current_app.instance_path, report_filename), 'w', newline='', encoding='utf-8') as f:
-            f.write(report_content)
-
-        summary = f"Import complete: {successes} new metrics added, {duplicates} duplicates found, and {errors} errors encountered."
-        session['import_results'] = {
-            'summary': summary,
-            'successes': successes,
-            'duplicates': duplicates,
-            'errors': errors,
-            'report_filename': report_filename,
-            'timestamp': timestamp
-        }
-        flash(summary, 'success' if errors == 0 else 'error')
-    else:
-        flash('Invalid file type. Please upload a .csv file.', 'error')
-
-    return redirect(url_for('management.index'))
+    """Queues a bulk import of Glean metrics from a CSV file."""
+    return _queue_upload('import_glean', {'mode': request.form.get('mode', 'insert')})
 
 
 @bp.route('/bulk-import/legacy', methods=['POST'])
 @admin_required
 def bulk_import_legacy():
-    """Handles the bulk import of Legacy metrics from a CSV file."""
-    if 'file' not in request.files:
-        flash('No file part in the request.', 'error')
-        return redirect(url_for('management.index'))
-    file = request.files['file']
-    if file.filename == '':
-        flash('No file selected for uploading.', 'error')
-        return redirect(url_for('management.index'))
-
-    if file and file.filename.endswith('.csv'):
-        report_content, successes, duplicates, errors = db.bulk_import_metrics_from_csv('legacy', file.stream,
-                                                                                        g.user['user_id'])
-
-        timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-        report_filename = f"report_{timestamp}.csv"
-        with open(os.path.join(current_app.instance_path, report_filename), 'w', newline='', encoding='utf-8') as f:
-            f.write(report_content)
-
-        summary = f"Import complete: {successes} new metrics added, {duplicates} duplicates found, and {errors} errors encountered."
-        session['import_results'] = {
-            'summary': summary,
-            'successes': successes,
-            'duplicates': duplicates,
-            'errors': errors,
-            'report_filename': report_filename,
-            'timestamp': timestamp
-        }
-        flash(summary, 'success' if errors == 0 else 'error')
-    else:
-        flash('Invalid file type. Please upload a .csv file.', 'error')
-
-    return redirect(url_for('management.index'))
+    """Queues a bulk import of Legacy metrics from a CSV file."""
+    return _queue_upload('import_legacy', {'mode': request.form.get('mode', 'insert')})
 
 
 # --- Coverage Management ---
@@ -193,37 +186,8 @@ def add_coverage():
 @bp.route('/bulk-import/coverage', methods=['POST'])
 @admin_required
 def bulk_import_coverage():
-    """Handles the bulk import of coverage data from a CSV file."""
-    if 'file' not in request.files:
-        flash('No file part in the request.', 'error')
-        return redirect(url_for('management.index'))
-    file = request.files['file']
-    if file.filename == '':
-        flash('No file selected for uploading.', 'error')
-        return redirect(url_for('management.index'))
-
-    if file and file.filename.endswith('.csv'):
-        report_content, successes, duplicates, errors = db.bulk_import_coverage_from_csv(file.stream, g.user['user_id'])
-
-        timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-        report_filename = f"report_{timestamp}.csv"
-        with open(os.path.join(current_app.instance_path, report_filename), 'w', newline='', encoding='utf-8') as f:
-            f.write(report_content)
-
-        summary = f"Import complete: {successes} new links created, {duplicates} duplicates found, and {errors} errors encountered."
-        session['import_results'] = {
-            'summary': summary,
-            'successes': successes,
-            'duplicates': duplicates,
-            'errors': errors,
-            'report_filename': report_filename,
-            'timestamp': timestamp
-        }
-        flash(summary, 'success' if errors == 0 else 'error')
-    else:
-        flash('Invalid file type. Please upload a .csv file.', 'error')
-
-    return redirect(url_for('management.index'))
+    """Queues a bulk import of coverage from a CSV file."""
+    return _queue_upload('import_coverage')
 
 
 # --- Exception Management ---
@@ -255,13 +219,7 @@ def add_engine():
     # This is a simplified example; you might want more robust handling
     engine_name = request.form.get('name')
     if engine_name:
-        try:
-            conn = db.get_db()
-            conn.execute("INSERT INTO supported_engines (name) VALUES (?)", (engine_name,))
-            conn.commit()
-            db.log_edit(g.user['user_id'], 'add_engine', 'supported_engines', engine_name)
-        except conn.IntegrityError:
-            pass  # Ignore if it already exists
+        db.add_supported_engine(engine_name, g.user['user_id'])  # Ignored if it already exists
     return redirect(url_for('management.index'))
 
 
@@ -271,10 +229,29 @@ def delete_engine():
     """Deletes a supported engine."""
     engine_name = request.form.get('name')
     if engine_name:
-        conn = db.get_db()
-        conn.execute("DELETE FROM supported_engines WHERE name = ?", (engine_name,))
-        conn.commit()
-        db.log_edit(g.user['user_id'], 'delete_engine', 'supported_engines', engine_name)
+        db.delete_supported_engine(engine_name, g.user['user_id'])
+    return redirect(url_for('management.index'))
+
+
+# --- Region Management ---
+
+@bp.route('/add/region', methods=['POST'])
+@admin_required
+def add_region():
+    """Adds a new supported region."""
+    region_name = (request.form.get('name') or '').strip()
+    if region_name:
+        db.add_supported_region(region_name, g.user['user_id'])  # Ignored if it already exists
+    return redirect(url_for('management.index'))
+
+
+@bp.route('/delete/region', methods=['POST'])
+@admin_required
+def delete_region():
+    """Deletes a supported region."""
+    region_name = request.form.get('name')
+    if region_name:
+        db.delete_supported_region(region_name, g.user['user_id'])
     return redirect(url_for('management.index'))
 
 
@@ -294,46 +271,19 @@ def delete_item(table, pk):
 @bp.route('/extract-probes', methods=['POST'])
 @admin_required
 def extract_probes():
-    """Extracts probes from a TestRail CSV export."""
-    if 'file' not in request.files or not request.files['file'].filename:
-        flash('No file provided for probe extraction.', 'error')
-        return redirect(url_for('management.index'))
-
-    file = request.files['file']
-    if file and file.filename.endswith('.csv'):
-        csv_output = db.extract_probes_from_csv(file.stream)
-        if not csv_output:
-            flash('Could not process the file. It might be empty or malformed.', 'error')
-            return redirect(url_for('management.index'))
-
-        response = make_response(csv_output)
-        response.headers["Content-Disposition"] = "attachment; filename=extracted_probes.csv"
-        response.headers["Content-Type"] = "text/csv"
-        return response
-    else:
-        flash('Invalid file type. Please upload a .csv file.', 'error')
-        return redirect(url_for('management.index'))
+    """Queues probe extraction from a TestRail CSV export."""
+    return _queue_upload('extract_probes')
 
 
 @bp.route('/extract-from-rotation', methods=['POST'])
 @admin_required
 def extract_from_rotation():
-    """Extracts coverage data from a rotation CSV."""
-    if 'file' not in request.files or not request.files['file'].filename:
-        flash('No file provided for rotation extraction.', 'error')
-        return redirect(url_for('management.index'))
+    """Queues coverage extraction from a rotation CSV."""
+    return _queue_upload('extract_rotation')
 
-    file = request.files['file']
-    if file and file.filename.endswith('.csv'):
-        csv_output = db.extract_from_rotation_csv(file.stream)
-        if not csv_output:
-            flash('Could not process the file. It might be empty or malformed.', 'error')
-            return redirect(url_for('management.index'))
-
-        response = make_response(csv_output)
-        response.headers["Content-Disposition"] = "attachment; filename=extracted_rotation_coverage.csv"
-        response.headers["Content-Type"] = "text/csv"
-        return response
-    else:
-        flash('Invalid file type. Please upload a .csv file.', 'error')
-        return redirect(url_for('management.index'))
\ No newline at end of file
+
+@bp.route('/import-from-rotation', methods=['POST'])
+@admin_required
+def import_from_rotation():
+    """Queues a dry run of importing a rotation CSV as coverage; its job page offers the commit."""
+    return _queue_upload('preview_rotation')
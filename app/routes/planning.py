@@ -1,21 +1,24 @@
 # C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/app/routes/planning.py
 
-from flask import Blueprint, render_template, request, jsonify, current_app, g
+from flask import Blueprint, render_template, request, jsonify, current_app, g, flash, redirect, url_for
 from ..services import database as db
 from ..utils.decorators import login_required
+from ..utils.cache import conditional_view
 
 bp = Blueprint('planning', __name__, url_prefix='/planning')
 
 
 @bp.route('/')
 @login_required
+@conditional_view
 def view_planning():
     """Renders the new Coverage Planning page."""
     page_data = db.get_planning_page_data()
     return render_template(
         'planning.html',
         **page_data,
-        tc_base_url=current_app.config.get('TC_BASE_URL', '')
+        tc_base_url=current_app.config.get('TC_BASE_URL', ''),
+        coverage_policies=current_app.config.get('COVERAGE_POLICIES')
     )
 
 
@@ -30,3 +33,24 @@ def update_planning_entry():
     except Exception as e:
         current_app.logger.error(f"Error updating planning entry: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/plan-gaps', methods=['POST'])
+@login_required
+def plan_coverage_gaps():
+    """Adds planning entries for every combination the configured coverage policies require but nothing covers."""
+    if g.user['role'] == 'readonly':
+        flash('You do not have permission to edit the planning.', 'error')
+        return redirect(url_for('planning.view_planning'))
+    policies = current_app.config.get('COVERAGE_POLICIES')
+    if not policies:
+        flash('No coverage policies are configured (COVERAGE_POLICIES).', 'error')
+        return redirect(url_for('planning.view_planning'))
+    try:
+        result = db.plan_coverage_gaps(policies, g.user['user_id'])
+    except ValueError as e:
+        flash(f"Invalid coverage policy: {e}", 'error')
+        return redirect(url_for('planning.view_planning'))
+    flash(f"{result['gaps']} combinations required by the coverage policies are missing: "
+          f"{result['added']} newly planned, {result['already_planned']} already planned.", 'success')
+    return redirect(url_for('planning.view_planning'))
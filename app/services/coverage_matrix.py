@@ -0,0 +1,115 @@
+# C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/app/services/coverage_matrix.py
+
+# Metric x region x engine coverage cube, built by get_coverage_matrix() in
+# app/services/database.py. Like extraction.py this module does not touch
+# Flask or the database; it only holds the data structure and its queries.
+
+
+class CoverageMatrix:
+    """
+    Which region/engine combinations each metric is covered for.
+
+    The cube is stored twice, as Python ints used as bitsets:
+    - rows[m] has one bit per combination (region index * engine count +
+      engine index), set when metric m is covered for it;
+    - columns[c] has one bit per metric, set when that metric is covered
+      for combination c.
+    A slice is then a handful of whole-row AND/OR/NOT operations and bit
+    counts instead of a loop over every metric and combination. Regions
+    match case-insensitively as upper case and engines as lower case.
+    Treat a built matrix as read-only: it is shared through the read cache.
+    """
+
+    def __init__(self, regions, engines, metrics):
+        """`metrics` is a list of (name, metric_type, priority) tuples, metric_type being 'Glean' or 'Legacy'."""
+        self.regions = [region.upper() for region in regions]
+        self.engines = [engine.lower() for engine in engines]
+        self.metrics = list(metrics)
+        self._region_index = {region: index for index, region in enumerate(self.regions)}
+        self._engine_index = {engine: index for index, engine in enumerate(self.engines)}
+        self._metric_index = {(name, metric_type): index for index, (name, metric_type, _) in enumerate(self.metrics)}
+        self.combo_count = len(self.regions) * len(self.engines)
+        self.rows = [0] * len(self.metrics)
+        self.columns = [0] * self.combo_count
+
+    def add(self, metric_name, metric_type, region, engine):
+        """
+        Marks one coverage link. Links for a metric, region or engine outside
+        the cube are ignored; returns whether the link was counted.
+        """
+        metric = self._metric_index.get((metric_name, (metric_type or '').capitalize()))
+        region_index = self._region_index.get((region or '').upper())
+        engine_index = self._engine_index.get((engine or '').lower())
+        if metric is None or region_index is None or engine_index is None:
+            return False
+        combo = region_index * len(self.engines) + engine_index
+        self.rows[metric] |= 1 << combo
+        self.columns[combo] |= 1 << metric
+        return True
+
+    def combo_mask(self, regions=None, engines=None):
+        """Bitset of the combinations in `regions` x `engines` (all of them when None). Raises ValueError for unknown values."""
+        region_indexes = self._indexes(regions, self._region_index, str.upper, 'region')
+        engine_indexes = self._indexes(engines, self._engine_index, str.lower, 'engine')
+        mask = 0
+        for region_index in region_indexes:
+            for engine_index in engine_indexes:
+                mask |= 1 << (region_index * len(self.engines) + engine_index)
+        return mask
+
+    def metric_mask(self, metric_type=None, priority=None):
+        """Bitset of the metrics of `metric_type` and `priority` (any when None)."""
+        mask = 0
+        for index, (_, type_, priority_) in enumerate(self.metrics):
+            if metric_type and type_.lower() != metric_type.lower():
+                continue
+            if priority and (priority_ or '').upper() != priority.upper():
+                continue
+            mask |= 1 << index
+        return mask
+
+    def heatmap(self, metric_mask, combos=None):
+        """
+        Number of metrics in `metric_mask` covered for each combination, as
+        a list per region of a list per engine.
+        """
+        combos = self.combo_mask() if combos is None else combos
+        engine_count = len(self.engines)
+        return [
+            [
+                (self.columns[combo] & metric_mask).bit_count() if combos >> combo & 1 else None
+                for combo in range(region_index * engine_count, (region_index + 1) * engine_count)
+            ]
+            for region_index in range(len(self.regions))
+        ]
+
+    def metric_slice(self, metric_mask, combos=None, uncovered=True):
+        """
+        Yields (metric, [(region, engine), ...]) for every metric in
+        `metric_mask` with at least one uncovered (or, with
+        uncovered=False, covered) combination within `combos`.
+        """
+        combos = self.combo_mask() if combos is None else combos
+        engine_count = len(self.engines)
+        for index, metric in enumerate(self.metrics):
+            if not metric_mask >> index & 1:
+                continue
+            bits = (combos & ~self.rows[index]) if uncovered else (combos & self.rows[index])
+            if not bits:
+                continue
+            pairs = []
+            while bits:
+                low_bit = bits & -bits
+                combo = low_bit.bit_length() - 1
+                pairs.append((self.regions[combo // engine_count], self.engines[combo % engine_count]))
+                bits ^= low_bit
+            yield metric, pairs
+
+    @staticmethod
+    def _indexes(values, index, normalize, label):
+        if not values:
+            return list(index.values())
+        try:
+            return [index[normalize(value)] for value in values]
+        except KeyError as e:
+            raise ValueError(f"Unknown {label} {e.args[0]!r}.")
@@ -2,12 +2,26 @@
 
 import sqlite3
 import re
+import base64
+import hashlib
+import json
 import csv
 import io
-from collections import defaultdict
-from itertools import product
+import math
+import multiprocessing
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from itertools import chain, product
+from flask import current_app
+from markupsafe import escape
 from werkzeug.security import generate_password_hash
 from ..db import get_db
+from ..db_writer import write_operation
+from ..utils.cache import cached_read
+from . import extraction
+from .coverage_matrix import CoverageMatrix
 
 
 # --- Private Helper Functions ---
@@ -26,35 +40,61 @@ def _get_exception_tcid_set():
     return {row['tc_id'] for row in rows}
 
 
+# Anti-join that hides excepted TCIDs from a query over `coverage c`. The lookup
+# goes through the UNIQUE index on exceptions.tc_id, so its cost does not grow
+# with the size of the exception list.
+_NOT_EXCEPTED_SQL = "NOT EXISTS (SELECT 1 FROM exceptions e WHERE e.tc_id = c.tc_id AND e.is_deleted = FALSE)"
+
+
+def _is_excepted(tc_id):
+    """Returns True if the TCID is on the (non-deleted) exception list."""
+    row = get_db().execute(
+        "SELECT 1 FROM exceptions WHERE tc_id = ? AND is_deleted = FALSE", (tc_id,)
+    ).fetchone()
+    return row is not None
+
+
 # --- Edit History Logging ---
 
+_EDIT_HISTORY_INSERT = (
+    "INSERT INTO edit_history (user_id, action, table_name, record_pk, details, manifest) VALUES (?, ?, ?, ?, ?, ?)"
+)
+
+
+@write_operation
 def log_edit(user_id, action, table_name=None, record_pk=None, details=None):
-    """Logs a modification to the edit_history table."""
+    """
+    Logs a modification to the edit_history table. The entry is buffered on
+    the writer connection and inserted with the rest of the job's entries in
+    one batch when the job finishes (or dropped if the job rolls back).
+    """
     if user_id is None:
         return
 
-    db = get_db()
-    db.execute(
-        "INSERT INTO edit_history (user_id, action, table_name, record_pk, details) VALUES (?, ?, ?, ?, ?)",
-        (user_id, action, table_name, record_pk, details)
-    )
-    db.commit()  # Commit immediately after logging
+    get_db().defer(_EDIT_HISTORY_INSERT, (user_id, action, table_name, record_pk, details, None))
 
 
-def get_history(page=1, per_page=50, user_id=None, action=None, start_date=None, end_date=None, search_term=None):
+@write_operation
+def log_bulk_edit(user_id, action, table_name, manifest, details=None):
     """
-    Fetches a paginated and filtered list of edit history.
+    Logs a bulk modification as a single edit_history entry. `manifest` is a
+    list of dicts describing the affected rows; it is stored as JSON.
     """
-    db = get_db()
-    params = []
-    where_clauses = []
+    if user_id is None or not manifest:
+        return
+
+    record_pk = f"{len(manifest)} row{'s' if len(manifest) != 1 else ''}"
+    get_db().defer(_EDIT_HISTORY_INSERT, (user_id, action, table_name, record_pk, details, json.dumps(manifest)))
 
-    base_query = """
-        SELECT h.*, u.username
-        FROM edit_history h
-        JOIN users u ON h.user_id = u.user_id
-    """
 
+def _history_filter_sql(user_id=None, action=None, start_date=None, end_date=None, search_term=None):
+    """
+    Builds the WHERE conditions on edit_history `h` shared by the history
+    queries. The free-text search goes through the edit_history_fts index
+    (table, record and details) and matches usernames by substring.
+    Returns (conditions, params).
+    """
+    where_clauses, params = [], []
     if user_id:
         where_clauses.append("h.user_id = ?")
         params.append(user_id)
@@ -69,58 +109,101 @@ def get_history(page=1, per_page=50, user_id=None, action=None, start_date=None,
         where_clauses.append("h.timestamp < date(?, '+1 day')")
         params.append(end_date)
     if search_term:
-        search_like = f"%{search_term}%"
-        where_clauses.append("(h.table_name LIKE ? OR h.record_pk LIKE ? OR h.details LIKE ? OR u.username LIKE ?)")
-        params.extend([search_like] * 4)
+        user_match = "h.user_id IN (SELECT user_id FROM users WHERE instr(lower(username), ?) > 0)"
+        fts_query = _build_fts_query(search_term)
+        if fts_query:
+            where_clauses.append(
+                "(h.history_id IN (SELECT rowid FROM edit_history_fts WHERE edit_history_fts MATCH ?)"
+                f" OR {user_match})"
+            )
+            params.append(fts_query)
+        else:
+            where_clauses.append(user_match)
+        params.append(search_term.lower())
+    return where_clauses, params
 
-    if where_clauses:
-        base_query += " WHERE " + " AND ".join(where_clauses)
 
-    # Add ordering and pagination
-    base_query += " ORDER BY h.timestamp DESC LIMIT ? OFFSET ?"
-    params.append(per_page)
-    params.append((page - 1) * per_page)
+def encode_history_cursor(timestamp, history_id):
+    """Encodes a (timestamp, history_id) position in the history as an opaque URL-safe cursor."""
+    raw = f"{timestamp}|{history_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
 
-    return db.execute(base_query, params).fetchall()
+def decode_history_cursor(cursor):
+    """Decodes a cursor from encode_history_cursor(). Returns None if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        timestamp, history_id = raw.rsplit('|', 1)
+        return timestamp, int(history_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
 
 
-def get_history_count(user_id=None, action=None, start_date=None, end_date=None, search_term=None):
+def get_history(per_page=50, cursor=None, newer=False, user_id=None, action=None, start_date=None,
+                end_date=None, search_term=None):
     """
-    Gets the total count of history items for the given filters.
+    Fetches one page of the filtered edit history, newest first, using keyset
+    pagination on (timestamp, history_id). Without a cursor this is the newest
+    page (or the oldest one when `newer` is set). With a cursor it is the page
+    of entries older than the cursor, or newer than it when `newer` is set.
+    Returns (items, older_cursor, newer_cursor); a cursor is None when there is
+    nothing further in that direction.
     """
     db = get_db()
-    params = []
-    where_clauses = []
+    where_clauses, params = _history_filter_sql(user_id, action, start_date, end_date, search_term)
 
-    base_query = "SELECT COUNT(h.history_id) FROM edit_history h"
+    position = decode_history_cursor(cursor) if cursor else None
+    if position:
+        where_clauses.append("(h.timestamp, h.history_id) > (?, ?)" if newer else "(h.timestamp, h.history_id) < (?, ?)")
+        params.extend(position)
 
-    # Join is only needed if filtering by username (part of search_term)
-    if search_term:
-        base_query += " JOIN users u ON h.user_id = u.user_id"
-
-    if user_id:
-        where_clauses.append("h.user_id = ?")
-        params.append(user_id)
-    if action:
-        where_clauses.append("h.action = ?")
-        params.append(action)
-    if start_date:
-        where_clauses.append("h.timestamp >= ?")
-        params.append(start_date)
-    if end_date:
-        where_clauses.append("h.timestamp < date(?, '+1 day')")
-        params.append(end_date)
-    if search_term:
-        search_like = f"%{search_term}%"
-        where_clauses.append("(h.table_name LIKE ? OR h.record_pk LIKE ? OR h.details LIKE ? OR u.username LIKE ?)")
-        params.extend([search_like] * 4)
+    query = """
+        SELECT h.*, u.username, CAST(h.timestamp AS TEXT) AS cursor_timestamp
+        FROM edit_history h
+        JOIN users u ON h.user_id = u.user_id
+    """
+    if where_clauses:
+        query += " WHERE " + " AND ".join(where_clauses)
+    order = "ASC" if newer else "DESC"
+    # One extra row tells whether there is another page in this direction.
+    query += f" ORDER BY h.timestamp {order}, h.history_id {order} LIMIT ?"
+    rows = db.execute(query, params + [per_page + 1]).fetchall()
+
+    has_more = len(rows) > per_page
+    items = rows[:per_page]
+    if newer:
+        items.reverse()
+    if not items:
+        return [], None, None
+
+    first = encode_history_cursor(items[0]['cursor_timestamp'], items[0]['history_id'])
+    last = encode_history_cursor(items[-1]['cursor_timestamp'], items[-1]['history_id'])
+    if newer:
+        return items, last if position else None, first if has_more else None
+    return items, last if has_more else None, first if position else None
+
+
+@cached_read
+def get_history_count(user_id=None, action=None, start_date=None, end_date=None, search_term=None, cap=None):
+    """
+    Gets the total count of history items for the given filters. With `cap`,
+    counting stops after cap + 1 rows, so a result above `cap` means "more
+    than cap". Counts are cached until the data changes.
+    """
+    db = get_db()
+    where_clauses, params = _history_filter_sql(user_id, action, start_date, end_date, search_term)
 
+    query = "SELECT 1 FROM edit_history h"
     if where_clauses:
-        base_query += " WHERE " + " AND ".join(where_clauses)
+        query += " WHERE " + " AND ".join(where_clauses)
+    if cap is not None:
+        query += " LIMIT ?"
+        params.append(cap + 1)
 
-    return db.execute(base_query, params).fetchone()[0]
+    return db.execute(f"SELECT COUNT(*) FROM ({query})", params).fetchone()[0]
 
 
+@cached_read
 def get_distinct_actions():
     """Returns a list of unique action strings from the history table."""
     db = get_db()
@@ -141,6 +224,7 @@ def get_user_by_id(user_id):
     return db.execute("SELECT * FROM users WHERE user_id = ?", (user_id,)).fetchone()
 
 
+@write_operation
 def add_user(username, email, password_hash, role, current_user_id):
     """Adds a new user to the database."""
     try:
@@ -159,6 +243,7 @@ def add_user(username, email, password_hash, role, current_user_id):
         return False, f"Database error: {e}"
 
 
+@write_operation
 def update_user(user_id, form_data, current_user_id):
     """Updates a user's profile information."""
     username = form_data['username']
@@ -195,6 +280,7 @@ def update_user(user_id, form_data, current_user_id):
         return False, f"A database error occurred: {e}"
 
 
+@write_operation
 def delete_user(user_id_to_delete, current_user_id):
     """Deletes a user from the database."""
     try:
@@ -221,6 +307,7 @@ def get_all_exceptions():
     return db.execute("SELECT * FROM exceptions WHERE is_deleted = FALSE ORDER BY created_at DESC").fetchall()
 
 
+@write_operation
 def add_exception(form_data, user_id):
     """Adds a new TCID to the exceptions list."""
     tc_id = _strip_tcid_prefix(form_data.get('tc_id'))
@@ -249,6 +336,7 @@ def add_exception(form_data, user_id):
 
 # --- Data Fetching (Read) Functions ---
 
+@cached_read
 def get_metric_status_details(metric_type, metric_name):
     """
     Gathers all details for a single metric for its status page.
@@ -257,8 +345,6 @@ def get_metric_status_details(metric_type, metric_name):
         return None
 
     db = get_db()
-    exception_tcids = _get_exception_tcid_set()
-    placeholders = ','.join('?' for _ in exception_tcids)
 
     # 1. Get primary metric details
     metric_table = f"{metric_type}_metrics"
@@ -280,11 +366,10 @@ def get_metric_status_details(metric_type, metric_name):
           AND l.metric_type = ?
           AND l.is_deleted = FALSE
           AND c.is_deleted = FALSE
-          AND c.tc_id NOT IN ({placeholders or '""'})
+          AND {_NOT_EXCEPTED_SQL}
         ORDER BY c.tc_id, l.engine, l.region
     """
-    params = [metric_name, metric_type.capitalize()] + list(exception_tcids)
-    existing_coverage = db.execute(existing_coverage_query, params).fetchall()
+    existing_coverage = db.execute(existing_coverage_query, (metric_name, metric_type.capitalize())).fetchall()
 
     # 3. Get planned coverage
     planned_coverage = db.execute(
@@ -300,184 +385,376 @@ def get_metric_status_details(metric_type, metric_name):
     }
 
 
+@cached_read
 def get_supported_engines():
     """Fetches the list of supported search engines."""
     return get_db().execute("SELECT name FROM supported_engines ORDER BY name").fetchall()
 
 
-def get_glean_metrics():
-    """Fetches all non-deleted Glean metrics from the database."""
-    db = get_db()
-    return db.execute("SELECT * FROM glean_metrics WHERE is_deleted = FALSE ORDER BY glean_name").fetchall()
+@write_operation
+def add_supported_engine(engine_name, user_id):
+    """Adds a new supported engine. Returns False if it already exists."""
+    try:
+        conn = get_db()
+        conn.execute("INSERT INTO supported_engines (name) VALUES (?)", (engine_name,))
+        log_edit(user_id, 'add_engine', 'supported_engines', engine_name)
+        conn.commit()
+        return True
+    except sqlite3.IntegrityError:
+        get_db().rollback()
+        return False
 
 
-def get_legacy_metrics():
-    """Fetches all non-deleted Legacy metrics from the database."""
-    db = get_db()
-    return db.execute("SELECT * FROM legacy_metrics WHERE is_deleted = FALSE ORDER BY legacy_name").fetchall()
+@write_operation
+def delete_supported_engine(engine_name, user_id):
+    """Deletes a supported engine."""
+    conn = get_db()
+    conn.execute("DELETE FROM supported_engines WHERE name = ?", (engine_name,))
+    log_edit(user_id, 'delete_engine', 'supported_engines', engine_name)
+    conn.commit()
+
+
+@cached_read
+def get_supported_regions():
+    """Fetches the list of region codes recognised by the extraction tools."""
+    return get_db().execute("SELECT name FROM supported_regions ORDER BY name").fetchall()
+
+
+@write_operation
+def add_supported_region(region_name, user_id):
+    """Adds a new supported region. Returns False if it already exists."""
+    try:
+        conn = get_db()
+        conn.execute("INSERT INTO supported_regions (name) VALUES (?)", (region_name,))
+        log_edit(user_id, 'add_region', 'supported_regions', region_name)
+        conn.commit()
+        return True
+    except sqlite3.IntegrityError:
+        get_db().rollback()
+        return False
 
 
-def get_all_coverage_details():
+@write_operation
+def delete_supported_region(region_name, user_id):
+    """Deletes a supported region."""
+    conn = get_db()
+    conn.execute("DELETE FROM supported_regions WHERE name = ?", (region_name,))
+    log_edit(user_id, 'delete_region', 'supported_regions', region_name)
+    conn.commit()
+
+
+@cached_read
+def get_metric_name_index():
     """
-    Gathers and structures all test case coverage data, excluding excepted TCIDs.
+    Maps every active metric name to its type ("Glean", "Legacy", or
+    "Glean/Legacy" for a name defined in both tables). Built with two
+    queries and cached until the data changes, so the extraction tools can
+    check any number of candidate names without touching the database.
     """
     db = get_db()
-    exception_tcids = _get_exception_tcid_set()
-    placeholders = ','.join('?' for _ in exception_tcids)
+    index = {row[0]: 'Glean' for row in db.execute(
+        "SELECT glean_name FROM glean_metrics WHERE is_deleted = FALSE")}
+    for (name,) in db.execute("SELECT legacy_name FROM legacy_metrics WHERE is_deleted = FALSE"):
+        index[name] = 'Glean/Legacy' if name in index else 'Legacy'
+    return index
 
-    query = f"""
-        SELECT
-            l.metric_name, l.metric_type, l.region, l.engine, c.tc_id, c.tcid_title
-        FROM coverage_to_metric_link l
-        JOIN coverage c ON l.coverage_id = c.coverage_id
-        WHERE l.is_deleted = FALSE AND c.is_deleted = FALSE
-        AND c.tc_id NOT IN ({placeholders or '""'})
-        ORDER BY l.metric_name, c.tc_id, l.region, l.engine
-    """
-    rows = db.execute(query, list(exception_tcids)).fetchall()
-
-    coverage_by_metric = defaultdict(list)
-    for row in rows:
-        key = (row['metric_name'], row['metric_type'])
-        coverage_by_metric[key].append({
-            'region': row['region'],
-            'engine': row['engine'],
-            'tc_id': row['tc_id'],
-            'tcid_title': row['tcid_title']
-        })
 
-    coverage_data = []
-    for (metric_name, metric_type), details in coverage_by_metric.items():
-        region_count = len(set(d['region'] for d in details if d['region']))
-        engine_count = len(set(d['engine'] for d in details if d['engine']))
-        coverage_data.append({
-            'metric_name': metric_name,
-            'metric_type': metric_type,
-            'details': details,
-            'region_count': region_count,
-            'engine_count': engine_count
-        })
-
-    metric_types_query = """
+@cached_read
+def get_metric_types():
+    """Fetches the distinct metric types of Glean and Legacy metrics for the type filter."""
+    db = get_db()
+    query = """
         SELECT DISTINCT metric_type as name, 'Glean' as source FROM glean_metrics WHERE metric_type IS NOT NULL
         UNION
         SELECT DISTINCT metric_type as name, 'Legacy' as source FROM legacy_metrics WHERE metric_type IS NOT NULL
         ORDER BY name
     """
-    metric_types = db.execute(metric_types_query).fetchall()
+    return db.execute(query).fetchall()
+
+
+# --- Paged Metrics Views ---
+
+# Columns the paged /metrics tables may be sorted by. Keys are the values
+# accepted from the client; values are the SQL expressions they map to.
+COVERAGE_SORT_COLUMNS = {
+    'metric_name': 's.metric_name COLLATE NOCASE',
+    'metric_type': 's.metric_type',
+    'region_count': 's.region_count',
+    'engine_count': 's.engine_count',
+    'tcid_count': 's.tcid_count',
+}
+DEFINITION_SORT_COLUMNS = {
+    'name': 'name COLLATE NOCASE',
+    'metric_type': 'm.metric_type COLLATE NOCASE',
+    'expiration': 'm.expiration',
+}
+# source -> (table, name column, metric_type used in coverage links)
+METRIC_DEFINITION_TABLES = {
+    'glean': ('glean_metrics', 'glean_name', 'Glean'),
+    'legacy': ('legacy_metrics', 'legacy_name', 'Legacy'),
+}
+
+
+def _page_bounds(page, per_page, total):
+    """Clamps `page` to the available pages and returns (page, total_pages, offset)."""
+    total_pages = max(1, math.ceil(total / per_page))
+    page = max(1, min(page, total_pages))
+    return page, total_pages, (page - 1) * per_page
+
+
+def _link_filter_sql(region=None, engine=None, search=None):
+    """
+    Builds the conditions on effective_coverage_links `l` used by the region,
+    engine and text filters. Returns (sql conditions, params).
+    """
+    conditions, params = [], []
+    if region:
+        conditions.append("l.region = ? COLLATE NOCASE")
+        params.append(region)
+    if engine:
+        conditions.append("l.engine = ? COLLATE NOCASE")
+        params.append(engine)
+    if search:
+        conditions.append(
+            "(instr(lower(l.tc_id), ?) > 0 OR instr(lower(ifnull(l.region, '')), ?) > 0"
+            " OR instr(lower(ifnull(l.engine, '')), ?) > 0)"
+        )
+        params.extend([search.lower()] * 3)
+    return conditions, params
+
+
+def _order_by_sql(sort_columns, sort, descending, tiebreak):
+    if sort not in sort_columns:
+        raise ValueError(f"Cannot sort by '{sort}'.")
+    direction = 'DESC' if descending else 'ASC'
+    return f"ORDER BY {sort_columns[sort]} {direction}, {tiebreak}"
+
+
+@cached_read
+def get_metric_page_counts():
+    """Returns the unfiltered row count of each table on the /metrics page."""
+    db = get_db()
+    return {
+        'coverage': db.execute("SELECT COUNT(*) FROM metric_coverage_summary WHERE tcid_count > 0").fetchone()[0],
+        'glean': db.execute("SELECT COUNT(*) FROM glean_metrics WHERE is_deleted = FALSE").fetchone()[0],
+        'legacy': db.execute("SELECT COUNT(*) FROM legacy_metrics WHERE is_deleted = FALSE").fetchone()[0],
+    }
+
+
+@cached_read
+def get_coverage_page(page=1, per_page=50, metric_type=None, region=None, engine=None, search=None,
+                      sort='metric_name', descending=False):
+    """
+    Fetches one page of covered metrics with their region, engine and TCID counts.
+    A metric matches the text search through its name or through any TC ID,
+    region or engine it is covered by. The per-metric breakdown is fetched
+    separately with get_metric_breakdowns().
+    Raises ValueError for an unknown sort column.
+    """
+    db = get_db()
+    order_by = _order_by_sql(COVERAGE_SORT_COLUMNS, sort, descending, 's.metric_name, s.metric_type')
+
+    where, params = ["s.tcid_count > 0"], []
+    if metric_type:
+        where.append("instr(lower(s.metric_type), ?) > 0")
+        params.append(metric_type.lower())
+
+    link_conditions, link_params = _link_filter_sql(region, engine)
+    if link_conditions:
+        where.append(f"""EXISTS (SELECT 1 FROM effective_coverage_links l
+            WHERE l.metric_name = s.metric_name AND l.metric_type = s.metric_type
+            AND {' AND '.join(link_conditions)})""")
+        params.extend(link_params)
+    if search:
+        search_conditions, search_params = _link_filter_sql(search=search)
+        where.append(f"""(instr(lower(s.metric_name), ?) > 0 OR EXISTS (SELECT 1 FROM effective_coverage_links l
+            WHERE l.metric_name = s.metric_name AND l.metric_type = s.metric_type
+            AND {search_conditions[0]}))""")
+        params.extend([search.lower()] + search_params)
+
+    where_sql = ' AND '.join(where)
+    total = db.execute(f"SELECT COUNT(*) FROM metric_coverage_summary s WHERE {where_sql}", params).fetchone()[0]
+    page, total_pages, offset = _page_bounds(page, per_page, total)
+
+    rows = db.execute(f"""
+        SELECT s.metric_name, s.metric_type, s.tcid_count, s.region_count, s.engine_count
+        FROM metric_coverage_summary s
+        WHERE {where_sql}
+        {order_by}
+        LIMIT ? OFFSET ?
+    """, params + [per_page, offset]).fetchall()
+
+    items = [dict(row) for row in rows]
+    return {'items': items, 'page': page, 'per_page': per_page, 'total': total, 'total_pages': total_pages}
+
+
+@cached_read
+def get_metric_definitions_page(source, page=1, per_page=50, metric_type=None, region=None, engine=None,
+                                search=None, sort='name', descending=False):
+    """
+    Fetches one page of Glean or Legacy metric definitions. The region and
+    engine filters keep only metrics covered in that region or engine.
+    Raises ValueError for an unknown source or sort column.
+    """
+    if source not in METRIC_DEFINITION_TABLES:
+        raise ValueError(f"Unknown metric source '{source}'.")
+    table, name_column, link_type = METRIC_DEFINITION_TABLES[source]
+    db = get_db()
+    order_by = _order_by_sql(DEFINITION_SORT_COLUMNS, sort, descending, 'name')
 
-    sorted_coverage_data = sorted(coverage_data, key=lambda x: x['metric_name'].lower())
-    return sorted_coverage_data, metric_types
+    where, params = ["m.is_deleted = FALSE"], []
+    if metric_type:
+        where.append("instr(lower(ifnull(m.metric_type, '')), ?) > 0")
+        params.append(metric_type.lower())
+    if search:
+        where.append(f"instr(lower(m.{name_column}), ?) > 0")
+        params.append(search.lower())
 
+    link_conditions, link_params = _link_filter_sql(region, engine)
+    if link_conditions:
+        where.append(f"""EXISTS (SELECT 1 FROM effective_coverage_links l
+            WHERE l.metric_name = m.{name_column} AND l.metric_type = ?
+            AND {' AND '.join(link_conditions)})""")
+        params.extend([link_type] + link_params)
 
+    where_sql = ' AND '.join(where)
+    total = db.execute(f"SELECT COUNT(*) FROM {table} m WHERE {where_sql}", params).fetchone()[0]
+    page, total_pages, offset = _page_bounds(page, per_page, total)
+
+    rows = db.execute(f"""
+        SELECT m.{name_column} AS name, m.metric_type, m.expiration, m.description
+        FROM {table} m
+        WHERE {where_sql}
+        {order_by}
+        LIMIT ? OFFSET ?
+    """, params + [per_page, offset]).fetchall()
+
+    return {'items': [dict(row) for row in rows], 'page': page, 'per_page': per_page,
+            'total': total, 'total_pages': total_pages}
+
+
+
+# Metrics per IN (VALUES ...) query; keeps the bound parameters well under SQLite's limit.
+_BREAKDOWN_CHUNK_SIZE = 250
+
+
+@cached_read
+def get_metric_breakdowns(metrics):
+    """
+    Fetches the coverage breakdown of each (metric_name, metric_type) pair in
+    `metrics`: the existing TC ID / region / engine links (excepted TCIDs left
+    out) and the open planning entries. Returns a list in the order given.
+    """
+    db = get_db()
+    keys = list(dict.fromkeys((name, metric_type) for name, metric_type in metrics))
+    breakdowns = {key: {'metric_name': key[0], 'metric_type': key[1], 'existing': [], 'planned': []} for key in keys}
+
+    for start in range(0, len(keys), _BREAKDOWN_CHUNK_SIZE):
+        chunk = keys[start:start + _BREAKDOWN_CHUNK_SIZE]
+        placeholders = ', '.join(['(?, ?)'] * len(chunk))
+        params = [value for key in chunk for value in key]
+
+        existing_rows = db.execute(f"""
+            SELECT metric_name, metric_type, region, engine, tc_id, tcid_title
+            FROM effective_coverage_links
+            WHERE (metric_name, metric_type) IN (VALUES {placeholders})
+            ORDER BY ifnull(engine, ''), ifnull(region, ''), tc_id
+        """, params).fetchall()
+        for row in existing_rows:
+            breakdowns[(row['metric_name'], row['metric_type'])]['existing'].append({
+                'region': row['region'],
+                'engine': row['engine'],
+                'tc_id': row['tc_id'],
+                'tcid_title': row['tcid_title']
+            })
+
+        planned_rows = db.execute(f"""
+            SELECT planning_id, metric_name, metric_type, region, engine
+            FROM planning
+            WHERE is_deleted = FALSE AND (metric_name, metric_type) IN (VALUES {placeholders})
+            ORDER BY planning_id
+        """, params).fetchall()
+        for row in planned_rows:
+            breakdowns[(row['metric_name'], row['metric_type'])]['planned'].append({
+                'planning_id': row['planning_id'],
+                'region': row['region'],
+                'engine': row['engine']
+            })
+
+    return [breakdowns[key] for key in keys]
+
+@cached_read
 def get_planning_page_data():
     """Gathers and structures all data for the planning page, excluding excepted TCIDs."""
     db = get_db()
-    exception_tcids = _get_exception_tcid_set()
-    placeholders = ','.join('?' for _ in exception_tcids)
 
+    # Coverage counts come from the trigger-maintained summary table.
     metrics_query = """
-        SELECT glean_name AS metric_name, 'Glean' AS metric_type, metric_type as specific_metric_type, priority, notes
-        FROM glean_metrics WHERE is_deleted = FALSE
-        UNION ALL
-        SELECT legacy_name AS metric_name, 'Legacy' AS metric_type, metric_type as specific_metric_type, priority, notes
-        FROM legacy_metrics WHERE is_deleted = FALSE
+        SELECT m.metric_name, m.metric_type, m.specific_metric_type, m.priority, m.notes,
+               COALESCE(s.tcid_count, 0) AS tcid_count,
+               COALESCE(s.region_count, 0) AS region_count,
+               COALESCE(s.engine_count, 0) AS engine_count,
+               (SELECT COUNT(*) FROM planning p
+                WHERE p.metric_name = m.metric_name AND p.metric_type = m.metric_type
+                AND p.is_deleted = FALSE) AS planned_count
+        FROM (
+            SELECT glean_name AS metric_name, 'Glean' AS metric_type, metric_type as specific_metric_type, priority, notes
+            FROM glean_metrics WHERE is_deleted = FALSE
+            UNION ALL
+            SELECT legacy_name AS metric_name, 'Legacy' AS metric_type, metric_type as specific_metric_type, priority, notes
+            FROM legacy_metrics WHERE is_deleted = FALSE
+        ) m
+        LEFT JOIN metric_coverage_summary s ON s.metric_name = m.metric_name AND s.metric_type = m.metric_type
     """
     all_metrics = db.execute(metrics_query).fetchall()
 
-    existing_coverage_query = f"""
-        SELECT l.metric_name, l.metric_type, l.region, l.engine, c.tc_id, c.tcid_title
-        FROM coverage_to_metric_link l
-        JOIN coverage c ON l.coverage_id = c.coverage_id
-        WHERE l.is_deleted = FALSE AND c.is_deleted = FALSE
-        AND c.tc_id NOT IN ({placeholders or '""'})
-    """
-    existing_coverage_rows = db.execute(existing_coverage_query, list(exception_tcids)).fetchall()
-    metric_to_existing_tcs = defaultdict(list)
-    for row in existing_coverage_rows:
-        metric_to_existing_tcs[(row['metric_name'], row['metric_type'])].append(row)
-
-    planned_entries_query = "SELECT * FROM planning WHERE is_deleted = FALSE"
-    planned_rows = db.execute(planned_entries_query).fetchall()
-    metric_to_planned_tcs = defaultdict(list)
-    for row in planned_rows:
-        metric_to_planned_tcs[(row['metric_name'], row['metric_type'])].append(row)
-
-    planning_data = []
-    for metric in all_metrics:
-        key = (metric['metric_name'], metric['metric_type'])
-        existing_links = metric_to_existing_tcs.get(key, [])
-        tcid_count = len(set(link['tc_id'] for link in existing_links))
-        region_count = len(set(link['region'] for link in existing_links if link['region']))
-        engine_count = len(set(link['engine'] for link in existing_links if link['engine']))
-
-        planning_data.append({
+    planning_data = [
+        {
             'metric_name': metric['metric_name'],
             'metric_type': metric['metric_type'],
             'specific_metric_type': metric['specific_metric_type'],
             'priority': metric['priority'],
             'notes': metric['notes'],
-            'tcid_count': tcid_count,
-            'region_count': region_count,
-            'engine_count': engine_count,
-        })
-
-    metric_types_query = """
-        SELECT DISTINCT metric_type as name, 'Glean' as source FROM glean_metrics WHERE metric_type IS NOT NULL
-        UNION
-        SELECT DISTINCT metric_type as name, 'Legacy' as source FROM legacy_metrics WHERE metric_type IS NOT NULL
-        ORDER BY name
-    """
-    metric_types = db.execute(metric_types_query).fetchall()
+            'tcid_count': metric['tcid_count'],
+            'region_count': metric['region_count'],
+            'engine_count': metric['engine_count'],
+            'planned_count': metric['planned_count'],
+        }
+        for metric in all_metrics
+    ]
 
     return {
         'planning_data': sorted(planning_data, key=lambda x: x['metric_name'].lower()),
-        'metric_to_existing_tcs': metric_to_existing_tcs,
-        'metric_to_planned_tcs': metric_to_planned_tcs,
-        'metric_types': metric_types,
+        'metric_types': get_metric_types(),
     }
 
 
+@cached_read
 def get_report_data():
     """Gathers aggregated data for the reports page, excluding excepted TCIDs."""
     db = get_db()
-    exception_tcids = _get_exception_tcid_set()
-    placeholders = ','.join('?' for _ in exception_tcids)
 
     all_metrics_query = """
-        SELECT glean_name AS name, 'Glean' as type, metric_type as specific_type FROM glean_metrics WHERE is_deleted = FALSE
-        UNION ALL
-        SELECT legacy_name AS name, 'Legacy' as type, metric_type as specific_type FROM legacy_metrics WHERE is_deleted = FALSE
+        SELECT m.name, m.type, m.specific_type, COALESCE(s.tcid_count, 0) AS tcid_count
+        FROM (
+            SELECT glean_name AS name, 'Glean' as type, metric_type as specific_type FROM glean_metrics WHERE is_deleted = FALSE
+            UNION ALL
+            SELECT legacy_name AS name, 'Legacy' as type, metric_type as specific_type FROM legacy_metrics WHERE is_deleted = FALSE
+        ) m
+        LEFT JOIN metric_coverage_summary s ON s.metric_name = m.name AND s.metric_type = m.type
     """
     all_metrics = db.execute(all_metrics_query).fetchall()
 
-    covered_metrics_query = f"""
-        SELECT l.metric_name, l.metric_type, c.tc_id
-        FROM coverage_to_metric_link l
-        JOIN coverage c ON l.coverage_id = c.coverage_id
-        WHERE l.is_deleted = FALSE AND c.is_deleted = FALSE
-        AND c.tc_id NOT IN ({placeholders or '""'})
-    """
-    covered_metrics_rows = db.execute(covered_metrics_query, list(exception_tcids)).fetchall()
-
-    metric_to_tcids = defaultdict(set)
-    for row in covered_metrics_rows:
-        metric_key = (row['metric_name'], row['metric_type'])
-        metric_to_tcids[metric_key].add(row['tc_id'])
-
-    report_data = []
-    for metric in all_metrics:
-        metric_key = (metric['name'], metric['type'])
-        tcid_count = len(metric_to_tcids.get(metric_key, set()))
-        is_covered = tcid_count > 0
-
-        report_data.append({
+    report_data = [
+        {
             'name': metric['name'],
             'type': metric['type'],
             'specific_type': metric['specific_type'],
-            'covered': is_covered,
-            'tcid_count': tcid_count
-        })
+            'covered': metric['tcid_count'] > 0,
+            'tcid_count': metric['tcid_count']
+        }
+        for metric in all_metrics
+    ]
 
     metric_types = db.execute("""
         SELECT DISTINCT metric_type as name, 'Glean' as source FROM glean_metrics WHERE metric_type IS NOT NULL
@@ -485,27 +762,17 @@ def get_report_data():
         ORDER BY name
     """).fetchall()
 
-    return sorted(report_data, key=lambda x: x['name'].lower()), metric_types, metric_to_tcids
+    return sorted(report_data, key=lambda x: x['name'].lower()), metric_types
 
 
+@cached_read
 def get_general_stats():
     """Calculates high-level statistics for the reports page, excluding excepted TCIDs."""
     db = get_db()
-    exception_tcids = _get_exception_tcid_set()
-    placeholders = ','.join('?' for _ in exception_tcids)
 
     def get_covered_count(metric_type):
-        query = f"""
-            SELECT COUNT(DISTINCT l.metric_name)
-            FROM coverage_to_metric_link l
-            JOIN coverage c ON l.coverage_id = c.coverage_id
-            WHERE l.metric_type = ?
-              AND l.is_deleted = FALSE
-              AND c.is_deleted = FALSE
-              AND c.tc_id NOT IN ({placeholders or '""'})
-        """
-        params = [metric_type] + list(exception_tcids)
-        return db.execute(query, params).fetchone()[0]
+        query = "SELECT COUNT(*) FROM metric_coverage_summary WHERE metric_type = ? AND tcid_count > 0"
+        return db.execute(query, (metric_type,)).fetchone()[0]
 
     stats = {
         'total_glean_metrics': db.execute("SELECT COUNT(*) FROM glean_metrics WHERE is_deleted = FALSE").fetchone()[0],
@@ -517,21 +784,262 @@ def get_general_stats():
     return stats
 
 
-def get_search_suggestions():
-    """Provides a list of terms for search autofill."""
+@cached_read
+def get_coverage_matrix():
+    """
+    Builds the metric x region x engine coverage cube (see
+    app/services/coverage_matrix.py) over every active metric, the
+    supported regions and the supported engines. The links are read in one
+    pass over effective_coverage_links, so excepted TCIDs do not count.
+    Links without a region or engine, or with one outside the supported
+    lists, cover no combination. Cached until the data changes.
+    """
+    db = get_db()
+    metrics = db.execute("""
+        SELECT glean_name, 'Glean', priority FROM glean_metrics WHERE is_deleted = FALSE
+        UNION ALL
+        SELECT legacy_name, 'Legacy', priority FROM legacy_metrics WHERE is_deleted = FALSE
+        ORDER BY 1, 2
+    """).fetchall()
+    matrix = CoverageMatrix(
+        [row['name'] for row in get_supported_regions()],
+        [row['name'] for row in get_supported_engines()],
+        [tuple(row) for row in metrics]
+    )
+    for link in db.execute("""
+        SELECT metric_name, metric_type, region, engine FROM effective_coverage_links
+        WHERE region IS NOT NULL AND engine IS NOT NULL
+    """):
+        matrix.add(*link)
+    return matrix
+
+
+# Values of the `status` argument of get_coverage_matrix_slice().
+MATRIX_STATUSES = ('uncovered', 'covered')
+
+
+def get_coverage_matrix_slice(metric_type=None, priority=None, regions=None, engines=None, status='uncovered'):
+    """
+    Answers a question such as "uncovered combinations of P1 Glean metrics"
+    from the coverage cube. Filters left as None (or empty) match
+    everything. Returns a dict with the regions, the engines, a heatmap of
+    how many selected metrics cover each combination (None outside the
+    requested regions and engines) and the metrics with their uncovered
+    (or covered) combinations.
+    Raises ValueError for an unknown status, region or engine.
+    """
+    if status not in MATRIX_STATUSES:
+        raise ValueError(f"Unknown status '{status}'. Choose from: {', '.join(MATRIX_STATUSES)}.")
+    matrix = get_coverage_matrix()
+    combos = matrix.combo_mask(regions, engines)
+    metric_mask = matrix.metric_mask(metric_type, priority)
+    metrics = [
+        {'metric_name': name, 'metric_type': type_, 'priority': priority_,
+         'combinations': [{'region': region, 'engine': engine} for region, engine in pairs]}
+        for (name, type_, priority_), pairs in matrix.metric_slice(metric_mask, combos, uncovered=status == 'uncovered')
+    ]
+    return {
+        'regions': matrix.regions,
+        'engines': matrix.engines,
+        'metric_count': metric_mask.bit_count(),
+        'combination_count': combos.bit_count(),
+        'heatmap': matrix.heatmap(metric_mask, combos),
+        'status': status,
+        'metrics': metrics,
+    }
+
+
+def find_coverage_gaps(policies):
+    """
+    Compares every metric's coverage with target `policies` and returns the
+    missing combinations as a list of (metric_name, metric_type, region,
+    engine), without duplicates. A policy is a dict with optional keys
+    'metric_type' and 'priority' (which metrics it applies to; missing or
+    None matches any) and 'regions' and 'engines' (the combinations those
+    metrics must be covered for; missing or None means every supported
+    one). Each policy is a few bitset operations on the cached coverage
+    matrix across all metrics at once, so this is cheap to run after every import.
+    Raises ValueError for a policy naming an unsupported region or engine.
+    """
+    matrix = get_coverage_matrix()
+    gaps = {}
+    for policy in policies:
+        combos = matrix.combo_mask(policy.get('regions'), policy.get('engines'))
+        metric_mask = matrix.metric_mask(policy.get('metric_type'), policy.get('priority'))
+        for (name, metric_type, _), pairs in matrix.metric_slice(metric_mask, combos, uncovered=True):
+            for region, engine in pairs:
+                gaps[(name, metric_type, region, engine)] = None
+    return list(gaps)
+
+
+@write_operation
+def add_gap_plans(gaps, user_id):
+    """
+    Adds a planning entry for each (metric_name, metric_type, region,
+    engine) gap that is not planned yet, in one transaction. Existing plans
+    are matched ignoring the case of the region and engine.
+    Returns (added_count, already_planned_count).
+    """
+    conn = get_db()
+    planned = {
+        (row['metric_name'], row['metric_type'], (row['region'] or '').upper(), (row['engine'] or '').lower())
+        for row in conn.execute("SELECT metric_name, metric_type, region, engine FROM planning")
+    }
+    new_plans = [gap for gap in gaps if (gap[0], gap[1], gap[2].upper(), gap[3].lower()) not in planned]
+    if not new_plans:
+        return 0, len(gaps)
+    conn.executemany(
+        "INSERT OR IGNORE INTO planning (metric_name, metric_type, region, engine) VALUES (?, ?, ?, ?)", new_plans)
+
+    manifest = [{'metric': name, 'type': metric_type, 'region': region, 'engine': engine}
+                for name, metric_type, region, engine in new_plans]
+    log_bulk_edit(user_id, 'plan_coverage_gaps', 'planning', manifest,
+                  f"Planned {len(manifest)} missing region/engine combinations from the coverage policies.")
+    conn.commit()
+    return len(new_plans), len(gaps) - len(new_plans)
+
+
+def plan_coverage_gaps(policies, user_id):
+    """
+    Runs the gap analysis (find_coverage_gaps) and bulk-adds the missing
+    combinations to the planning table (add_gap_plans). The gaps are found
+    outside the writer, from the cached matrix, so other writes are only
+    held up by the insert. Returns a dict with the 'gaps', 'added' and
+    'already_planned' counts.
+    """
+    gaps = find_coverage_gaps(policies)
+    added, already_planned = add_gap_plans(gaps, user_id) if gaps else (0, 0)
+    return {'gaps': len(gaps), 'added': added, 'already_planned': already_planned}
+
+
+# Suggestion scopes accepted by get_search_suggestions(), mapped to search_terms kinds.
+SUGGESTION_TYPES = {
+    'all': None,
+    'metric': ('glean', 'legacy'),
+    'glean': ('glean',),
+    'legacy': ('legacy',),
+    'tcid': ('tcid',),
+    'region': ('region',),
+    'engine': ('engine',),
+}
+
+
+def get_search_suggestions(prefix='', suggestion_type='all', limit=20):
+    """
+    Provides up to `limit` search terms starting with `prefix` (case-insensitive),
+    in alphabetical order. The terms come from the trigger-maintained
+    search_terms table (see migrations/v5.sql).
+    Raises ValueError for an unknown suggestion type.
+    """
+    if suggestion_type not in SUGGESTION_TYPES:
+        raise ValueError(f"Unknown suggestion type '{suggestion_type}'.")
     db = get_db()
-    queries = [
-        "SELECT glean_name FROM glean_metrics WHERE is_deleted = FALSE",
-        "SELECT legacy_name FROM legacy_metrics WHERE is_deleted = FALSE",
-        "SELECT tc_id FROM coverage WHERE is_deleted = FALSE",
-        "SELECT region FROM coverage_to_metric_link WHERE is_deleted = FALSE AND region IS NOT NULL",
-        "SELECT engine FROM coverage_to_metric_link WHERE is_deleted = FALSE AND engine IS NOT NULL",
+    key = (prefix or '').lower()
+
+    # A prefix match is the key range [prefix, prefix + U+10FFFF), which the index serves directly.
+    where, params = ["term_key >= ?", "term_key < ?"], [key, key + '\U0010ffff']
+    kinds = SUGGESTION_TYPES[suggestion_type]
+    if kinds:
+        # The unary + keeps the planner on the term_key range, which is already in output order.
+        where.append(f"+kind IN ({', '.join(['?'] * len(kinds))})")
+        params.extend(kinds)
+
+    rows = db.execute(f"""
+        SELECT DISTINCT term, term_key FROM search_terms
+        WHERE {' AND '.join(where)}
+        ORDER BY term_key, term
+        LIMIT ?
+    """, params + [limit]).fetchall()
+    return [row['term'] for row in rows]
+
+
+# --- Full-Text Search ---
+
+# Document kinds accepted by search_full_text(), mapped to search_index_docs kinds.
+FULL_TEXT_SEARCH_TYPES = {
+    'all': None,
+    'metric': ('glean', 'legacy'),
+    'glean': ('glean',),
+    'legacy': ('legacy',),
+    'tcid': ('tcid',),
+}
+# Relative weight of the name, body and notes columns in the bm25 ranking.
+_FTS_COLUMN_WEIGHTS = (5.0, 2.0, 1.0)
+_FTS_TOKEN_REGEX = re.compile(r'\w+')
+# Control characters mark the matched terms in snippets until they are HTML-escaped.
+_SNIPPET_OPEN, _SNIPPET_CLOSE = '\x02', '\x03'
+
+
+def _build_fts_query(text):
+    """
+    Turns free text into an FTS5 query that matches documents containing
+    every word, the last one as a prefix. Returns None if there are no words.
+    """
+    tokens = _FTS_TOKEN_REGEX.findall(text or '')
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def _snippet_to_html(snippet):
+    """HTML-escapes an FTS5 snippet and wraps the matched terms in <mark>."""
+    escaped = str(escape(snippet or ''))
+    return escaped.replace(_SNIPPET_OPEN, '<mark>').replace(_SNIPPET_CLOSE, '</mark>')
+
+
+@cached_read
+def search_full_text(text, search_type='all', page=1, per_page=20):
+    """
+    Ranked full-text search over metric names, descriptions and notes and
+    test case titles (see migrations/v6.sql). Results are ordered by bm25
+    relevance and carry an HTML snippet with the matched terms highlighted.
+    Raises ValueError for an unknown search type.
+    """
+    if search_type not in FULL_TEXT_SEARCH_TYPES:
+        raise ValueError(f"Unknown search type '{search_type}'.")
+    query = _build_fts_query(text)
+    if query is None:
+        return {'results': [], 'page': 1, 'per_page': per_page, 'total': 0, 'total_pages': 1}
+
+    db = get_db()
+    where, params = ["search_index MATCH ?"], [query]
+    kinds = FULL_TEXT_SEARCH_TYPES[search_type]
+    if kinds:
+        where.append(f"d.kind IN ({', '.join(['?'] * len(kinds))})")
+        params.extend(kinds)
+    where_sql = ' AND '.join(where)
+
+    total = db.execute(f"""
+        SELECT COUNT(*) FROM search_index
+        JOIN search_index_docs d ON d.doc_id = search_index.rowid
+        WHERE {where_sql}
+    """, params).fetchone()[0]
+    page, total_pages, offset = _page_bounds(page, per_page, total)
+
+    weights = ', '.join(str(weight) for weight in _FTS_COLUMN_WEIGHTS)
+    rows = db.execute(f"""
+        SELECT d.kind, d.ref,
+               snippet(search_index, -1, ?, ?, '...', 16) AS snippet,
+               bm25(search_index, {weights}) AS score
+        FROM search_index
+        JOIN search_index_docs d ON d.doc_id = search_index.rowid
+        WHERE {where_sql}
+        ORDER BY score
+        LIMIT ? OFFSET ?
+    """, [_SNIPPET_OPEN, _SNIPPET_CLOSE] + params + [per_page, offset]).fetchall()
+
+    results = [
+        {
+            'kind': row['kind'],
+            'name': row['ref'],
+            'snippet_html': _snippet_to_html(row['snippet']),
+            'score': row['score'],
+        }
+        for row in rows
     ]
-    suggestions = set()
-    for query in queries:
-        for row in db.execute(query).fetchall():
-            suggestions.add(row[0])
-    return sorted(list(suggestions))
+    return {'results': results, 'page': page, 'per_page': per_page, 'total': total, 'total_pages': total_pages}
 
 
 # --- Data Modification (Write) Functions ---
@@ -548,6 +1056,7 @@ def get_single_metric(metric_type, metric_name):
     return db.execute(f"SELECT * FROM {table_name} WHERE {pk_col} = ?", (metric_name,)).fetchone()
 
 
+@write_operation
 def update_metric(metric_type, metric_name, form_data, user_id):
     """Updates the details of a specific metric."""
     if metric_type not in ['glean', 'legacy']:
@@ -581,6 +1090,7 @@ def update_metric(metric_type, metric_name, form_data, user_id):
         return False, f"A database error occurred: {e}"
 
 
+@write_operation
 def update_planning_entry(data, user_id):
     """Handles all AJAX updates from the planning page."""
     action = data.get('action')
@@ -654,6 +1164,7 @@ def update_planning_entry(data, user_id):
     return {'success': True}
 
 
+@write_operation
 def add_single_metric(metric_type, form_data, user_id):
     """Adds a single Glean or Legacy metric to the database."""
     table_name = f"{metric_type}_metrics"
@@ -684,12 +1195,12 @@ def add_single_metric(metric_type, form_data, user_id):
         return False, f"A database error occurred: {e}"
 
 
+@write_operation
 def add_coverage_entry(form_data, user_id):
     """Adds a test case and links it to specified metrics, regions, and engines."""
     tc_id = _strip_tcid_prefix(form_data.get('tc_id'))
 
-    exception_tcids = _get_exception_tcid_set()
-    if tc_id in exception_tcids:
+    if _is_excepted(tc_id):
         return False, f"TCID '{tc_id}' is on the exception list and cannot be added."
 
     tcid_title = form_data.get('tcid_title')
@@ -755,6 +1266,7 @@ def add_coverage_entry(form_data, user_id):
         return False, f"A database error occurred: {e}"
 
 
+@write_operation
 def soft_delete_item(table_name, pk, user_id):
     """Marks an item as deleted in the specified table."""
     pk_columns = {
@@ -778,18 +1290,472 @@ def soft_delete_item(table_name, pk, user_id):
         return False
 
 
+# --- Coverage Snapshots ---
+
+# Values of the `source` argument of take_coverage_snapshot().
+SNAPSHOT_SOURCES = ('schedule', 'manual', 'cli')
+
+
+def _current_coverage_state(conn):
+    """Returns {(metric_type, metric_name): (tcid_count, region_count, engine_count)} for every active metric."""
+    rows = conn.execute("""
+        SELECT m.type, m.name, COALESCE(s.tcid_count, 0), COALESCE(s.region_count, 0), COALESCE(s.engine_count, 0)
+        FROM (
+            SELECT 'Glean' AS type, glean_name AS name FROM glean_metrics WHERE is_deleted = FALSE
+            UNION ALL
+            SELECT 'Legacy' AS type, legacy_name AS name FROM legacy_metrics WHERE is_deleted = FALSE
+        ) m
+        LEFT JOIN metric_coverage_summary s ON s.metric_name = m.name AND s.metric_type = m.type
+    """)
+    return {(row[0], row[1]): (row[2], row[3], row[4]) for row in rows}
+
+
+def _snapshot_state(conn, snapshot_id=None):
+    """
+    Rebuilds the per-metric state recorded by `snapshot_id` (the latest
+    snapshot when None) from the deltas, in the same shape as
+    _current_coverage_state: each metric's latest delta up to that snapshot,
+    unless it marks the metric as removed.
+    """
+    # With MAX(), SQLite takes the other columns from the row holding the maximum.
+    rows = conn.execute("""
+        SELECT metric_type, metric_name, tcid_count, region_count, engine_count, is_removed, MAX(snapshot_id)
+        FROM coverage_snapshot_deltas
+        WHERE snapshot_id <= COALESCE(?, snapshot_id)
+        GROUP BY metric_type, metric_name
+    """, (snapshot_id,))
+    return {(row[0], row[1]): (row[2], row[3], row[4]) for row in rows if not row[5]}
+
+
+@write_operation
+def take_coverage_snapshot(source, user_id=None, min_interval_hours=None):
+    """
+    Records every active metric's coverage summary as a new snapshot. Only
+    the metrics whose TCID, region or engine count changed since the
+    previous snapshot (or that were added or removed) are stored, plus the
+    metric and covered-metric counts per metric type. The counts come from
+    metric_coverage_summary, not from the link tables.
+
+    With `min_interval_hours`, nothing is recorded if a snapshot was already
+    taken in that window (checked inside the write transaction, so several
+    processes running the schedule take one snapshot between them).
+    Returns a dict with the 'snapshot_id', the 'changed' count and the
+    'totals' per metric type, or None when skipped.
+    """
+    if source not in SNAPSHOT_SOURCES:
+        raise ValueError(f"Unknown snapshot source '{source}'.")
+    conn = get_db()
+    if min_interval_hours:
+        recent = conn.execute(
+            "SELECT 1 FROM coverage_snapshots WHERE taken_at > datetime('now', ?) LIMIT 1",
+            (f"-{float(min_interval_hours)} hours",)
+        ).fetchone()
+        if recent:
+            return None
+
+    current = _current_coverage_state(conn)
+    previous = _snapshot_state(conn)
+    changed = [key + counts + (False,) for key, counts in current.items() if previous.get(key) != counts]
+    changed.extend(key + (0, 0, 0, True) for key in previous.keys() - current.keys())
+
+    totals = {metric_type: [0, 0] for metric_type in ('Glean', 'Legacy')}
+    for (metric_type, _), (tcid_count, _, _) in current.items():
+        totals[metric_type][0] += 1
+        totals[metric_type][1] += tcid_count > 0
+
+    snapshot_id = conn.execute(
+        "INSERT INTO coverage_snapshots (source, user_id, changed_count) VALUES (?, ?, ?)",
+        (source, user_id, len(changed))
+    ).lastrowid
+    conn.executemany("""
+        INSERT INTO coverage_snapshot_deltas
+            (metric_type, metric_name, tcid_count, region_count, engine_count, is_removed, snapshot_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [row + (snapshot_id,) for row in changed])
+    conn.executemany(
+        "INSERT INTO coverage_snapshot_totals (snapshot_id, metric_type, metric_count, covered_count) VALUES (?, ?, ?, ?)",
+        [(snapshot_id, metric_type, count, covered) for metric_type, (count, covered) in totals.items()]
+    )
+    log_edit(user_id, 'take_snapshot', 'coverage_snapshots', snapshot_id,
+             f"Recorded a coverage snapshot ({len(changed)} metrics changed).")
+    conn.commit()
+    return {
+        'snapshot_id': snapshot_id,
+        'changed': len(changed),
+        'totals': {metric_type: {'metric_count': count, 'covered_count': covered}
+                   for metric_type, (count, covered) in totals.items()},
+    }
+
+
+def _coverage_percent(covered, total):
+    return round(100.0 * covered / total, 2) if total else 0.0
+
+
+@cached_read
+def get_coverage_trend(days=90, metric_type=None):
+    """
+    Coverage per metric type over the last `days` days, read from the
+    snapshot totals: {'days': ..., 'series': {'Glean': [...], 'Legacy': [...]}}
+    where each point has taken_at, metric_count, covered_count and
+    coverage_percent, oldest first. `metric_type` limits the series to
+    Glean or Legacy. Raises ValueError for invalid arguments.
+    """
+    if not isinstance(days, int) or days <= 0:
+        raise ValueError("'days' must be a positive number of days.")
+    metric_types = ['Glean', 'Legacy']
+    if metric_type:
+        if metric_type.capitalize() not in metric_types:
+            raise ValueError(f"Unknown metric type '{metric_type}'.")
+        metric_types = [metric_type.capitalize()]
+
+    rows = get_db().execute(f"""
+        SELECT s.snapshot_id, CAST(s.taken_at AS TEXT) AS taken_at, t.metric_type, t.metric_count, t.covered_count
+        FROM coverage_snapshots s
+        JOIN coverage_snapshot_totals t ON t.snapshot_id = s.snapshot_id
+        WHERE s.taken_at >= datetime('now', ?)
+          AND t.metric_type IN ({", ".join("?" for _ in metric_types)})
+        ORDER BY s.taken_at, s.snapshot_id
+    """, (f"-{days} days", *metric_types)).fetchall()
+
+    series = {name: [] for name in metric_types}
+    for row in rows:
+        series[row['metric_type']].append({
+            'snapshot_id': row['snapshot_id'],
+            'taken_at': row['taken_at'],
+            'metric_count': row['metric_count'],
+            'covered_count': row['covered_count'],
+            'coverage_percent': _coverage_percent(row['covered_count'], row['metric_count']),
+        })
+    return {'days': days, 'series': series}
+
+
+@cached_read
+def get_metric_coverage_history(metric_name, metric_type):
+    """
+    The changes of one metric's coverage summary across snapshots, oldest
+    first: the snapshots where its TCID, region or engine count changed,
+    with the new counts (or removed=True when the metric was deleted).
+    """
+    rows = get_db().execute("""
+        SELECT d.snapshot_id, CAST(s.taken_at AS TEXT) AS taken_at, d.tcid_count, d.region_count, d.engine_count,
+               d.is_removed
+        FROM coverage_snapshot_deltas d
+        JOIN coverage_snapshots s ON s.snapshot_id = d.snapshot_id
+        WHERE d.metric_type = ? AND d.metric_name = ?
+        ORDER BY d.snapshot_id
+    """, ((metric_type or '').capitalize(), metric_name)).fetchall()
+    return [
+        {
+            'snapshot_id': row['snapshot_id'],
+            'taken_at': row['taken_at'],
+            'tcid_count': row['tcid_count'],
+            'region_count': row['region_count'],
+            'engine_count': row['engine_count'],
+            'removed': bool(row['is_removed']),
+        }
+        for row in rows
+    ]
+
+
+# --- Bulk Exports ---
+
+# Rows fetched from the cursor (and formatted) at a time.
+_EXPORT_BATCH_ROWS = 1000
+
+# A coverage link's last change: its own, its test case's, or the adding or
+# removing of an exception for the TCID, which flips is_excepted.
+_COVERAGE_EXPORT_UPDATED_AT = """MAX(l.updated_at, c.updated_at,
+               COALESCE((SELECT e.updated_at FROM exceptions e WHERE e.tc_id = c.tc_id), ''))"""
+
+# dataset -> (query, {filter: SQL condition}). Every condition takes the
+# filter value as its only parameter. Rows are read in primary key order.
+# updated_since is only offered where removals leave a timestamped row for
+# include_deleted to return; planning entries are deleted outright.
+EXPORT_DATASETS = {
+    'coverage': (f"""
+        SELECT c.tc_id, c.tcid_title, l.metric_name, l.metric_type, l.region, l.engine,
+               EXISTS (SELECT 1 FROM exceptions e WHERE e.tc_id = c.tc_id AND e.is_deleted = FALSE) AS is_excepted,
+               (l.is_deleted OR c.is_deleted) AS is_deleted, CAST(l.created_at AS TEXT) AS created_at,
+               {_COVERAGE_EXPORT_UPDATED_AT} AS updated_at
+        FROM coverage_to_metric_link l
+        JOIN coverage c ON c.coverage_id = l.coverage_id
+        WHERE {{conditions}}
+        ORDER BY l.link_id
+    """, {
+        'metric_type': "l.metric_type = ? COLLATE NOCASE",
+        'region': "l.region = ? COLLATE NOCASE",
+        'engine': "l.engine = ? COLLATE NOCASE",
+        'updated_since': f"{_COVERAGE_EXPORT_UPDATED_AT} >= ?",
+        'live': "l.is_deleted = FALSE AND c.is_deleted = FALSE",
+    }),
+    'metrics': ("""
+        SELECT * FROM (
+            SELECT glean_name AS metric_name, 'Glean' AS metric_type, metric_type AS category, expiration,
+                   description, priority, notes, is_deleted,
+                   CAST(created_at AS TEXT) AS created_at, CAST(updated_at AS TEXT) AS updated_at
+            FROM glean_metrics
+            UNION ALL
+            SELECT legacy_name, 'Legacy', metric_type, expiration,
+                   description, priority, notes, is_deleted, CAST(created_at AS TEXT), CAST(updated_at AS TEXT)
+            FROM legacy_metrics
+        )
+        WHERE {conditions}
+        ORDER BY metric_type, metric_name
+    """, {
+        'metric_type': "metric_type = ? COLLATE NOCASE",
+        'updated_since': "updated_at >= ?",
+        'live': "is_deleted = FALSE",
+    }),
+    'planning': ("""
+        SELECT planning_id, metric_name, metric_type, tc_id, region, engine, is_deleted,
+               CAST(created_at AS TEXT) AS created_at, CAST(updated_at AS TEXT) AS updated_at
+        FROM planning
+        WHERE {conditions}
+        ORDER BY planning_id
+    """, {
+        'metric_type': "metric_type = ? COLLATE NOCASE",
+        'region': "region = ? COLLATE NOCASE",
+        'engine': "engine = ? COLLATE NOCASE",
+        'live': "is_deleted = FALSE",
+    }),
+    'exceptions': ("""
+        SELECT tc_id, title, metrics, is_deleted, CAST(created_at AS TEXT) AS created_at,
+               CAST(updated_at AS TEXT) AS updated_at
+        FROM exceptions
+        WHERE {conditions}
+        ORDER BY exception_id
+    """, {
+        'updated_since': "updated_at >= ?",
+        'live': "is_deleted = FALSE",
+    }),
+}
+
+EXPORT_FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+def _normalize_export_timestamp(value):
+    """Turns an ISO date or date-time into the stored form: UTC, 'YYYY-MM-DD HH:MM:SS'."""
+    try:
+        moment = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"Invalid updated_since '{value}'. Use an ISO date such as 2024-05-01 or 2024-05-01T08:00:00.")
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def iter_export_rows(dataset, metric_type=None, region=None, engine=None, updated_since=None,
+                     include_deleted=False):
+    """
+    Yields the column names of an export dataset, then its rows in batches
+    (lists of tuples) read from one cursor, so memory use does not depend
+    on the table size. Deleted rows are left out unless `include_deleted`,
+    which a sync using `updated_since` needs to see removals. Planning
+    entries are deleted outright rather than marked, so the planning export
+    rejects `updated_since`: a sync must reload it in full.
+    Raises ValueError for an unknown dataset or a filter it does not support.
+    """
+    if dataset not in EXPORT_DATASETS:
+        raise ValueError(f"Unknown dataset '{dataset}'. Choose from: {', '.join(EXPORT_DATASETS)}.")
+    query, filter_sql = EXPORT_DATASETS[dataset]
+
+    filters = {'metric_type': metric_type, 'region': region, 'engine': engine}
+    if updated_since:
+        filters['updated_since'] = _normalize_export_timestamp(updated_since)
+    conditions, params = ['1 = 1'], []
+    for name, value in filters.items():
+        if not value:
+            continue
+        if name not in filter_sql:
+            raise ValueError(f"The {dataset} export cannot be filtered by {name}.")
+        conditions.append(filter_sql[name])
+        params.append(value)
+    if not include_deleted:
+        conditions.append(filter_sql['live'])
+
+    cursor = get_db().execute(query.format(conditions=' AND '.join(conditions)), params)
+    try:
+        yield [column[0] for column in cursor.description]
+        while batch := cursor.fetchmany(_EXPORT_BATCH_ROWS):
+            yield batch
+    finally:
+        cursor.close()
+
+
+def iter_export(dataset, export_format='csv', compress=False, **filters):
+    """
+    Streams an export dataset (see iter_export_rows) as CSV or NDJSON, one
+    chunk per batch of rows. The chunks are str, or gzip-compressed bytes
+    when `compress`. The filters are validated before the first row is
+    read, so ValueError is raised by this call rather than mid-stream.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown format '{export_format}'. Choose from: {', '.join(EXPORT_FORMATS)}.")
+    batches = iter_export_rows(dataset, **filters)
+    columns = next(batches)
+
+    def format_chunks():
+        buffer = io.StringIO()
+        if export_format == 'csv':
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            for batch in batches:
+                writer.writerows(batch)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue()
+        else:
+            for batch in batches:
+                yield ''.join(json.dumps(dict(zip(columns, row))) + '\n' for row in batch)
+
+    def compressed_chunks():
+        compressor = zlib.compressobj(wbits=31)  # 31: gzip container
+        for chunk in format_chunks():
+            data = compressor.compress(chunk.encode('utf-8'))
+            if data:
+                yield data
+        yield compressor.flush()
+
+    return compressed_chunks() if compress else format_chunks()
+
+
 # --- Service functions for CSV and extractions ---
 
-def bulk_import_metrics_from_csv(metric_type, file_stream, user_id):
+# Rows per import chunk, and values per IN (...) lookup inside a chunk.
+_IMPORT_CHUNK_SIZE = 5000
+_IMPORT_LOOKUP_SIZE = 500
+_METRIC_NAME_EXTRACT_REGEX = re.compile(r"^[a-zA-Z0-9_-]+(?:\.[a-zA-Z0-9_-]+)+")
+
+
+def _chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _row_fingerprint(cells):
+    """
+    Hash of a CSV row, ignoring whitespace around cells and trailing empty
+    cells, so re-exports of the same data hash alike.
+    """
+    cells = [cell.strip() for cell in cells]
+    while cells and not cells[-1]:
+        cells.pop()
+    return hashlib.blake2b('\x1f'.join(cells).encode('utf-8'), digest_size=16).digest()
+
+
+def _file_fingerprint(content):
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=16).digest()
+
+
+def _get_imported_file(kind, file_fingerprint):
+    """Returns the record of an identical file that was imported cleanly before, or None."""
+    return get_db().execute(
+        "SELECT row_count, imported_at FROM import_file_fingerprints WHERE kind = ? AND fingerprint = ?",
+        (kind, file_fingerprint)
+    ).fetchone()
+
+
+def _get_seen_fingerprints(kind, fingerprints):
+    """Returns the subset of `fingerprints` recorded by earlier imports of `kind`."""
+    seen = set()
+    for chunk in _chunked(list(set(fingerprints)), _IMPORT_LOOKUP_SIZE):
+        placeholders = ', '.join('?' * len(chunk))
+        seen.update(row[0] for row in get_db().execute(
+            f"SELECT fingerprint FROM import_row_fingerprints WHERE kind = ? AND fingerprint IN ({placeholders})",
+            [kind, *chunk]
+        ))
+    return seen
+
+
+def _skipped_status(names):
+    """Suffix of the status of a row that was applied without some of its metric names."""
+    return f" (Skipped invalid: {', '.join(names)})"
+
+
+def _row_fully_applied(status):
+    """Whether a row with this import status was applied in full: no error and no skipped metric names."""
+    return not status.startswith("Error") and "(Skipped invalid:" not in status
+
+
+def _record_fingerprints(kind, file_fingerprint, fingerprints, statuses):
+    """
+    Records the rows of an import that were applied in full (imported or
+    found to be duplicates). Failed rows, and rows whose invalid metric names
+    were skipped, are left out so the next upload retries them, e.g. once
+    the missing metrics exist. The file itself is recorded only if every
+    row was applied in full.
+    """
+    db = get_db()
+    applied = [fingerprint for fingerprint, status in zip(fingerprints, statuses) if _row_fully_applied(status)]
+    db.executemany("INSERT OR IGNORE INTO import_row_fingerprints (kind, fingerprint) VALUES (?, ?)",
+                   ((kind, fingerprint) for fingerprint in set(applied)))
+    if len(applied) == len(fingerprints):
+        db.execute(
+            "INSERT OR REPLACE INTO import_file_fingerprints (kind, fingerprint, row_count) VALUES (?, ?, ?)",
+            (kind, file_fingerprint, len(fingerprints))
+        )
+
+
+def _unchanged_file_status(imported_file):
+    return f"Unchanged: this file was already imported on {imported_file['imported_at']}."
+
+
+_UNCHANGED_ROW_STATUS = "Unchanged: this row was already imported."
+
+
+def _parse_metric_row(row, blank_expiration=None):
+    """
+    Reads one metric CSV row by column position (names, type, description,
+    expiration). Cells that are blank after stripping read as None, except
+    an expiration cell that is present but blank, which reads as
+    `blank_expiration`. Returns (metric_names, skipped_names, (metric_type,
+    description, expiration), error), skipped_names being the listed names
+    that are not valid metric names.
+    """
+    if not row or not row[0]:
+        return None, None, None, "Error: Empty or malformed row."
+
+    metric_names_str = row[0]
+    potential_metric_strings = [name.strip() for name in metric_names_str.split(',') if name.strip()]
+    metric_names, skipped_names = [], []
+    for candidate in potential_metric_strings:
+        match = _METRIC_NAME_EXTRACT_REGEX.match(candidate)
+        if match:
+            metric_names.append(match.group(0))
+        else:
+            skipped_names.append(candidate)
+    if not metric_names:
+        return None, None, None, f"Error: No valid metric names found in '{metric_names_str}'."
+
+    # Column 2: Type
+    metric_cat = (row[1].strip() or None) if len(row) > 1 and row[1] else None
+    # Column 3: Description
+    description = (row[2].strip() or None) if len(row) > 2 and row[2] else None
+    # Column 4: Expiration (Optional)
+    expiration = None
+    if len(row) > 3 and row[3]:
+        expiration = row[3].strip() or blank_expiration
+    return metric_names, skipped_names, (metric_cat, description, expiration), None
+
+
+@write_operation
+def bulk_import_metrics_from_csv(metric_type, file_stream, user_id, progress=None):
     """
     Bulk imports metrics from a CSV, returning a new CSV string with an 'Import Status' column.
+    Rows applied by an earlier import (see _record_fingerprints) are reported
+    as unchanged without being processed again, and an identical file is not
+    processed at all.
+    `progress(rows_done, rows_total)` is called every _IMPORT_CHUNK_SIZE rows.
+    Returns (report, inserted_count, duplicate_count, error_count, unchanged_count).
     """
     if metric_type not in ['glean', 'legacy']:
         output = io.StringIO()
         writer = csv.writer(output)
         writer.writerow(["Error", "Details", "Import Status"])
         writer.writerow(["Invalid metric type", "The system received an unsupported metric type for import.", "Error"])
-        return output.getvalue(), 0, 0, 1
+        return output.getvalue(), 0, 0, 1, 0
 
     conn = get_db()
     cursor = conn.cursor()
@@ -802,47 +1768,44 @@ def bulk_import_metrics_from_csv(metric_type, file_stream, user_id):
     inserted_count = 0
     duplicate_count = 0
     error_count = 0
+    unchanged_count = 0
     header = []
+    manifest = []  # One audit record for the whole file instead of one per metric
 
     try:
         content = file_stream.read().decode('utf-8-sig')
+        file_fingerprint = _file_fingerprint(content)
         content_stream = io.StringIO(content)
         reader = csv.reader(content_stream)
         header = next(reader, []) # Read the header but we won't use it for indexing
         writer.writerow(header + ["Import Status"])
-
-        metric_name_extract_regex = re.compile(r"^[a-zA-Z0-9_-]+(?:\.[a-zA-Z0-9_-]+)+")
-
-        for row in reader:
+        rows = list(reader)
+
+        imported_file = _get_imported_file(metric_type, file_fingerprint)
+        if imported_file:
+            unchanged_count = len(rows)
+            writer.writerows(row + [_unchanged_file_status(imported_file)] for row in rows)
+            rows = []
+        fingerprints = [_row_fingerprint(row) for row in rows]
+        seen = _get_seen_fingerprints(metric_type, fingerprints)
+        statuses = []
+
+        for row_number, row in enumerate(rows):
+            if progress and row_number % _IMPORT_CHUNK_SIZE == 0:
+                progress(row_number, len(rows))
             status = ""
             original_row = list(row)
             try:
-                if not original_row or not original_row[0]:
-                    status = "Error: Empty or malformed row."
-                    error_count += 1
-                    writer.writerow(original_row + [status])
+                if fingerprints[row_number] in seen:
+                    status = _UNCHANGED_ROW_STATUS
+                    unchanged_count += 1
                     continue
-
-                # Use column position instead of name
-                metric_names_str = original_row[0]
-                potential_metric_strings = [name.strip() for name in metric_names_str.split(',') if name.strip()]
-                metric_names = [match.group(0) for s in potential_metric_strings if
-                                (match := metric_name_extract_regex.match(s))]
-
-                if not metric_names:
-                    status = f"Error: No valid metric names found in '{metric_names_str}'."
+                metric_names, skipped_names, values, error = _parse_metric_row(original_row, 'Not defined')
+                if error:
+                    status = error
                     error_count += 1
-                    writer.writerow(original_row + [status])
                     continue
-
-                # Column 2: Type
-                metric_cat = original_row[1].strip() if len(original_row) > 1 and original_row[1] else None
-                # Column 3: Description
-                description = original_row[2].strip() if len(original_row) > 2 and original_row[2] else None
-                # Column 4: Expiration (Optional)
-                expiration = None
-                if len(original_row) > 3 and original_row[3]:
-                    expiration = original_row[3].strip() or 'Not defined'
+                metric_cat, description, expiration = values
 
                 row_successes = 0
                 row_duplicates = 0
@@ -855,8 +1818,7 @@ def bulk_import_metrics_from_csv(metric_type, file_stream, user_id):
                         if cursor.rowcount > 0:
                             inserted_count += 1
                             row_successes += 1
-                            log_edit(user_id, f'bulk_add_{metric_type}', table_name, name,
-                                     f"Type: {metric_cat}, Exp: {expiration} (from CSV)")
+                            manifest.append({'name': name, 'type': metric_cat, 'expiration': expiration})
                     except sqlite3.IntegrityError:
                         duplicate_count += 1
                         row_duplicates += 1
@@ -876,260 +1838,595 @@ def bulk_import_metrics_from_csv(metric_type, file_stream, user_id):
                 else:
                     status = "Error: No metrics processed for this row."
                     error_count += 1
-                writer.writerow(original_row + [status])
-            except IndexError:
-                status = "Error: Row has fewer columns than expected."
-                error_count += 1
-                writer.writerow(original_row + [status])
+                if skipped_names and not status.startswith("Error"):
+                    status += _skipped_status(skipped_names)
             except Exception as e:
                 error_count += 1
-                writer.writerow(original_row + [f"Error: {e}"])
+                status = f"Error: {e}"
+            finally:
+                statuses.append(status)
+                writer.writerow(original_row + [status])
+        if rows:
+            _record_fingerprints(metric_type, file_fingerprint, fingerprints, statuses)
+        if progress:
+            progress(len(rows), len(rows))
     except Exception as e:
+        conn.rollback()
         error_count += 1
         if not header:
             writer.writerow(["Error", "Details", "Import Status"])
         writer.writerow(["File-level error", str(e), "Error"])
         inserted_count = 0
         duplicate_count = 0
+        unchanged_count = 0
+        manifest = []
 
+    log_bulk_edit(user_id, f'bulk_add_{metric_type}', table_name, manifest,
+                  f"Imported {len(manifest)} {metric_type} metrics from CSV.")
     conn.commit()
-    return output.getvalue(), inserted_count, duplicate_count, error_count
+    return output.getvalue(), inserted_count, duplicate_count, error_count, unchanged_count
 
 
-def bulk_import_coverage_from_csv(file_stream, user_id):
+def _upsert_status(added, restored, updated, unchanged):
+    counts = [(added, 'added'), (restored, 'restored'), (updated, 'updated'), (unchanged, 'unchanged')]
+    present = [(count, label) for count, label in counts if count]
+    if len(present) == 1 and present[0][0] == 1:
+        return present[0][1].capitalize()
+    return "Success: " + ", ".join(f"{count} {label}" for count, label in present) + "."
+
+
+@write_operation
+def bulk_upsert_metrics_from_csv(metric_type, file_stream, user_id, progress=None):
     """
-    Bulk imports coverage from a CSV, returning a new CSV string with an 'Import Status' column.
+    Adds new metrics and refreshes existing ones from a CSV with the same
+    columns as bulk_import_metrics_from_csv. A blank cell keeps the stored
+    value, and metrics whose type, description and expiration are already
+    current are not written at all. A soft-deleted metric listed in the
+    file is restored (with its stored values merged as for any update) and
+    counted as added, since it rejoins the active catalogue. Writes go out
+    in chunks through INSERT ... ON CONFLICT DO UPDATE.
+    `progress(rows_done, rows_total)` is called as chunks complete.
+    Returns (report_csv, added_count, updated_count, unchanged_count, error_count).
     """
+    if metric_type not in ['glean', 'legacy']:
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(["Error", "Details", "Import Status"])
+        writer.writerow(["Invalid metric type", "The system received an unsupported metric type for import.", "Error"])
+        return output.getvalue(), 0, 0, 0, 1
+
     conn = get_db()
-    cursor = conn.cursor()
-    exception_tcids = _get_exception_tcid_set()
+    table_name = f"{metric_type}_metrics"
+    name_col = f"{metric_type}_name"
+    upsert_sql = f"""
+        INSERT INTO {table_name} ({name_col}, metric_type, description, expiration) VALUES (?, ?, ?, ?)
+        ON CONFLICT ({name_col}) DO UPDATE SET
+            metric_type = COALESCE(excluded.metric_type, metric_type),
+            description = COALESCE(excluded.description, description),
+            expiration = COALESCE(excluded.expiration, expiration),
+            is_deleted = FALSE
+        WHERE (metric_type, description, expiration, is_deleted) IS NOT (
+            COALESCE(excluded.metric_type, metric_type),
+            COALESCE(excluded.description, description),
+            COALESCE(excluded.expiration, expiration),
+            FALSE
+        )
+    """
 
     output = io.StringIO()
     writer = csv.writer(output)
 
-    processed_count = 0
-    duplicate_count = 0
+    added_count = 0
+    updated_count = 0
+    unchanged_count = 0
     error_count = 0
     header = []
+    manifest = []
+    current = {}  # name -> (metric_type, description, expiration) as stored after this import
+    deleted = set()  # Names in `current` that are soft-deleted and not restored yet
 
     try:
         content = file_stream.read().decode('utf-8-sig')
-        content_stream = io.StringIO(content)
-        reader = csv.reader(content_stream)
+        reader = csv.reader(io.StringIO(content))
         header = next(reader, [])
         writer.writerow(header + ["Import Status"])
-
-        metric_name_extract_regex = re.compile(r"^[a-zA-Z0-9_-]+(?:\.[a-zA-Z0-9_-]+)+")
-
-        for row in reader:
-            status = ""
-            original_row = list(row)
-            try:
-                if not original_row or len(original_row) < 4:
-                    status = "Error: Row is malformed or has too few columns."
+        rows = [list(row) for row in reader]
+
+        for chunk_number, chunk in enumerate(_chunked(rows, _IMPORT_CHUNK_SIZE)):
+            if progress:
+                progress(chunk_number * _IMPORT_CHUNK_SIZE, len(rows))
+            parsed = [_parse_metric_row(row) for row in chunk]
+
+            # Load the stored definitions of every metric this chunk mentions, in bulk.
+            unseen = list({name for names, _, _, _ in parsed if names for name in names} - current.keys())
+            for name_chunk in _chunked(unseen, _IMPORT_LOOKUP_SIZE):
+                placeholders = ','.join('?' for _ in name_chunk)
+                for stored in conn.execute(
+                        f"SELECT {name_col}, metric_type, description, expiration, is_deleted FROM {table_name} "
+                        f"WHERE {name_col} IN ({placeholders})", name_chunk):
+                    current[stored[0]] = tuple(stored[1:4])
+                    if stored[4]:
+                        deleted.add(stored[0])
+
+            pending = []
+            for row, (metric_names, skipped_names, values, error) in zip(chunk, parsed):
+                if error:
                     error_count += 1
-                    writer.writerow(original_row + [status])
+                    writer.writerow(row + [error])
                     continue
 
-                tc_id_raw, title, metric_names_str, metric_type_raw = original_row[0], original_row[1], original_row[2], \
-                original_row[3]
-                tc_id = _strip_tcid_prefix(tc_id_raw.strip())
-                metric_type = metric_type_raw.strip()
+                row_added = row_restored = row_updated = row_unchanged = 0
+                for name in metric_names:
+                    stored = current.get(name)
+                    if stored is None:
+                        merged = values
+                        row_added += 1
+                        change = 'added'
+                    elif name in deleted:
+                        merged = tuple(new if new is not None else old for new, old in zip(values, stored))
+                        deleted.discard(name)
+                        row_restored += 1
+                        change = 'restored'
+                    else:
+                        merged = tuple(new if new is not None else old for new, old in zip(values, stored))
+                        if merged == stored:
+                            row_unchanged += 1
+                            continue
+                        row_updated += 1
+                        change = 'updated'
+                    current[name] = merged
+                    pending.append((name, *values))
+                    manifest.append({'name': name, 'type': merged[0], 'expiration': merged[2], 'change': change})
+
+                added_count += row_added + row_restored
+                updated_count += row_updated
+                unchanged_count += row_unchanged
+                status = _upsert_status(row_added, row_restored, row_updated, row_unchanged)
+                if skipped_names:
+                    status += _skipped_status(skipped_names)
+                writer.writerow(row + [status])
+
+            if pending:
+                conn.executemany(upsert_sql, pending)
+        if progress:
+            progress(len(rows), len(rows))
+    except Exception as e:
+        conn.rollback()
+        error_count += 1
+        if not header:
+            writer.writerow(["Error", "Details", "Import Status"])
+        writer.writerow(["File-level error", str(e), "Error"])
+        added_count = updated_count = unchanged_count = 0
+        manifest = []
 
-                if not tc_id:
-                    status = "Error: TC ID is missing."
-                    error_count += 1
-                    writer.writerow(original_row + [status])
-                    continue
+    log_bulk_edit(user_id, f'bulk_upsert_{metric_type}', table_name, manifest,
+                  f"Added {added_count} and updated {updated_count} {metric_type} metrics from CSV.")
+    conn.commit()
+    return output.getvalue(), added_count, updated_count, unchanged_count, error_count
 
-                if tc_id in exception_tcids:
-                    status = f"Error: TCID '{tc_id}' is on the exception list."
-                    error_count += 1
-                    writer.writerow(original_row + [status])
-                    continue
 
-                region = original_row[4].strip() if len(original_row) > 4 and original_row[4] else None
-                engine = original_row[5].strip() if len(original_row) > 5 and original_row[5] else None
+def _load_metric_name_index():
+    """Loads every Glean and Legacy metric name once, keyed by lower-case metric type."""
+    db = get_db()
+    return {
+        'glean': {row[0] for row in db.execute("SELECT glean_name FROM glean_metrics")},
+        'legacy': {row[0] for row in db.execute("SELECT legacy_name FROM legacy_metrics")},
+    }
 
-                potential_metric_strings = [name.strip() for name in metric_names_str.split(',') if name.strip()]
-                metric_names = [match.group(0) for s in potential_metric_strings if
-                                (match := metric_name_extract_regex.match(s))]
 
-                if not all([metric_names, metric_type]):
-                    status = "Error: Metric Name or Metric Type is missing."
-                    error_count += 1
-                    writer.writerow(original_row + [status])
-                    continue
+def _parse_coverage_row(row, metric_index, exception_tcids):
+    """
+    Validates one coverage CSV row (tcid, title, metrics, type, region, engine).
+    Returns (parsed, None) or (None, error status).
+    """
+    if not row or len(row) < 4:
+        return None, "Error: Row is malformed or has too few columns."
 
-                table_name = f"{metric_type.lower()}_metrics"
-                pk_col = f"{metric_type.lower()}_name"
-                placeholders = ','.join('?' for _ in metric_names)
-                existing_metrics = cursor.execute(
-                    f"SELECT {pk_col} FROM {table_name} WHERE {pk_col} IN ({placeholders})", metric_names
-                ).fetchall()
-                existing_metrics_set = {r[pk_col] for r in existing_metrics}
+    tc_id = _strip_tcid_prefix(row[0].strip())
+    title = row[1].strip() if row[1] else None
+    metric_type = row[3].strip()
+    if not tc_id:
+        return None, "Error: TC ID is missing."
+    if tc_id in exception_tcids:
+        return None, f"Error: TCID '{tc_id}' is on the exception list."
 
-                valid_metric_names = [name for name in metric_names if name in existing_metrics_set]
-                invalid_metric_names = [name for name in metric_names if name not in existing_metrics_set]
+    region = row[4].strip() if len(row) > 4 and row[4] else None
+    engine = row[5].strip() if len(row) > 5 and row[5] else None
 
-                if not valid_metric_names:
-                    status = f"Error: No valid metrics found. Invalid: {', '.join(invalid_metric_names)}."
-                    error_count += 1
-                    writer.writerow(original_row + [status])
-                    continue
+    potential_metric_strings = [name.strip() for name in row[2].split(',') if name.strip()]
+    metric_names = [match.group(0) for s in potential_metric_strings if
+                    (match := _METRIC_NAME_EXTRACT_REGEX.match(s))]
+    if not all([metric_names, metric_type]):
+        return None, "Error: Metric Name or Metric Type is missing."
 
-                cursor.execute("INSERT OR IGNORE INTO coverage (tc_id, tcid_title) VALUES (?, ?)",
-                               (tc_id, title.strip() if title else None))
-                coverage_id = cursor.execute("SELECT coverage_id FROM coverage WHERE tc_id = ?", (tc_id,)).fetchone()[
-                    'coverage_id']
+    known_names = metric_index.get(metric_type.lower())
+    if known_names is None:
+        return None, f"Error: Unknown metric type '{metric_type}'."
+    valid_metric_names = list(dict.fromkeys(name for name in metric_names if name in known_names))
+    invalid_metric_names = [name for name in metric_names if name not in known_names]
+    if not valid_metric_names:
+        return None, f"Error: No valid metrics found. Invalid: {', '.join(invalid_metric_names)}."
 
-                row_successes = 0
-                row_duplicates = 0
-                for metric_name in valid_metric_names:
-                    try:
-                        cursor.execute(
-                            "INSERT OR IGNORE INTO coverage_to_metric_link (coverage_id, metric_name, metric_type, region, engine) VALUES (?, ?, ?, ?, ?)",
-                            (coverage_id, metric_name, metric_type.capitalize(), region, engine)
-                        )
-                        if cursor.rowcount > 0:
-                            processed_count += 1
-                            row_successes += 1
-                            log_edit(user_id, 'bulk_add_coverage', 'coverage_to_metric_link', tc_id,
-                                     f"Linked to {metric_name} (from CSV)")
-                    except sqlite3.IntegrityError:
-                        duplicate_count += 1
-                        row_duplicates += 1
-                    except Exception as inner_e:
-                        status = f"Error processing metric '{metric_name}': {inner_e}"
-                        error_count += 1
-                        break
+    return {
+        'tc_id': tc_id,
+        'title': title,
+        'metric_type': metric_type.capitalize(),
+        'metric_names': valid_metric_names,
+        'invalid_metric_names': invalid_metric_names,
+        'region': region,
+        'engine': engine,
+    }, None
 
-                if status.startswith("Error"):
-                    pass
-                elif row_successes > 0:
-                    status = "Success"
-                    if invalid_metric_names:
-                        status += f" (Skipped invalid: {', '.join(invalid_metric_names)})"
-                elif row_duplicates > 0:
-                    status = "Duplicate"
-                else:
-                    status = f"Error: All metrics for this row were invalid or skipped."
-                    error_count += 1
-                writer.writerow(original_row + [status])
+
+def _import_coverage_rows(rows, progress=None):
+    """
+    Imports parsed coverage CSV rows in chunks. Metric names are checked
+    against one in-memory index, test cases are created with executemany()
+    and resolved to coverage IDs with batched lookups, and new links are
+    inserted with executemany(). Links that already exist (including
+    soft-deleted ones) are reported as duplicates.
+    `progress(rows_done, rows_total)` is called before each chunk and at the end.
+
+    Must run inside a write job so the whole import is one transaction.
+    Returns (statuses, processed_count, duplicate_count, error_count, manifest),
+    with one status per input row.
+    """
+    db = get_db()
+    metric_index = _load_metric_name_index()
+    exception_tcids = _get_exception_tcid_set()
+
+    statuses = [None] * len(rows)
+    processed_count = duplicate_count = error_count = 0
+    manifest = []
+
+    for chunk_start in range(0, len(rows), _IMPORT_CHUNK_SIZE):
+        if progress:
+            progress(chunk_start, len(rows))
+        parsed_rows = []
+        for index in range(chunk_start, min(chunk_start + _IMPORT_CHUNK_SIZE, len(rows))):
+            try:
+                parsed, error = _parse_coverage_row(rows[index], metric_index, exception_tcids)
             except Exception as e:
+                parsed, error = None, f"Error: {e}"
+            if error:
+                statuses[index] = error
                 error_count += 1
-                writer.writerow(original_row + [f"Error: {e}"])
+            else:
+                parsed_rows.append((index, parsed))
+        if not parsed_rows:
+            continue
+
+        # Create the test cases this chunk needs (first title seen wins), then resolve all their IDs.
+        titles = {}
+        for _, parsed in parsed_rows:
+            titles.setdefault(parsed['tc_id'], parsed['title'])
+        db.executemany("INSERT OR IGNORE INTO coverage (tc_id, tcid_title) VALUES (?, ?)", titles.items())
+        coverage_ids = {}
+        for tc_chunk in _chunked(list(titles), _IMPORT_LOOKUP_SIZE):
+            placeholders = ', '.join('?' * len(tc_chunk))
+            for row in db.execute(f"SELECT tc_id, coverage_id FROM coverage WHERE tc_id IN ({placeholders})", tc_chunk):
+                coverage_ids[row['tc_id']] = row['coverage_id']
+
+        # Existing links of these test cases, so duplicates are known without one query per link.
+        existing_links = set()
+        for id_chunk in _chunked(list(set(coverage_ids.values())), _IMPORT_LOOKUP_SIZE):
+            placeholders = ', '.join('?' * len(id_chunk))
+            for row in db.execute(f"""
+                SELECT coverage_id, metric_name, metric_type, region, engine
+                FROM coverage_to_metric_link WHERE coverage_id IN ({placeholders})
+            """, id_chunk):
+                existing_links.add(tuple(row))
+
+        new_links = []
+        for index, parsed in parsed_rows:
+            coverage_id = coverage_ids[parsed['tc_id']]
+            row_successes = row_duplicates = 0
+            for metric_name in parsed['metric_names']:
+                link = (coverage_id, metric_name, parsed['metric_type'], parsed['region'], parsed['engine'])
+                if link in existing_links:
+                    row_duplicates += 1
+                    continue
+                existing_links.add(link)
+                new_links.append(link)
+                row_successes += 1
+                manifest.append({'tc_id': parsed['tc_id'], 'metric': metric_name,
+                                 'region': parsed['region'], 'engine': parsed['engine']})
+            processed_count += row_successes
+            duplicate_count += row_duplicates
+
+            status = "Success" if row_successes > 0 else "Duplicate"
+            if parsed['invalid_metric_names']:
+                status += _skipped_status(parsed['invalid_metric_names'])
+            statuses[index] = status
+
+        if new_links:
+            db.executemany("""
+                INSERT OR IGNORE INTO coverage_to_metric_link (coverage_id, metric_name, metric_type, region, engine)
+                VALUES (?, ?, ?, ?, ?)
+            """, new_links)
+
+    if progress:
+        progress(len(rows), len(rows))
+    return statuses, processed_count, duplicate_count, error_count, manifest
+
+
+@write_operation
+def bulk_import_coverage_from_csv(file_stream, user_id, progress=None):
+    """
+    Bulk imports coverage from a CSV, returning a new CSV string with an 'Import Status' column.
+    Like bulk_import_metrics_from_csv, rows applied by an earlier import are
+    reported as unchanged without being processed, and an identical file is
+    not processed at all.
+    `progress(rows_done, rows_total)` is called as chunks complete.
+    Returns (report, processed_count, duplicate_count, error_count, unchanged_count).
+    """
+    conn = get_db()
+    output = io.StringIO()
+    writer = csv.writer(output)
+    header = []
+
+    try:
+        content = file_stream.read().decode('utf-8-sig')
+        file_fingerprint = _file_fingerprint(content)
+        reader = csv.reader(io.StringIO(content))
+        header = next(reader, [])
+        rows = list(reader)
+
+        imported_file = _get_imported_file('coverage', file_fingerprint)
+        if imported_file:
+            statuses = [_unchanged_file_status(imported_file)] * len(rows)
+            processed_count = duplicate_count = error_count = 0
+            unchanged_count = len(rows)
+            manifest = []
+        else:
+            # The TC ID is hashed without its optional 'C' prefix, as it is stored.
+            fingerprints = [_row_fingerprint([_strip_tcid_prefix(row[0].strip()), *row[1:]] if row else row)
+                            for row in rows]
+            seen = _get_seen_fingerprints('coverage', fingerprints)
+            pending = [index for index, fingerprint in enumerate(fingerprints) if fingerprint not in seen]
+            unchanged_count = len(rows) - len(pending)
+            chunk_progress = (lambda done, total: progress(unchanged_count + done, len(rows))) if progress else None
+
+            statuses = [_UNCHANGED_ROW_STATUS] * len(rows)
+            pending_statuses, processed_count, duplicate_count, error_count, manifest = _import_coverage_rows(
+                [rows[index] for index in pending], progress=chunk_progress)
+            for index, status in zip(pending, pending_statuses):
+                statuses[index] = status
+            if rows:
+                _record_fingerprints('coverage', file_fingerprint, fingerprints, statuses)
+
+        writer.writerow(header + ["Import Status"])
+        for row, status in zip(rows, statuses):
+            writer.writerow(row + [status])
     except Exception as e:
-        error_count += 1
+        conn.rollback()
+        error_count = 1
+        processed_count = duplicate_count = unchanged_count = 0
+        manifest = []
         if not header:
             writer.writerow(["Error", "Details", "Import Status"])
         writer.writerow(["File-level error", str(e), "Error"])
-        processed_count = 0
-        duplicate_count = 0
 
+    log_bulk_edit(user_id, 'bulk_add_coverage', 'coverage_to_metric_link', manifest,
+                  f"Imported {len(manifest)} coverage links from CSV.")
     conn.commit()
-    return output.getvalue(), processed_count, duplicate_count, error_count
+    return output.getvalue(), processed_count, duplicate_count, error_count, unchanged_count
 
 
-def extract_probes_from_csv(file_stream):
-    """Parses a TestRail CSV export to find probes, regions, and engines from any column."""
-    db_engines = get_supported_engines()
-    engine_names = [re.escape(engine['name']) for engine in db_engines]
+# Columns of a rotation import preview; the commit step reads the same file back.
+_ROTATION_DIFF_HEADER = ["TC ID", "Title", "Metric", "Metric Type", "Region", "Engine", "Diff"]
 
-    probe_regex = re.compile(r'([a-zA-Z0-9\._-]+(\.glean|\.telemetry)[a-zA-Z0-9\._-]+)')
-    # DEFINITIVE FIX: Added 'TO' and made the regex case-sensitive by removing re.IGNORECASE
-    region_regex = re.compile(r'\b(US|DE|JP|FR|GB|IT|ES|CA|IN|TO)\b')
-    engine_regex = re.compile(r'\b(' + '|'.join(engine_names) + r')\b', re.IGNORECASE) if engine_names else None
 
-    valid_metric_regex = re.compile(r"^[a-zA-Z0-9_-]+(\.[a-zA-Z0-9_-]+)+$")
+def preview_rotation_import(file_stream, progress=None):
+    """
+    Dry run of importing a rotation CSV (tcsid, title, rotation) as coverage.
+    The rows are parsed as by the rotation extraction and turned into the
+    coverage links they describe, which are compared in memory with the
+    existing links of the same TC IDs. Nothing is written.
+
+    Returns (report, counts). The report is a CSV with one line per link and
+    a "Diff" column: New, Already present, Invalid metric, Excepted TCID, or
+    an error for a row that describes no link. `counts` has the number of
+    lines per outcome under 'new', 'present', 'invalid', 'excepted' and 'errors'.
+    Raises ValueError if the file cannot be read.
+    """
+    db = get_db()
+    matcher = extraction.get_matcher(tuple(engine['name'] for engine in get_supported_engines()),
+                                     tuple(region['name'] for region in get_supported_regions()))
+    metric_index = _load_metric_name_index()
+    exception_tcids = _get_exception_tcid_set()
 
-    output = io.StringIO()
     try:
-        decoded_file = io.TextIOWrapper(file_stream, 'utf-8-sig')
-        reader = csv.reader(decoded_file)
-
-        header = next(reader, [])
-        new_header = header + ["Found Probes", "Found Region", "Found Engine"]
-        writer = csv.writer(output)
-        writer.writerow(new_header)
-
-        for row in reader:
-            text_to_search = " ".join(row)
-            found_probes = set(probe_regex.findall(text_to_search))
-            valid_found_probes = {p[0] for p in found_probes if valid_metric_regex.match(p[0])}
-            found_regions = set(region_regex.findall(text_to_search))
-            found_engines = set(engine_regex.findall(text_to_search)) if engine_regex else set()
+        reader = csv.reader(io.TextIOWrapper(file_stream, 'utf-8-sig'))
+        next(reader, None)
+        rows = list(reader)
+    except (csv.Error, UnicodeError) as e:
+        raise ValueError('Could not process the file. It might be empty or malformed.') from e
+
+    lines = []  # [tc_id, title, metric, metric_type, region, engine, diff]
+    for row_number, row in enumerate(rows):
+        if progress and row_number % _IMPORT_CHUNK_SIZE == 0:
+            progress(row_number, len(rows))
+        tc_id = _strip_tcid_prefix(row[0].strip()) if row else ''
+        title = row[1].strip() if len(row) > 1 else ''
+        region, engine, metric_type, metric_names = extraction.parse_rotation_row(row, matcher)
+        if not tc_id:
+            lines.append([tc_id, title, '', metric_type, region, engine, "Error: TC ID is missing."])
+            continue
+        if not metric_type or not metric_names:
+            lines.append([tc_id, title, '', metric_type, region, engine,
+                          "Error: The rotation lists no Glean or Legacy metrics."])
+            continue
+        for metric_name in dict.fromkeys(metric_names):
+            if tc_id in exception_tcids:
+                diff = 'Excepted TCID'
+            elif metric_name not in metric_index[metric_type.lower()]:
+                diff = 'Invalid metric'
+            else:
+                diff = None  # Decided below, against the existing links
+            lines.append([tc_id, title, metric_name, metric_type, region, engine, diff])
+
+    candidates = [tuple(line[i] for i in (0, 2, 3, 4, 5)) for line in lines if line[6] is None]
+    existing_links = set()
+    for tc_chunk in _chunked(list({link[0] for link in candidates}), _IMPORT_LOOKUP_SIZE):
+        placeholders = ', '.join('?' * len(tc_chunk))
+        for row in db.execute(f"""
+            SELECT c.tc_id, l.metric_name, l.metric_type, l.region, l.engine
+            FROM coverage_to_metric_link l JOIN coverage c ON c.coverage_id = l.coverage_id
+            WHERE c.tc_id IN ({placeholders})
+        """, tc_chunk):
+            existing_links.add(tuple(row))
+    new_links = set(candidates) - existing_links
+
+    counts = {'new': 0, 'present': 0, 'invalid': 0, 'excepted': 0, 'errors': 0}
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(_ROTATION_DIFF_HEADER)
+    for line in lines:
+        if line[6] is None:
+            link = tuple(line[i] for i in (0, 2, 3, 4, 5))
+            # A link listed twice in the file is new only the first time.
+            line[6] = 'New' if link in new_links else 'Already present'
+            new_links.discard(link)
+        counts[{'New': 'new', 'Already present': 'present', 'Invalid metric': 'invalid',
+                'Excepted TCID': 'excepted'}.get(line[6], 'errors')] += 1
+        writer.writerow(line)
+
+    if progress:
+        progress(len(rows), len(rows))
+    return output.getvalue(), counts
+
+
+@write_operation
+def commit_rotation_import(file_stream, user_id, progress=None):
+    """
+    Imports the links a rotation import preview (see preview_rotation_import)
+    marked as New, in one transaction. They go through the regular coverage
+    import, so anything added since the preview is reported as a duplicate
+    rather than imported twice.
+    Returns (report, processed_count, duplicate_count, error_count).
+    """
+    conn = get_db()
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(_ROTATION_DIFF_HEADER[:-1] + ["Import Status"])
 
-            found_probes_str = ", ".join(sorted(valid_found_probes)) or "N/A"
-            found_regions_str = ", ".join(sorted(found_regions)) or "N/A"
-            found_engines_str = ", ".join(sorted(found_engines)) or "N/A"
+    try:
+        reader = csv.reader(io.TextIOWrapper(file_stream, 'utf-8-sig'))
+        if next(reader, None) != _ROTATION_DIFF_HEADER:
+            raise ValueError("The file is not a rotation import preview.")
+        rows = [line[:-1] for line in reader if len(line) == len(_ROTATION_DIFF_HEADER) and line[-1] == 'New']
+        statuses, processed_count, duplicate_count, error_count, manifest = _import_coverage_rows(rows, progress=progress)
+        for row, status in zip(rows, statuses):
+            writer.writerow(row + [status])
+    except Exception as e:
+        conn.rollback()
+        error_count = 1
+        processed_count = duplicate_count = 0
+        manifest = []
+        writer.writerow(["File-level error", str(e), "", "", "", "", "Error"])
+
+    log_bulk_edit(user_id, 'bulk_add_coverage', 'coverage_to_metric_link', manifest,
+                  f"Imported {len(manifest)} coverage links from a rotation CSV.")
+    conn.commit()
+    return output.getvalue(), processed_count, duplicate_count, error_count
 
-            output_row = row + [
-                found_probes_str,
-                found_regions_str,
-                found_engines_str
-            ]
-            writer.writerow(output_row)
-    except Exception:
-        return ""
 
-    return output.getvalue()
+# Rows per chunk handed to an extraction worker (and yielded as one piece of output).
+_EXTRACT_CHUNK_ROWS = 1000
 
 
-def extract_from_rotation_csv(file_stream):
+def _read_row_chunks(reader, chunk_rows=_EXTRACT_CHUNK_ROWS):
     """
-    Extracts coverage data from a rotation CSV by column order (tcsid, title, rotation).
-    Auto-detects region/engine from title and parses metrics from rotation.
-    Returns a new CSV string with the extracted data.
+    Groups parsed CSV rows into lists of `chunk_rows`. The csv reader has
+    already joined quoted fields that span lines, so every chunk holds whole rows.
     """
-    db_engines = get_supported_engines()
-    engine_names = [re.escape(engine['name']) for engine in db_engines]
-    # DEFINITIVE FIX: Added 'TO' and made the regex case-sensitive by removing re.IGNORECASE
-    region_regex = re.compile(r'\b(US|DE|JP|FR|GB|IT|ES|CA|IN|TO)\b')
-    engine_regex = re.compile(r'\b(' + '|'.join(engine_names) + r')\b', re.IGNORECASE) if engine_names else None
+    chunk = []
+    for row in reader:
+        chunk.append(row)
+        if len(chunk) == chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
 
-    valid_metric_regex = re.compile(r"^[a-zA-Z0-9_-]+(\.[a-zA-Z0-9_-]+)+$")
 
-    output = io.StringIO()
+def _run_extraction(file_stream, new_columns, enrich_rows, progress):
+    """
+    Shared driver of the extraction generators. Reads the upload row by row,
+    runs `enrich_rows(rows, engine_names, region_names, metric_index)` on each
+    chunk and yields the CSV output in input order.
+
+    With EXTRACTION_WORKERS above 1 and more than one chunk of input, the
+    chunks are processed on a process pool. At most two chunks per worker
+    are in flight, so memory stays bounded. Workers are spawned rather than
+    forked, because this process already runs the writer and job threads.
+    Each worker receives the metric name index once, when it starts.
+    """
+    engine_names = tuple(engine['name'] for engine in get_supported_engines())
+    region_names = tuple(region['name'] for region in get_supported_regions())
+    metric_index = get_metric_name_index()
+    workers = max(1, int(current_app.config.get('EXTRACTION_WORKERS') or 1))
+    rows_done = 0
     try:
-        decoded_file = io.TextIOWrapper(file_stream, 'utf-8-sig')
-        reader = csv.reader(decoded_file)
-
+        reader = csv.reader(io.TextIOWrapper(file_stream, 'utf-8-sig'))
         header = next(reader, [])
-        new_header = header + ["Found Region", "Found Engine", "Found Metric Type", "Found Metrics"]
-        writer = csv.writer(output)
-        writer.writerow(new_header)
+        yield extraction.csv_text([header + new_columns])
+
+        row_chunks = _read_row_chunks(reader)
+        leading = [chunk for chunk in (next(row_chunks, None), next(row_chunks, None)) if chunk]
+        row_chunks = chain(leading, row_chunks)
+
+        if workers == 1 or len(leading) < 2:
+            for chunk in row_chunks:
+                yield enrich_rows(chunk, engine_names, region_names, metric_index)
+                rows_done += len(chunk)
+                if progress:
+                    progress(rows_done, None)
+        else:
+            with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=extraction.init_worker, initargs=(metric_index,)) as pool:
+                in_flight = deque()
+                for chunk in row_chunks:
+                    in_flight.append((len(chunk), pool.submit(
+                        extraction.enrich_in_worker, enrich_rows, chunk, engine_names, region_names)))
+                    while len(in_flight) >= workers * 2 or (in_flight and in_flight[0][1].done()):
+                        chunk_rows, future = in_flight.popleft()
+                        yield future.result()
+                        rows_done += chunk_rows
+                        if progress:
+                            progress(rows_done, None)
+                while in_flight:
+                    chunk_rows, future = in_flight.popleft()
+                    yield future.result()
+                    rows_done += chunk_rows
+                    if progress:
+                        progress(rows_done, None)
+        if progress:
+            progress(rows_done, rows_done)
+    except (csv.Error, UnicodeError) as e:
+        raise ValueError('Could not process the file. It might be empty or malformed.') from e
+
+
+def extract_probes_from_csv(file_stream, progress=None):
+    """
+    Parses a TestRail CSV export to find probes, regions, and engines from any column,
+    and checks each probe against the glean and legacy metric catalogues.
+    This is a generator: the input is read row by row and the enriched CSV is
+    yielded in chunks, so memory use does not grow with the file. Large files
+    are spread over EXTRACTION_WORKERS processes (see _run_extraction).
+    `progress(rows_done, None)` is called after each chunk and
+    `progress(rows, rows)` at the end. Raises ValueError if the file cannot be read.
+    """
+    return _run_extraction(file_stream, extraction.PROBE_COLUMNS, extraction.enrich_probe_rows, progress)
 
-        for row in reader:
-            try:
-                title = row[1] if len(row) > 1 else ''
-                rotation_str = row[2] if len(row) > 2 else ''
-
-                region_match = region_regex.search(title)
-                found_region = region_match.group(0).upper() if region_match else "N/A"
-
-                engine_match = engine_regex.search(title) if engine_regex else None
-                found_engine = engine_match.group(0).lower() if engine_match else "N/A"
-
-                found_metric_type = "N/A"
-                found_metrics = "N/A"
-                if rotation_str:
-                    rotation_parts = [part.strip() for part in rotation_str.split(',')]
-                    if len(rotation_parts) >= 1:
-                        metric_type_candidate = rotation_parts[0].strip().capitalize()
-                        if metric_type_candidate in ['Glean', 'Legacy']:
-                            found_metric_type = metric_type_candidate
-                            potential_metrics = [name for name in rotation_parts[1:] if name]
-                            valid_metrics = [m for m in potential_metrics if valid_metric_regex.match(m)]
-                            found_metrics = ", ".join(valid_metrics) or "N/A"
-
-                output_row = row + [found_region, found_engine, found_metric_type, found_metrics]
-                writer.writerow(output_row)
-            except IndexError:
-                writer.writerow(row + ["N/A", "N/A", "N/A", "N/A"])
-                continue
-
-    except Exception:
-        return ""
-
-    return output.getvalue()
\ No newline at end of file
+
+def extract_from_rotation_csv(file_stream, progress=None):
+    """
+    Extracts coverage data from a rotation CSV by column order (tcsid, title, rotation).
+    Auto-detects region/engine from title and parses metrics from rotation,
+    marking which of them exist with the rotation's metric type.
+    Like extract_probes_from_csv, this is a generator yielding the new CSV in
+    chunks and reporting progress the same way.
+    """
+    return _run_extraction(file_stream, extraction.ROTATION_COLUMNS, extraction.enrich_rotation_rows, progress)
\ No newline at end of file
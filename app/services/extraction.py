@@ -0,0 +1,218 @@
+# C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/app/services/extraction.py
+
+# Row-level work of the probe and rotation extractions. This module does not
+# import Flask or the database so that extraction pool workers (see
+# extract_probes_from_csv) can load it cheaply; everything they need is
+# passed in as plain arguments.
+
+import csv
+import functools
+import io
+import re
+
+VALID_METRIC_REGEX = re.compile(r"^[a-zA-Z0-9_-]+(\.[a-zA-Z0-9_-]+)+$")
+
+# Probe candidates: dotted names with a .glean or .telemetry segment.
+PROBE_PATTERN = r'[a-zA-Z0-9._-]+(?:\.glean|\.telemetry)[a-zA-Z0-9._-]+'
+
+PROBE_COLUMNS = ["Found Probes", "Found Region", "Found Engine", "Known Probes", "Unknown Probes"]
+ROTATION_COLUMNS = ["Found Region", "Found Engine", "Found Metric Type", "Found Metrics",
+                    "Known Metrics", "Unknown Metrics"]
+
+# Metric name index of a pool worker, set once by init_worker instead of being
+# sent along with every chunk.
+_worker_metric_index = None
+
+
+def _is_valid_metric_name(name):
+    """Equivalent to VALID_METRIC_REGEX for a string that already matched PROBE_PATTERN."""
+    return not name.startswith('.') and not name.endswith('.') and '..' not in name
+
+
+def _word_alternation(names, ignore_case=False):
+    # Longest first, so "yahoo japan" is preferred over "yahoo". Case is
+    # folded with character classes rather than an inline (?i) group, which
+    # would slow the whole combined pattern down.
+    def escape(name):
+        if not ignore_case:
+            return re.escape(name)
+        return ''.join(f'[{c.lower()}{c.upper()}]' if c.lower() != c.upper() else re.escape(c) for c in name)
+    return '|'.join(escape(name) for name in sorted(names, key=len, reverse=True))
+
+
+class ExtractionMatcher:
+    """
+    Finds probes, regions and engines in one pass over a piece of text,
+    using a single regex with one named group per kind. Regions match
+    case-sensitively and engines case-insensitively, both as whole words.
+    A probe match consumes its text, so a region or engine code inside a
+    probe name is not reported on its own.
+
+    Use get_matcher(), which caches one matcher per (engines, regions) pair:
+    when either list changes the key changes and a new matcher is built.
+    """
+
+    def __init__(self, engine_names, region_names):
+        # Every kind starts at a word boundary, so the scanner only tries the
+        # pattern at the start of a word instead of at every position inside
+        # one. A probe also may not follow a dot or a dash, which would put
+        # it in the middle of a longer name.
+        groups = [f'(?P<probe>(?<![.-]){PROBE_PATTERN})']
+        if region_names:
+            groups.append(rf'(?P<region>(?:{_word_alternation(region_names)})\b)')
+        if engine_names:
+            groups.append(rf'(?P<engine>(?:{_word_alternation(engine_names, ignore_case=True)})\b)')
+        self._regex = re.compile(rf'\b(?:{"|".join(groups)})')
+
+    def scan(self, text):
+        """Returns the (probes, regions, engines) found in `text`, as sets."""
+        found = {'probe': set(), 'region': set(), 'engine': set()}
+        for match in self._regex.finditer(text):
+            kind = match.lastgroup
+            value = match.group(kind)
+            if kind != 'probe' or _is_valid_metric_name(value):
+                found[kind].add(value)
+        return found['probe'], found['region'], found['engine']
+
+    def first_region_and_engine(self, text):
+        """Returns the first region and the first engine in `text` (None when absent)."""
+        region = engine = None
+        for match in self._regex.finditer(text):
+            kind = match.lastgroup
+            if kind == 'region' and region is None:
+                region = match.group(kind)
+            elif kind == 'engine' and engine is None:
+                engine = match.group(kind)
+            if region is not None and engine is not None:
+                break
+        return region, engine
+
+
+@functools.lru_cache(maxsize=32)
+def get_matcher(engine_names, region_names):
+    """Returns the matcher for these engine and region tuples, compiling it once per process."""
+    return ExtractionMatcher(engine_names, region_names)
+
+
+def init_worker(metric_index):
+    """Pool initializer: keeps the metric name index for enrich_in_worker."""
+    global _worker_metric_index
+    _worker_metric_index = metric_index
+
+
+def enrich_in_worker(enrich_rows, rows, engine_names, region_names):
+    """Runs `enrich_rows` in a pool worker with the index passed to init_worker."""
+    return enrich_rows(rows, engine_names, region_names, _worker_metric_index)
+
+
+def classify_probes(names, metric_index):
+    """
+    Splits probe names into known and unknown ones, using `metric_index`
+    (metric name -> "Glean", "Legacy" or "Glean/Legacy", see
+    get_metric_name_index). Known names are listed with the type they
+    resolved to. Returns the two columns as text.
+    """
+    known, unknown = [], []
+    for name in sorted(names):
+        metric_types = metric_index.get(name)
+        if metric_types:
+            known.append(f"{name} ({metric_types})")
+        else:
+            unknown.append(name)
+    return ", ".join(known) or "N/A", ", ".join(unknown) or "N/A"
+
+
+def classify_rotation_metrics(names, metric_type, metric_index):
+    """
+    Like classify_probes, for metrics listed under `metric_type`: a metric is
+    known only if it exists with that type. An unknown metric that exists
+    with the other type is listed with that type, since importing it as
+    `metric_type` would fail.
+    """
+    known, unknown = [], []
+    for name in names:
+        metric_types = metric_index.get(name)
+        if metric_types and metric_type in metric_types.split('/'):
+            known.append(name)
+        elif metric_types:
+            unknown.append(f"{name} ({metric_types})")
+        else:
+            unknown.append(name)
+    return ", ".join(known) or "N/A", ", ".join(unknown) or "N/A"
+
+
+def csv_text(rows):
+    """Returns `rows` written as CSV text."""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def enrich_probe_rows(rows, engine_names, region_names, metric_index):
+    """
+    Appends the probes, regions and engines found anywhere in each row, and
+    which of the probes exist in the catalogue. `engine_names` and
+    `region_names` are tuples of the supported values, `metric_index` maps
+    metric names to their type. Returns the enriched rows as CSV text.
+    """
+    matcher = get_matcher(engine_names, region_names)
+    enriched = []
+    for row in rows:
+        found_probes, found_regions, found_engines = matcher.scan(" ".join(row))
+        enriched.append(row + [
+            ", ".join(sorted(found_probes)) or "N/A",
+            ", ".join(sorted(found_regions)) or "N/A",
+            ", ".join(sorted(found_engines)) or "N/A",
+            *classify_probes(found_probes, metric_index),
+        ])
+    return csv_text(enriched)
+
+
+def parse_rotation_row(row, matcher):
+    """
+    Reads one rotation row (tcsid, title, rotation): the first region and
+    engine in the title, and the metric type and metric names listed in the
+    rotation. Returns (region, engine, metric_type, metric_names); the first
+    three are None when absent, and names that are not valid metric names
+    are dropped.
+    """
+    title = row[1] if len(row) > 1 else ''
+    rotation_str = row[2] if len(row) > 2 else ''
+
+    region, engine = matcher.first_region_and_engine(title)
+    engine = engine.lower() if engine else None
+
+    metric_type = None
+    metric_names = []
+    if rotation_str:
+        rotation_parts = [part.strip() for part in rotation_str.split(',')]
+        metric_type_candidate = rotation_parts[0].capitalize()
+        if metric_type_candidate in ['Glean', 'Legacy']:
+            metric_type = metric_type_candidate
+            potential_metrics = [name for name in rotation_parts[1:] if name]
+            metric_names = [m for m in potential_metrics if VALID_METRIC_REGEX.match(m)]
+    return region, engine, metric_type, metric_names
+
+
+def enrich_rotation_rows(rows, engine_names, region_names, metric_index):
+    """
+    Appends the region and engine found in each row's title (column 2), the
+    metric type and metrics listed in its rotation (column 3) and which of
+    those metrics exist with that type. Returns the enriched rows as CSV text.
+    """
+    matcher = get_matcher(engine_names, region_names)
+    enriched = []
+    for row in rows:
+        region, engine, metric_type, metric_names = parse_rotation_row(row, matcher)
+        known_metrics = unknown_metrics = "N/A"
+        if metric_type:
+            known_metrics, unknown_metrics = classify_rotation_metrics(metric_names, metric_type, metric_index)
+        enriched.append(row + [
+            region or "N/A",
+            engine or "N/A",
+            metric_type or "N/A",
+            ", ".join(metric_names) or "N/A",
+            known_metrics,
+            unknown_metrics,
+        ])
+    return csv_text(enriched)
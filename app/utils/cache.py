@@ -0,0 +1,114 @@
+# C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/app/utils/cache.py
+
+import functools
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from flask import current_app, g, request, session
+from ..db import get_db
+from ..db_writer import get_writer
+
+# Results of read services, keyed by (function, arguments). Each entry records
+# the data version it was computed at and is only served while that version is
+# still current, so every worker process can keep its own copy safely.
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_code_fingerprint = None
+
+
+def get_data_version():
+    """
+    Returns the global data version, read once per request. The database
+    writer bumps it with every batch that changed rows (see migrations/v4.sql).
+    """
+    if 'data_version' not in g:
+        g.data_version = get_db().execute("SELECT version FROM data_version WHERE id = 1").fetchone()[0]
+    return g.data_version
+
+
+def clear_cache():
+    """Drops every cached result in this process."""
+    with _cache_lock:
+        _cache.clear()
+
+
+def cached_read(fn):
+    """
+    Decorator for read service functions. The result is cached per argument
+    list and reused until the data version changes. Calls made on the writer
+    thread bypass the cache, since they can see uncommitted data.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        max_entries = current_app.config.get('CACHE_MAX_ENTRIES') or 0
+        if max_entries <= 0 or get_writer().in_writer_thread():
+            return fn(*args, **kwargs)
+
+        key = (current_app.config['DATABASE'], fn.__qualname__, repr(args), repr(sorted(kwargs.items())))
+        version = get_data_version()
+        with _cache_lock:
+            entry = _cache.get(key)
+            if entry is not None and entry[0] == version:
+                _cache.move_to_end(key)
+                return entry[1]
+
+        result = fn(*args, **kwargs)
+        with _cache_lock:
+            _cache[key] = (version, result)
+            _cache.move_to_end(key)
+            while len(_cache) > max_entries:
+                _cache.popitem(last=False)
+        return result
+    return wrapper
+
+
+def _get_code_fingerprint():
+    """
+    Latest modification time of the application's code and templates, so
+    that ETags handed out before a deploy stop matching after it.
+    """
+    global _code_fingerprint
+    if _code_fingerprint is None:
+        latest = 0
+        for root, _, files in os.walk(current_app.root_path):
+            for name in files:
+                if name.endswith(('.py', '.html')):
+                    latest = max(latest, os.path.getmtime(os.path.join(root, name)))
+        _code_fingerprint = str(int(latest))
+    return _code_fingerprint
+
+
+def conditional_view(view):
+    """
+    View decorator for read-only pages. The response carries an ETag built
+    from the data version, the user and the request URL, and a conditional
+    GET with a matching If-None-Match is answered with 304 without running
+    the view. Responses showing flashed messages are never tagged.
+    """
+    @functools.wraps(view)
+    def wrapped_view(**kwargs):
+        if request.method != 'GET' or session.get('_flashes'):
+            return view(**kwargs)
+
+        user = g.get('user')
+        parts = [
+            _get_code_fingerprint(),
+            str(get_data_version()),
+            str(user['user_id']) if user else '',
+            user['role'] if user else '',
+            str(session.get('show_management', False)),
+            request.full_path,
+        ]
+        etag = hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+        if etag in request.if_none_match:
+            response = current_app.response_class(status=304)
+        else:
+            response = current_app.make_response(view(**kwargs))
+            if response.status_code != 200 or session.get('_flashes'):
+                return response
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return wrapped_view
@@ -0,0 +1,24 @@
+-- Migration v10: import fingerprints.
+-- The same coverage and metric CSVs are re-uploaded every week with small
+-- changes. The inserting imports record a hash of every row they applied
+-- (and of every file that applied cleanly) so a re-upload only processes the
+-- rows that are new or changed, and an identical file is not processed at all.
+
+-- Rows that were imported or found to be duplicates. A row that failed is not
+-- recorded, so it is retried by the next upload.
+CREATE TABLE import_row_fingerprints (
+    kind TEXT NOT NULL, -- 'glean', 'legacy' or 'coverage'
+    fingerprint BLOB NOT NULL,
+    PRIMARY KEY (kind, fingerprint)
+) WITHOUT ROWID;
+
+-- Files whose every row was recorded above.
+CREATE TABLE import_file_fingerprints (
+    kind TEXT NOT NULL,
+    fingerprint BLOB NOT NULL,
+    row_count INTEGER NOT NULL,
+    imported_at TIMESTAMP DEFAULT (datetime('now')),
+    PRIMARY KEY (kind, fingerprint)
+) WITHOUT ROWID;
+
+PRAGMA user_version = 10;
@@ -0,0 +1,30 @@
+-- Migration v11: timestamps on coverage links.
+-- The export endpoints (see iter_export_rows in app/services/database.py)
+-- let a nightly sync fetch only what changed since its last run, which needs
+-- to know when each link changed.
+-- SQLite cannot add a column with a datetime('now') default, so the
+-- timestamps are set by triggers instead. They are not indexed: an export
+-- reads the whole table anyway, and an index would slow down bulk imports.
+
+ALTER TABLE coverage_to_metric_link ADD COLUMN created_at TIMESTAMP;
+ALTER TABLE coverage_to_metric_link ADD COLUMN updated_at TIMESTAMP;
+
+-- Existing links take the timestamps of their test case.
+UPDATE coverage_to_metric_link SET
+    created_at = (SELECT c.created_at FROM coverage c WHERE c.coverage_id = coverage_to_metric_link.coverage_id),
+    updated_at = (SELECT c.updated_at FROM coverage c WHERE c.coverage_id = coverage_to_metric_link.coverage_id);
+
+CREATE TRIGGER set_link_timestamps
+AFTER INSERT ON coverage_to_metric_link FOR EACH ROW
+BEGIN
+    UPDATE coverage_to_metric_link SET created_at = datetime('now'), updated_at = datetime('now')
+    WHERE link_id = NEW.link_id;
+END;
+
+CREATE TRIGGER update_link_updated_at
+AFTER UPDATE OF coverage_id, metric_name, metric_type, region, engine, is_deleted ON coverage_to_metric_link FOR EACH ROW
+BEGIN
+    UPDATE coverage_to_metric_link SET updated_at = datetime('now') WHERE link_id = NEW.link_id;
+END;
+
+PRAGMA user_version = 11;
@@ -0,0 +1,42 @@
+-- Migration v12: coverage snapshots.
+-- /reports only shows the current state. A snapshot records every active
+-- metric's coverage summary (TCID, region and engine counts) at one point in
+-- time, so coverage can be charted over time (see take_coverage_snapshot).
+-- Only the metrics that changed since the previous snapshot are stored; the
+-- per-type totals are stored in full so a trend query reads one small row
+-- per snapshot and never touches the link tables.
+
+CREATE TABLE coverage_snapshots (
+    snapshot_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    taken_at TIMESTAMP NOT NULL DEFAULT (datetime('now')),
+    source TEXT NOT NULL, -- 'schedule', 'manual' or 'cli'
+    user_id INTEGER REFERENCES users(user_id),
+    changed_count INTEGER NOT NULL DEFAULT 0 -- Rows in coverage_snapshot_deltas
+);
+
+CREATE INDEX idx_coverage_snapshots_taken_at ON coverage_snapshots (taken_at);
+
+-- Metric summaries that differ from the previous snapshot. A metric's state at
+-- snapshot N is its latest row with snapshot_id <= N; is_removed marks a
+-- metric that was deleted (or lost its last coverage summary) since then.
+CREATE TABLE coverage_snapshot_deltas (
+    metric_type TEXT NOT NULL, -- 'Glean' or 'Legacy'
+    metric_name TEXT NOT NULL,
+    snapshot_id INTEGER NOT NULL REFERENCES coverage_snapshots(snapshot_id) ON DELETE CASCADE,
+    tcid_count INTEGER NOT NULL DEFAULT 0,
+    region_count INTEGER NOT NULL DEFAULT 0,
+    engine_count INTEGER NOT NULL DEFAULT 0,
+    is_removed BOOLEAN NOT NULL DEFAULT FALSE,
+    PRIMARY KEY (metric_type, metric_name, snapshot_id)
+) WITHOUT ROWID;
+
+-- Metric and covered-metric counts per metric type in each snapshot.
+CREATE TABLE coverage_snapshot_totals (
+    snapshot_id INTEGER NOT NULL REFERENCES coverage_snapshots(snapshot_id) ON DELETE CASCADE,
+    metric_type TEXT NOT NULL,
+    metric_count INTEGER NOT NULL,
+    covered_count INTEGER NOT NULL,
+    PRIMARY KEY (snapshot_id, metric_type)
+) WITHOUT ROWID;
+
+PRAGMA user_version = 12;
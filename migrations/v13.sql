@@ -0,0 +1,25 @@
+-- Migration v13: an updated_at timestamp on exceptions.
+-- The exceptions export filtered updated_since on created_at, but
+-- exceptions are removed by a soft delete, which leaves created_at alone,
+-- so an incremental sync never saw an exception being removed (see
+-- iter_export_rows in app/services/database.py). As in v11, the timestamp
+-- is set by triggers because SQLite cannot add a column with a
+-- datetime('now') default.
+
+ALTER TABLE exceptions ADD COLUMN updated_at TIMESTAMP;
+
+UPDATE exceptions SET updated_at = created_at;
+
+CREATE TRIGGER set_exception_updated_at
+AFTER INSERT ON exceptions FOR EACH ROW
+BEGIN
+    UPDATE exceptions SET updated_at = datetime('now') WHERE exception_id = NEW.exception_id;
+END;
+
+CREATE TRIGGER update_exception_updated_at
+AFTER UPDATE OF tc_id, title, metrics, is_deleted ON exceptions FOR EACH ROW
+BEGIN
+    UPDATE exceptions SET updated_at = datetime('now') WHERE exception_id = NEW.exception_id;
+END;
+
+PRAGMA user_version = 13;
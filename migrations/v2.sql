@@ -0,0 +1,34 @@
+-- Migration v2: secondary indexes for the hot read paths.
+-- Partial indexes only cover live rows (is_deleted = FALSE), which is what every reader filters on.
+
+-- Coverage links looked up by metric (status page, planning, reports) and scanned in metric order
+-- (metrics page). Carries every column those reads use (is_deleted included) so they never touch the table.
+CREATE INDEX IF NOT EXISTS idx_link_metric_active
+    ON coverage_to_metric_link (metric_name, metric_type, coverage_id, region, engine, is_deleted)
+    WHERE is_deleted = FALSE;
+
+-- Planned entries looked up by metric.
+CREATE INDEX IF NOT EXISTS idx_planning_metric_active
+    ON planning (metric_name, metric_type, region, engine, is_deleted)
+    WHERE is_deleted = FALSE;
+
+-- Activity log: newest-first listing, optionally filtered by user or action.
+CREATE INDEX IF NOT EXISTS idx_edit_history_timestamp
+    ON edit_history (timestamp, history_id);
+
+CREATE INDEX IF NOT EXISTS idx_edit_history_user_timestamp
+    ON edit_history (user_id, timestamp, history_id);
+
+CREATE INDEX IF NOT EXISTS idx_edit_history_action_timestamp
+    ON edit_history (action, timestamp, history_id);
+
+-- Live coverage / exception rows by TCID.
+CREATE INDEX IF NOT EXISTS idx_coverage_active
+    ON coverage (tc_id, is_deleted)
+    WHERE is_deleted = FALSE;
+
+CREATE INDEX IF NOT EXISTS idx_exceptions_active
+    ON exceptions (tc_id)
+    WHERE is_deleted = FALSE;
+
+PRAGMA user_version = 2;
@@ -0,0 +1,201 @@
+-- Migration v3: per-metric coverage summary, kept current by triggers.
+-- Readers (reports, planning, stats) read counts from metric_coverage_summary
+-- instead of re-aggregating every coverage link on each page view.
+-- Note: links must not be written with INSERT OR REPLACE; rows removed by REPLACE
+-- do not fire DELETE triggers, so the summary would miss the removal.
+
+-- Links that count as coverage: live link, live test case, TCID not on the exception list.
+CREATE VIEW effective_coverage_links AS
+SELECT l.link_id, l.coverage_id, l.metric_name, l.metric_type, l.region, l.engine, c.tc_id, c.tcid_title
+FROM coverage_to_metric_link l
+JOIN coverage c ON c.coverage_id = l.coverage_id
+WHERE l.is_deleted = FALSE
+  AND c.is_deleted = FALSE
+  AND NOT EXISTS (SELECT 1 FROM exceptions e WHERE e.tc_id = c.tc_id AND e.is_deleted = FALSE);
+
+CREATE TABLE metric_coverage_summary (
+    metric_name TEXT NOT NULL,
+    metric_type TEXT NOT NULL, -- 'Glean' or 'Legacy'
+    tcid_count INTEGER NOT NULL DEFAULT 0,
+    region_count INTEGER NOT NULL DEFAULT 0,
+    engine_count INTEGER NOT NULL DEFAULT 0,
+    is_covered BOOLEAN GENERATED ALWAYS AS (tcid_count > 0) VIRTUAL,
+    PRIMARY KEY (metric_name, metric_type)
+);
+
+CREATE INDEX idx_metric_coverage_summary_type ON metric_coverage_summary (metric_type, tcid_count);
+
+-- Lets the insert trigger check "is this region/engine already covered for this metric?" with one probe.
+CREATE INDEX idx_link_metric_region_active
+    ON coverage_to_metric_link (metric_name, metric_type, region, coverage_id, is_deleted)
+    WHERE is_deleted = FALSE;
+
+CREATE INDEX idx_link_metric_engine_active
+    ON coverage_to_metric_link (metric_name, metric_type, engine, coverage_id, is_deleted)
+    WHERE is_deleted = FALSE;
+
+-- Backfill from the existing data.
+INSERT INTO metric_coverage_summary (metric_name, metric_type, tcid_count, region_count, engine_count)
+SELECT metric_name, metric_type, COUNT(DISTINCT coverage_id), COUNT(DISTINCT region), COUNT(DISTINCT engine)
+FROM effective_coverage_links
+GROUP BY metric_name, metric_type;
+
+-- New link (the bulk-import path): bump the counts incrementally instead of re-aggregating the metric.
+CREATE TRIGGER coverage_summary_link_insert
+AFTER INSERT ON coverage_to_metric_link FOR EACH ROW
+WHEN NEW.is_deleted = FALSE
+BEGIN
+    INSERT INTO metric_coverage_summary (metric_name, metric_type)
+    SELECT NEW.metric_name, NEW.metric_type
+    WHERE NOT EXISTS (SELECT 1 FROM metric_coverage_summary WHERE metric_name = NEW.metric_name AND metric_type = NEW.metric_type);
+
+    UPDATE metric_coverage_summary SET
+        tcid_count = tcid_count + NOT EXISTS (
+            SELECT 1 FROM coverage_to_metric_link l
+            WHERE l.metric_name = NEW.metric_name AND l.metric_type = NEW.metric_type
+              AND l.coverage_id = NEW.coverage_id AND l.is_deleted = FALSE AND l.link_id <> NEW.link_id
+        ),
+        region_count = region_count + (NEW.region IS NOT NULL AND NOT EXISTS (
+            SELECT 1 FROM effective_coverage_links v
+            WHERE v.metric_name = NEW.metric_name AND v.metric_type = NEW.metric_type
+              AND v.region = NEW.region AND v.link_id <> NEW.link_id
+        )),
+        engine_count = engine_count + (NEW.engine IS NOT NULL AND NOT EXISTS (
+            SELECT 1 FROM effective_coverage_links v
+            WHERE v.metric_name = NEW.metric_name AND v.metric_type = NEW.metric_type
+              AND v.engine = NEW.engine AND v.link_id <> NEW.link_id
+        ))
+    WHERE metric_name = NEW.metric_name AND metric_type = NEW.metric_type
+      AND EXISTS (SELECT 1 FROM effective_coverage_links v WHERE v.link_id = NEW.link_id);
+END;
+
+-- Changed or removed links: recompute the affected metric(s).
+-- Triggers here never rely on an OR IGNORE / OR REPLACE clause: the conflict clause of the statement that
+-- fired the trigger (e.g. INSERT OR IGNORE INTO exceptions) overrides the ones used inside it. Summary rows
+-- are created with INSERT ... WHERE NOT EXISTS and recomputed with a plain UPDATE instead.
+CREATE TRIGGER coverage_summary_link_update
+AFTER UPDATE OF coverage_id, metric_name, metric_type, region, engine, is_deleted ON coverage_to_metric_link FOR EACH ROW
+BEGIN
+    INSERT INTO metric_coverage_summary (metric_name, metric_type)
+    SELECT OLD.metric_name, OLD.metric_type
+    WHERE NOT EXISTS (SELECT 1 FROM metric_coverage_summary WHERE metric_name = OLD.metric_name AND metric_type = OLD.metric_type);
+    UPDATE metric_coverage_summary SET
+        tcid_count = (SELECT COUNT(DISTINCT v.coverage_id) FROM effective_coverage_links v
+                      WHERE v.metric_name = metric_coverage_summary.metric_name AND v.metric_type = metric_coverage_summary.metric_type),
+        region_count = (SELECT COUNT(DISTINCT v.region) FROM effective_coverage_links v
+                        WHERE v.metric_name = metric_coverage_summary.metric_name AND v.metric_type = metric_coverage_summary.metric_type),
+        engine_count = (SELECT COUNT(DISTINCT v.engine) FROM effective_coverage_links v
+                        WHERE v.metric_name = metric_coverage_summary.metric_name AND v.metric_type = metric_coverage_summary.metric_type)
+    WHERE metric_name = OLD.metric_name AND metric_type = OLD.metric_type;
+
+    INSERT INTO metric_coverage_summary (metric_name, metric_type)
+    SELECT NEW.metric_name, NEW.metric_type
+    WHERE NOT EXISTS (SELECT 1 FROM metric_coverage_summary WHERE metric_name = NEW.metric_name AND metric_type = NEW.metric_type);
+    UPDATE metric_coverage_summary SET
+        tcid_count = (SELECT COUNT(DISTINCT v.coverage_id) FROM effective_coverage_links v
+                      WHERE v.metric_name = metric_coverage_summary.metric_name AND v.metric_type = metric_coverage_summary.metric_type),
+        region_count = (SELECT COUNT(DISTINCT v.region) FROM effective_coverage_links v
+                        WHERE v.metric_name = metric_coverage_summary.metric_name AND v.metric_type = metric_coverage_summary.metric_type),
+        engine_count = (SELECT COUNT(DISTINCT v.engine) FROM effective_coverage_links v
+                        WHERE v.metric_name = metric_coverage_summary.metric_name AND v.metric_type = metric_coverage_summary.metric_type)
+    WHERE metric_name = NEW.metric_name AND metric_type = NEW.metric_type;
+END;
+
+CREATE TRIGGER coverage_summary_link_delete
+AFTER DELETE ON coverage_to_metric_link FOR EACH ROW
+BEGIN
+    INSERT INTO metric_coverage_summary (metric_name, metric_type)
+    SELECT OLD.metric_name, OLD.metric_type
+    WHERE NOT EXISTS (SELECT 1 FROM metric_coverage_summary WHERE metric_name = OLD.metric_name AND metric_type = OLD.metric_type);
+    UPDATE metric_coverage_summary SET
+        tcid_count = (SELECT COUNT(DISTINCT v.coverage_id) FROM effective_coverage_links v
+                      WHERE v.metric_name = metric_coverage_summary.metric_name AND v.metric_type = metric_coverage_summary.metric_type),
+        region_count = (SELECT COUNT(DISTINCT v.region) FROM effective_coverage_links v
+                        WHERE v.metric_name = metric_coverage_summary.metric_name AND v.metric_type = metric_coverage_summary.metric_type),
+        engine_count = (SELECT COUNT(DISTINCT v.engine) FROM effective_coverage_links v
+                        WHERE v.metric_name = metric_coverage_summary.metric_name AND v.metric_type = metric_coverage_summary.metric_type)
+    WHERE metric_name = OLD.metric_name AND metric_type = OLD.metric_type;
+END;
+
+-- A test case was (un)deleted or renamed: recompute every metric it links to.
+-- (Every metric that has ever had a live link already has a summary row.)
+CREATE TRIGGER coverage_summary_coverage_update
+AFTER UPDATE OF tc_id, is_deleted ON coverage FOR EACH ROW
+WHEN OLD.is_deleted IS NOT NEW.is_deleted OR OLD.tc_id IS NOT NEW.tc_id
+BEGIN
+    UPDATE metric_coverage_summary SET
+        tcid_count = (SELECT COUNT(DISTINCT v.coverage_id) FROM effective_coverage_links v
+                      WHERE v.metric_name = metric_coverage_summary.metric_name AND v.metric_type = metric_coverage_summary.metric_type),
+        region_count = (SELECT COUNT(DISTINCT v.region) FROM effective_coverage_links v
+                        WHERE v.metric_name = metric_coverage_summary.metric_name AND v.metric_type = metric_coverage_summary.metric_type),
+        engine_count = (SELECT COUNT(DISTINCT v.engine) FROM effective_coverage_links v
+                        WHERE v.metric_name = metric_coverage_summary.metric_name AND v.metric_type = metric_coverage_summary.metric_type)
+    WHERE (metric_name, metric_type) IN (SELECT l.metric_name, l.metric_type FROM coverage_to_metric_link l WHERE l.coverage_id = NEW.coverage_id);
+END;
+
+CREATE TRIGGER coverage_summary_coverage_delete
+AFTER DELETE ON coverage FOR EACH ROW
+BEGIN
+    UPDATE metric_coverage_summary SET
+        tcid_count = (SELECT COUNT(DISTINCT v.coverage_id) FROM effective_coverage_links v
+                      WHERE v.metric_name = metric_coverage_summary.metric_name AND v.metric_type = metric_coverage_summary.metric_type),
+        region_count = (SELECT COUNT(DISTINCT v.region) FROM effective_coverage_links v
+                        WHERE v.metric_name = metric_coverage_summary.metric_name AND v.metric_type = metric_coverage_summary.metric_type),
+        engine_count = (SELECT COUNT(DISTINCT v.engine) FROM effective_coverage_links v
+                        WHERE v.metric_name = metric_coverage_summary.metric_name AND v.metric_type = metric_coverage_summary.metric_type)
+    WHERE (metric_name, metric_type) IN (SELECT l.metric_name, l.metric_type FROM coverage_to_metric_link l WHERE l.coverage_id = OLD.coverage_id);
+END;
+
+-- The exception list changed: recompute every metric the affected TCID links to.
+CREATE TRIGGER coverage_summary_exception_insert
+AFTER INSERT ON exceptions FOR EACH ROW
+BEGIN
+    UPDATE metric_coverage_summary SET
+        tcid_count = (SELECT COUNT(DISTINCT v.coverage_id) FROM effective_coverage_links v
+                      WHERE v.metric_name = metric_coverage_summary.metric_name AND v.metric_type = metric_coverage_summary.metric_type),
+        region_count = (SELECT COUNT(DISTINCT v.region) FROM effective_coverage_links v
+                        WHERE v.metric_name = metric_coverage_summary.metric_name AND v.metric_type = metric_coverage_summary.metric_type),
+        engine_count = (SELECT COUNT(DISTINCT v.engine) FROM effective_coverage_links v
+                        WHERE v.metric_name = metric_coverage_summary.metric_name AND v.metric_type = metric_coverage_summary.metric_type)
+    WHERE (metric_name, metric_type) IN (
+        SELECT l.metric_name, l.metric_type
+        FROM coverage c JOIN coverage_to_metric_link l ON l.coverage_id = c.coverage_id
+        WHERE c.tc_id = NEW.tc_id
+    );
+END;
+
+CREATE TRIGGER coverage_summary_exception_update
+AFTER UPDATE OF tc_id, is_deleted ON exceptions FOR EACH ROW
+BEGIN
+    UPDATE metric_coverage_summary SET
+        tcid_count = (SELECT COUNT(DISTINCT v.coverage_id) FROM effective_coverage_links v
+                      WHERE v.metric_name = metric_coverage_summary.metric_name AND v.metric_type = metric_coverage_summary.metric_type),
+        region_count = (SELECT COUNT(DISTINCT v.region) FROM effective_coverage_links v
+                        WHERE v.metric_name = metric_coverage_summary.metric_name AND v.metric_type = metric_coverage_summary.metric_type),
+        engine_count = (SELECT COUNT(DISTINCT v.engine) FROM effective_coverage_links v
+                        WHERE v.metric_name = metric_coverage_summary.metric_name AND v.metric_type = metric_coverage_summary.metric_type)
+    WHERE (metric_name, metric_type) IN (
+        SELECT l.metric_name, l.metric_type
+        FROM coverage c JOIN coverage_to_metric_link l ON l.coverage_id = c.coverage_id
+        WHERE c.tc_id IN (OLD.tc_id, NEW.tc_id)
+    );
+END;
+
+CREATE TRIGGER coverage_summary_exception_delete
+AFTER DELETE ON exceptions FOR EACH ROW
+BEGIN
+    UPDATE metric_coverage_summary SET
+        tcid_count = (SELECT COUNT(DISTINCT v.coverage_id) FROM effective_coverage_links v
+                      WHERE v.metric_name = metric_coverage_summary.metric_name AND v.metric_type = metric_coverage_summary.metric_type),
+        region_count = (SELECT COUNT(DISTINCT v.region) FROM effective_coverage_links v
+                        WHERE v.metric_name = metric_coverage_summary.metric_name AND v.metric_type = metric_coverage_summary.metric_type),
+        engine_count = (SELECT COUNT(DISTINCT v.engine) FROM effective_coverage_links v
+                        WHERE v.metric_name = metric_coverage_summary.metric_name AND v.metric_type = metric_coverage_summary.metric_type)
+    WHERE (metric_name, metric_type) IN (
+        SELECT l.metric_name, l.metric_type
+        FROM coverage c JOIN coverage_to_metric_link l ON l.coverage_id = c.coverage_id
+        WHERE c.tc_id = OLD.tc_id
+    );
+END;
+
+PRAGMA user_version = 3;
@@ -0,0 +1,14 @@
+-- Migration v4: global data version for response caching.
+-- The database writer bumps the counter in the same transaction as every batch
+-- that changed rows, so all worker processes see one shared version.
+
+CREATE TABLE data_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+);
+
+-- Start from the current time so a recreated database never reuses the
+-- versions (and ETags) handed out by an earlier one.
+INSERT INTO data_version (id, version) VALUES (1, CAST(strftime('%s', 'now') AS INTEGER));
+
+PRAGMA user_version = 4;
@@ -0,0 +1,173 @@
+-- Migration v5: search suggestion vocabulary.
+-- search_terms holds every live metric name, TC ID, region and engine, with a
+-- reference count for values shared by several rows (regions and engines).
+-- Triggers keep it current, so a suggestion lookup is a single range scan on
+-- the lower-cased term instead of five full-table queries.
+
+CREATE TABLE search_terms (
+    kind TEXT NOT NULL, -- 'glean', 'legacy', 'tcid', 'region' or 'engine'
+    term TEXT NOT NULL,
+    term_key TEXT NOT NULL, -- lower(term), for case-insensitive prefix ranges
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (kind, term)
+) WITHOUT ROWID;
+
+CREATE INDEX idx_search_terms_key ON search_terms (term_key, term, kind);
+
+-- Backfill from the existing data.
+INSERT INTO search_terms (kind, term, term_key, ref_count)
+SELECT 'glean', glean_name, lower(glean_name), 1 FROM glean_metrics WHERE is_deleted = FALSE;
+INSERT INTO search_terms (kind, term, term_key, ref_count)
+SELECT 'legacy', legacy_name, lower(legacy_name), 1 FROM legacy_metrics WHERE is_deleted = FALSE;
+INSERT INTO search_terms (kind, term, term_key, ref_count)
+SELECT 'tcid', tc_id, lower(tc_id), 1 FROM coverage WHERE is_deleted = FALSE;
+INSERT INTO search_terms (kind, term, term_key, ref_count)
+SELECT 'region', region, lower(region), COUNT(*) FROM coverage_to_metric_link
+WHERE is_deleted = FALSE AND region IS NOT NULL GROUP BY region;
+INSERT INTO search_terms (kind, term, term_key, ref_count)
+SELECT 'engine', engine, lower(engine), COUNT(*) FROM coverage_to_metric_link
+WHERE is_deleted = FALSE AND engine IS NOT NULL GROUP BY engine;
+
+-- glean_metrics.glean_name
+CREATE TRIGGER search_terms_glean_insert AFTER INSERT ON glean_metrics
+BEGIN
+    INSERT INTO search_terms (kind, term, term_key, ref_count)
+    SELECT 'glean', NEW.glean_name, lower(NEW.glean_name), 0
+    WHERE NEW.glean_name IS NOT NULL AND NEW.is_deleted = FALSE
+      AND NOT EXISTS (SELECT 1 FROM search_terms WHERE kind = 'glean' AND term = NEW.glean_name);
+    UPDATE search_terms SET ref_count = ref_count + 1
+    WHERE kind = 'glean' AND term = NEW.glean_name AND NEW.is_deleted = FALSE;
+END;
+
+CREATE TRIGGER search_terms_glean_update AFTER UPDATE OF glean_name, is_deleted ON glean_metrics
+BEGIN
+    UPDATE search_terms SET ref_count = ref_count - 1
+    WHERE kind = 'glean' AND term = OLD.glean_name AND OLD.is_deleted = FALSE;
+    DELETE FROM search_terms WHERE kind = 'glean' AND term = OLD.glean_name AND ref_count <= 0;
+    INSERT INTO search_terms (kind, term, term_key, ref_count)
+    SELECT 'glean', NEW.glean_name, lower(NEW.glean_name), 0
+    WHERE NEW.glean_name IS NOT NULL AND NEW.is_deleted = FALSE
+      AND NOT EXISTS (SELECT 1 FROM search_terms WHERE kind = 'glean' AND term = NEW.glean_name);
+    UPDATE search_terms SET ref_count = ref_count + 1
+    WHERE kind = 'glean' AND term = NEW.glean_name AND NEW.is_deleted = FALSE;
+END;
+
+CREATE TRIGGER search_terms_glean_delete AFTER DELETE ON glean_metrics
+BEGIN
+    UPDATE search_terms SET ref_count = ref_count - 1
+    WHERE kind = 'glean' AND term = OLD.glean_name AND OLD.is_deleted = FALSE;
+    DELETE FROM search_terms WHERE kind = 'glean' AND term = OLD.glean_name AND ref_count <= 0;
+END;
+
+-- legacy_metrics.legacy_name
+CREATE TRIGGER search_terms_legacy_insert AFTER INSERT ON legacy_metrics
+BEGIN
+    INSERT INTO search_terms (kind, term, term_key, ref_count)
+    SELECT 'legacy', NEW.legacy_name, lower(NEW.legacy_name), 0
+    WHERE NEW.legacy_name IS NOT NULL AND NEW.is_deleted = FALSE
+      AND NOT EXISTS (SELECT 1 FROM search_terms WHERE kind = 'legacy' AND term = NEW.legacy_name);
+    UPDATE search_terms SET ref_count = ref_count + 1
+    WHERE kind = 'legacy' AND term = NEW.legacy_name AND NEW.is_deleted = FALSE;
+END;
+
+CREATE TRIGGER search_terms_legacy_update AFTER UPDATE OF legacy_name, is_deleted ON legacy_metrics
+BEGIN
+    UPDATE search_terms SET ref_count = ref_count - 1
+    WHERE kind = 'legacy' AND term = OLD.legacy_name AND OLD.is_deleted = FALSE;
+    DELETE FROM search_terms WHERE kind = 'legacy' AND term = OLD.legacy_name AND ref_count <= 0;
+    INSERT INTO search_terms (kind, term, term_key, ref_count)
+    SELECT 'legacy', NEW.legacy_name, lower(NEW.legacy_name), 0
+    WHERE NEW.legacy_name IS NOT NULL AND NEW.is_deleted = FALSE
+      AND NOT EXISTS (SELECT 1 FROM search_terms WHERE kind = 'legacy' AND term = NEW.legacy_name);
+    UPDATE search_terms SET ref_count = ref_count + 1
+    WHERE kind = 'legacy' AND term = NEW.legacy_name AND NEW.is_deleted = FALSE;
+END;
+
+CREATE TRIGGER search_terms_legacy_delete AFTER DELETE ON legacy_metrics
+BEGIN
+    UPDATE search_terms SET ref_count = ref_count - 1
+    WHERE kind = 'legacy' AND term = OLD.legacy_name AND OLD.is_deleted = FALSE;
+    DELETE FROM search_terms WHERE kind = 'legacy' AND term = OLD.legacy_name AND ref_count <= 0;
+END;
+
+-- coverage.tc_id
+CREATE TRIGGER search_terms_coverage_insert AFTER INSERT ON coverage
+BEGIN
+    INSERT INTO search_terms (kind, term, term_key, ref_count)
+    SELECT 'tcid', NEW.tc_id, lower(NEW.tc_id), 0
+    WHERE NEW.tc_id IS NOT NULL AND NEW.is_deleted = FALSE
+      AND NOT EXISTS (SELECT 1 FROM search_terms WHERE kind = 'tcid' AND term = NEW.tc_id);
+    UPDATE search_terms SET ref_count = ref_count + 1
+    WHERE kind = 'tcid' AND term = NEW.tc_id AND NEW.is_deleted = FALSE;
+END;
+
+CREATE TRIGGER search_terms_coverage_update AFTER UPDATE OF tc_id, is_deleted ON coverage
+BEGIN
+    UPDATE search_terms SET ref_count = ref_count - 1
+    WHERE kind = 'tcid' AND term = OLD.tc_id AND OLD.is_deleted = FALSE;
+    DELETE FROM search_terms WHERE kind = 'tcid' AND term = OLD.tc_id AND ref_count <= 0;
+    INSERT INTO search_terms (kind, term, term_key, ref_count)
+    SELECT 'tcid', NEW.tc_id, lower(NEW.tc_id), 0
+    WHERE NEW.tc_id IS NOT NULL AND NEW.is_deleted = FALSE
+      AND NOT EXISTS (SELECT 1 FROM search_terms WHERE kind = 'tcid' AND term = NEW.tc_id);
+    UPDATE search_terms SET ref_count = ref_count + 1
+    WHERE kind = 'tcid' AND term = NEW.tc_id AND NEW.is_deleted = FALSE;
+END;
+
+CREATE TRIGGER search_terms_coverage_delete AFTER DELETE ON coverage
+BEGIN
+    UPDATE search_terms SET ref_count = ref_count - 1
+    WHERE kind = 'tcid' AND term = OLD.tc_id AND OLD.is_deleted = FALSE;
+    DELETE FROM search_terms WHERE kind = 'tcid' AND term = OLD.tc_id AND ref_count <= 0;
+END;
+
+-- coverage_to_metric_link.region / .engine
+CREATE TRIGGER search_terms_link_insert AFTER INSERT ON coverage_to_metric_link
+BEGIN
+    INSERT INTO search_terms (kind, term, term_key, ref_count)
+    SELECT 'region', NEW.region, lower(NEW.region), 0
+    WHERE NEW.region IS NOT NULL AND NEW.is_deleted = FALSE
+      AND NOT EXISTS (SELECT 1 FROM search_terms WHERE kind = 'region' AND term = NEW.region);
+    UPDATE search_terms SET ref_count = ref_count + 1
+    WHERE kind = 'region' AND term = NEW.region AND NEW.is_deleted = FALSE;
+    INSERT INTO search_terms (kind, term, term_key, ref_count)
+    SELECT 'engine', NEW.engine, lower(NEW.engine), 0
+    WHERE NEW.engine IS NOT NULL AND NEW.is_deleted = FALSE
+      AND NOT EXISTS (SELECT 1 FROM search_terms WHERE kind = 'engine' AND term = NEW.engine);
+    UPDATE search_terms SET ref_count = ref_count + 1
+    WHERE kind = 'engine' AND term = NEW.engine AND NEW.is_deleted = FALSE;
+END;
+
+CREATE TRIGGER search_terms_link_update AFTER UPDATE OF region, engine, is_deleted ON coverage_to_metric_link
+BEGIN
+    UPDATE search_terms SET ref_count = ref_count - 1
+    WHERE kind = 'region' AND term = OLD.region AND OLD.is_deleted = FALSE;
+    DELETE FROM search_terms WHERE kind = 'region' AND term = OLD.region AND ref_count <= 0;
+    UPDATE search_terms SET ref_count = ref_count - 1
+    WHERE kind = 'engine' AND term = OLD.engine AND OLD.is_deleted = FALSE;
+    DELETE FROM search_terms WHERE kind = 'engine' AND term = OLD.engine AND ref_count <= 0;
+    INSERT INTO search_terms (kind, term, term_key, ref_count)
+    SELECT 'region', NEW.region, lower(NEW.region), 0
+    WHERE NEW.region IS NOT NULL AND NEW.is_deleted = FALSE
+      AND NOT EXISTS (SELECT 1 FROM search_terms WHERE kind = 'region' AND term = NEW.region);
+    UPDATE search_terms SET ref_count = ref_count + 1
+    WHERE kind = 'region' AND term = NEW.region AND NEW.is_deleted = FALSE;
+    INSERT INTO search_terms (kind, term, term_key, ref_count)
+    SELECT 'engine', NEW.engine, lower(NEW.engine), 0
+    WHERE NEW.engine IS NOT NULL AND NEW.is_deleted = FALSE
+      AND NOT EXISTS (SELECT 1 FROM search_terms WHERE kind = 'engine' AND term = NEW.engine);
+    UPDATE search_terms SET ref_count = ref_count + 1
+    WHERE kind = 'engine' AND term = NEW.engine AND NEW.is_deleted = FALSE;
+END;
+
+CREATE TRIGGER search_terms_link_delete AFTER DELETE ON coverage_to_metric_link
+BEGIN
+    UPDATE search_terms SET ref_count = ref_count - 1
+    WHERE kind = 'region' AND term = OLD.region AND OLD.is_deleted = FALSE;
+    DELETE FROM search_terms WHERE kind = 'region' AND term = OLD.region AND ref_count <= 0;
+    UPDATE search_terms SET ref_count = ref_count - 1
+    WHERE kind = 'engine' AND term = OLD.engine AND OLD.is_deleted = FALSE;
+    DELETE FROM search_terms WHERE kind = 'engine' AND term = OLD.engine AND ref_count <= 0;
+END;
+
+PRAGMA user_version = 5;
@@ -0,0 +1,131 @@
+-- Migration v6: full-text search over metric names, descriptions and notes,
+-- and test case titles.
+-- Every live Glean metric, Legacy metric and test case is one document in the
+-- FTS5 table search_index. search_index_docs gives each document a stable id
+-- (the FTS rowid); the metric tables' own rowids may be renumbered by VACUUM.
+-- Triggers keep both tables current.
+
+CREATE TABLE search_index_docs (
+    doc_id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL, -- 'glean', 'legacy' or 'tcid'
+    ref TEXT NOT NULL, -- metric name or TC ID
+    UNIQUE (kind, ref)
+);
+
+CREATE VIRTUAL TABLE search_index USING fts5(
+    name,
+    body, -- metric description or test case title
+    notes,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+
+-- Backfill from the existing data.
+INSERT INTO search_index_docs (kind, ref)
+SELECT 'glean', glean_name FROM glean_metrics WHERE is_deleted = FALSE;
+INSERT INTO search_index_docs (kind, ref)
+SELECT 'legacy', legacy_name FROM legacy_metrics WHERE is_deleted = FALSE;
+INSERT INTO search_index_docs (kind, ref)
+SELECT 'tcid', tc_id FROM coverage WHERE is_deleted = FALSE;
+
+INSERT INTO search_index (rowid, name, body, notes)
+SELECT d.doc_id, m.glean_name, m.description, m.notes
+FROM search_index_docs d JOIN glean_metrics m ON d.kind = 'glean' AND m.glean_name = d.ref;
+INSERT INTO search_index (rowid, name, body, notes)
+SELECT d.doc_id, m.legacy_name, m.description, m.notes
+FROM search_index_docs d JOIN legacy_metrics m ON d.kind = 'legacy' AND m.legacy_name = d.ref;
+INSERT INTO search_index (rowid, name, body, notes)
+SELECT d.doc_id, c.tc_id, c.tcid_title, NULL
+FROM search_index_docs d JOIN coverage c ON d.kind = 'tcid' AND c.tc_id = d.ref;
+
+-- glean_metrics
+CREATE TRIGGER search_index_glean_insert AFTER INSERT ON glean_metrics
+WHEN NEW.is_deleted = FALSE
+BEGIN
+    INSERT INTO search_index_docs (kind, ref) SELECT 'glean', NEW.glean_name
+    WHERE NOT EXISTS (SELECT 1 FROM search_index_docs WHERE kind = 'glean' AND ref = NEW.glean_name);
+    INSERT INTO search_index (rowid, name, body, notes)
+    SELECT doc_id, NEW.glean_name, NEW.description, NEW.notes
+    FROM search_index_docs WHERE kind = 'glean' AND ref = NEW.glean_name;
+END;
+
+CREATE TRIGGER search_index_glean_update AFTER UPDATE OF glean_name, description, notes, is_deleted ON glean_metrics
+BEGIN
+    DELETE FROM search_index
+    WHERE rowid = (SELECT doc_id FROM search_index_docs WHERE kind = 'glean' AND ref = OLD.glean_name);
+    DELETE FROM search_index_docs WHERE kind = 'glean' AND ref = OLD.glean_name;
+    INSERT INTO search_index_docs (kind, ref) SELECT 'glean', NEW.glean_name
+    WHERE NEW.is_deleted = FALSE;
+    INSERT INTO search_index (rowid, name, body, notes)
+    SELECT doc_id, NEW.glean_name, NEW.description, NEW.notes
+    FROM search_index_docs WHERE kind = 'glean' AND ref = NEW.glean_name AND NEW.is_deleted = FALSE;
+END;
+
+CREATE TRIGGER search_index_glean_delete AFTER DELETE ON glean_metrics
+BEGIN
+    DELETE FROM search_index
+    WHERE rowid = (SELECT doc_id FROM search_index_docs WHERE kind = 'glean' AND ref = OLD.glean_name);
+    DELETE FROM search_index_docs WHERE kind = 'glean' AND ref = OLD.glean_name;
+END;
+
+-- legacy_metrics
+CREATE TRIGGER search_index_legacy_insert AFTER INSERT ON legacy_metrics
+WHEN NEW.is_deleted = FALSE
+BEGIN
+    INSERT INTO search_index_docs (kind, ref) SELECT 'legacy', NEW.legacy_name
+    WHERE NOT EXISTS (SELECT 1 FROM search_index_docs WHERE kind = 'legacy' AND ref = NEW.legacy_name);
+    INSERT INTO search_index (rowid, name, body, notes)
+    SELECT doc_id, NEW.legacy_name, NEW.description, NEW.notes
+    FROM search_index_docs WHERE kind = 'legacy' AND ref = NEW.legacy_name;
+END;
+
+CREATE TRIGGER search_index_legacy_update AFTER UPDATE OF legacy_name, description, notes, is_deleted ON legacy_metrics
+BEGIN
+    DELETE FROM search_index
+    WHERE rowid = (SELECT doc_id FROM search_index_docs WHERE kind = 'legacy' AND ref = OLD.legacy_name);
+    DELETE FROM search_index_docs WHERE kind = 'legacy' AND ref = OLD.legacy_name;
+    INSERT INTO search_index_docs (kind, ref) SELECT 'legacy', NEW.legacy_name
+    WHERE NEW.is_deleted = FALSE;
+    INSERT INTO search_index (rowid, name, body, notes)
+    SELECT doc_id, NEW.legacy_name, NEW.description, NEW.notes
+    FROM search_index_docs WHERE kind = 'legacy' AND ref = NEW.legacy_name AND NEW.is_deleted = FALSE;
+END;
+
+CREATE TRIGGER search_index_legacy_delete AFTER DELETE ON legacy_metrics
+BEGIN
+    DELETE FROM search_index
+    WHERE rowid = (SELECT doc_id FROM search_index_docs WHERE kind = 'legacy' AND ref = OLD.legacy_name);
+    DELETE FROM search_index_docs WHERE kind = 'legacy' AND ref = OLD.legacy_name;
+END;
+
+-- coverage
+CREATE TRIGGER search_index_coverage_insert AFTER INSERT ON coverage
+WHEN NEW.is_deleted = FALSE
+BEGIN
+    INSERT INTO search_index_docs (kind, ref) SELECT 'tcid', NEW.tc_id
+    WHERE NOT EXISTS (SELECT 1 FROM search_index_docs WHERE kind = 'tcid' AND ref = NEW.tc_id);
+    INSERT INTO search_index (rowid, name, body, notes)
+    SELECT doc_id, NEW.tc_id, NEW.tcid_title, NULL
+    FROM search_index_docs WHERE kind = 'tcid' AND ref = NEW.tc_id;
+END;
+
+CREATE TRIGGER search_index_coverage_update AFTER UPDATE OF tc_id, tcid_title, is_deleted ON coverage
+BEGIN
+    DELETE FROM search_index
+    WHERE rowid = (SELECT doc_id FROM search_index_docs WHERE kind = 'tcid' AND ref = OLD.tc_id);
+    DELETE FROM search_index_docs WHERE kind = 'tcid' AND ref = OLD.tc_id;
+    INSERT INTO search_index_docs (kind, ref) SELECT 'tcid', NEW.tc_id
+    WHERE NEW.is_deleted = FALSE;
+    INSERT INTO search_index (rowid, name, body, notes)
+    SELECT doc_id, NEW.tc_id, NEW.tcid_title, NULL
+    FROM search_index_docs WHERE kind = 'tcid' AND ref = NEW.tc_id AND NEW.is_deleted = FALSE;
+END;
+
+CREATE TRIGGER search_index_coverage_delete AFTER DELETE ON coverage
+BEGIN
+    DELETE FROM search_index
+    WHERE rowid = (SELECT doc_id FROM search_index_docs WHERE kind = 'tcid' AND ref = OLD.tc_id);
+    DELETE FROM search_index_docs WHERE kind = 'tcid' AND ref = OLD.tc_id;
+END;
+
+PRAGMA user_version = 6;
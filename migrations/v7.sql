@@ -0,0 +1,40 @@
+-- Migration v7: full-text index over the edit history.
+-- edit_history_fts is an external-content FTS5 table: it stores only the index
+-- and reads the text back from edit_history by history_id. Triggers keep it in
+-- step with the history table, so the activity log search no longer needs
+-- LIKE '%term%' scans over every row.
+
+CREATE VIRTUAL TABLE edit_history_fts USING fts5(
+    table_name,
+    record_pk,
+    details,
+    content = 'edit_history',
+    content_rowid = 'history_id',
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+
+-- Index the existing history.
+INSERT INTO edit_history_fts (edit_history_fts) VALUES ('rebuild');
+
+CREATE TRIGGER edit_history_fts_insert AFTER INSERT ON edit_history
+BEGIN
+    INSERT INTO edit_history_fts (rowid, table_name, record_pk, details)
+    VALUES (NEW.history_id, NEW.table_name, NEW.record_pk, NEW.details);
+END;
+
+CREATE TRIGGER edit_history_fts_update AFTER UPDATE OF table_name, record_pk, details ON edit_history
+BEGIN
+    INSERT INTO edit_history_fts (edit_history_fts, rowid, table_name, record_pk, details)
+    VALUES ('delete', OLD.history_id, OLD.table_name, OLD.record_pk, OLD.details);
+    INSERT INTO edit_history_fts (rowid, table_name, record_pk, details)
+    VALUES (NEW.history_id, NEW.table_name, NEW.record_pk, NEW.details);
+END;
+
+CREATE TRIGGER edit_history_fts_delete AFTER DELETE ON edit_history
+BEGIN
+    INSERT INTO edit_history_fts (edit_history_fts, rowid, table_name, record_pk, details)
+    VALUES ('delete', OLD.history_id, OLD.table_name, OLD.record_pk, OLD.details);
+END;
+
+PRAGMA user_version = 7;
@@ -0,0 +1,46 @@
+-- Migration v8: bulk audit records.
+-- A bulk import now writes one edit_history entry whose manifest column holds
+-- the imported rows as a JSON array, instead of one entry per row. The history
+-- full-text index is rebuilt to cover the manifest as well.
+
+ALTER TABLE edit_history ADD COLUMN manifest TEXT;
+
+DROP TRIGGER edit_history_fts_insert;
+DROP TRIGGER edit_history_fts_update;
+DROP TRIGGER edit_history_fts_delete;
+DROP TABLE edit_history_fts;
+
+CREATE VIRTUAL TABLE edit_history_fts USING fts5(
+    table_name,
+    record_pk,
+    details,
+    manifest,
+    content = 'edit_history',
+    content_rowid = 'history_id',
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+
+INSERT INTO edit_history_fts (edit_history_fts) VALUES ('rebuild');
+
+CREATE TRIGGER edit_history_fts_insert AFTER INSERT ON edit_history
+BEGIN
+    INSERT INTO edit_history_fts (rowid, table_name, record_pk, details, manifest)
+    VALUES (NEW.history_id, NEW.table_name, NEW.record_pk, NEW.details, NEW.manifest);
+END;
+
+CREATE TRIGGER edit_history_fts_update AFTER UPDATE OF table_name, record_pk, details, manifest ON edit_history
+BEGIN
+    INSERT INTO edit_history_fts (edit_history_fts, rowid, table_name, record_pk, details, manifest)
+    VALUES ('delete', OLD.history_id, OLD.table_name, OLD.record_pk, OLD.details, OLD.manifest);
+    INSERT INTO edit_history_fts (rowid, table_name, record_pk, details, manifest)
+    VALUES (NEW.history_id, NEW.table_name, NEW.record_pk, NEW.details, NEW.manifest);
+END;
+
+CREATE TRIGGER edit_history_fts_delete AFTER DELETE ON edit_history
+BEGIN
+    INSERT INTO edit_history_fts (edit_history_fts, rowid, table_name, record_pk, details, manifest)
+    VALUES ('delete', OLD.history_id, OLD.table_name, OLD.record_pk, OLD.details, OLD.manifest);
+END;
+
+PRAGMA user_version = 8;
@@ -0,0 +1,14 @@
+-- Migration v9: supported regions.
+-- The extraction tools used to recognise a hard-coded list of region codes.
+-- Regions are now data, managed like supported_engines, so a new locale can
+-- be added from the management page.
+
+CREATE TABLE supported_regions (
+    name TEXT PRIMARY KEY NOT NULL
+);
+
+-- Pre-populate with the regions the extraction tools recognised before.
+INSERT INTO supported_regions (name) VALUES
+('US'), ('DE'), ('JP'), ('FR'), ('GB'), ('IT'), ('ES'), ('CA'), ('IN'), ('TO');
+
+PRAGMA user_version = 9;
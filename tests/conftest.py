@@ -0,0 +1,32 @@
+# C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/tests/conftest.py
+
+import pytest
+from app import create_app
+from app.db import get_db
+
+
+@pytest.fixture
+def app(tmp_path):
+    """An application on a freshly migrated database in a temporary directory."""
+    return create_app({
+        'DATABASE': str(tmp_path / 'test.sqlite'),
+        'SECRET_KEY': 'test',
+        'TESTING': True,
+    })
+
+
+@pytest.fixture
+def conn(app):
+    """The request connection of `app`, inside a request context."""
+    with app.test_request_context():
+        yield get_db()
+
+
+@pytest.fixture
+def client(app):
+    """A test client logged in as the default admin (user 1)."""
+    app.config['SNAPSHOT_INTERVAL_HOURS'] = None
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    return client
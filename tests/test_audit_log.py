@@ -0,0 +1,47 @@
+# C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/tests/test_audit_log.py
+
+import io
+import json
+from app.db import get_db
+from app.db_writer import get_writer
+from app.services import database as db_service
+
+
+def _entries(conn):
+    return conn.execute("SELECT COUNT(*) FROM edit_history").fetchone()[0]
+
+
+def _log_three_edits():
+    conn = get_db()
+    for n in range(3):
+        db_service.log_edit(1, 'test_edit', 'glean_metrics', f'a.glean.{n}', "Deferred.")
+    db_service.log_edit(None, 'test_edit', details="Anonymous edits are not logged.")
+    # Still buffered: nothing is inserted before the job ends.
+    return _entries(conn)
+
+
+def test_entries_are_written_when_the_job_ends(conn):
+    before = _entries(conn)
+    assert get_writer().run(_log_three_edits) == before
+    assert _entries(conn) == before + 3
+
+
+def test_bulk_import_is_logged_as_one_entry_with_a_manifest(conn):
+    conn.execute("INSERT INTO glean_metrics (glean_name, metric_type) VALUES ('a.glean.x', 'counter')")
+    conn.commit()
+    csv_text = "tcid,title,metrics,type,region,engine\n1,T,a.glean.x,Glean,US,google\n2,T,a.glean.x,Glean,DE,bing\n"
+    db_service.bulk_import_coverage_from_csv(io.BytesIO(csv_text.encode('utf-8')), 1)
+
+    entries = conn.execute("SELECT record_pk, manifest FROM edit_history WHERE action = 'bulk_add_coverage'").fetchall()
+    assert len(entries) == 1
+    assert entries[0]['record_pk'] == '2 rows'
+    assert [(row['tc_id'], row['region']) for row in json.loads(entries[0]['manifest'])] == [('1', 'US'), ('2', 'DE')]
+    # The manifest is searchable from the activity log.
+    items, _, _ = db_service.get_history(search_term='bing')
+    assert [item['action'] for item in items] == ['bulk_add_coverage']
+
+
+def test_nothing_is_logged_for_an_empty_import(conn):
+    before = _entries(conn)
+    db_service.bulk_import_coverage_from_csv(io.BytesIO(b"tcid,title,metrics,type,region,engine\n"), 1)
+    assert _entries(conn) == before
@@ -0,0 +1,96 @@
+# C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/tests/test_coverage_import.py
+
+import csv
+import io
+import pytest
+from app.services import database as db_service
+
+HEADER = "tcid,title,metrics,type,region,engine\n"
+
+
+def _import(text):
+    report, processed, duplicates, errors, unchanged = db_service.bulk_import_coverage_from_csv(
+        io.BytesIO((HEADER + text).encode('utf-8')), 1)
+    statuses = [row[-1] for row in list(csv.reader(io.StringIO(report)))[1:]]
+    return statuses, (processed, duplicates, errors, unchanged)
+
+
+def _links(conn):
+    return {tuple(row) for row in conn.execute("""
+        SELECT c.tc_id, c.tcid_title, l.metric_name, l.metric_type, l.region, l.engine
+        FROM coverage_to_metric_link l JOIN coverage c ON c.coverage_id = l.coverage_id
+    """)}
+
+
+@pytest.fixture
+def catalogue(conn):
+    conn.executescript("""
+        INSERT INTO glean_metrics (glean_name, metric_type) VALUES ('a.glean.x', 'counter'), ('a.glean.y', 'counter');
+        INSERT INTO legacy_metrics (legacy_name, metric_type) VALUES ('b.telemetry.z', 'scalar');
+        INSERT INTO exceptions (tc_id) VALUES ('900');
+    """)
+    conn.commit()
+    return conn
+
+
+def test_statuses_and_links(catalogue):
+    statuses, counts = _import(
+        'C1,First,"a.glean.x, a.glean.y",Glean,US,google\n'
+        '2,Second,b.telemetry.z,legacy,DE,\n'
+        '1,Ignored title,a.glean.x,Glean,US,google\n'
+        '3,Third,"a.glean.x, a.glean.missing",Glean,FR,bing\n'
+        '4,Fourth,a.glean.missing,Glean,FR,bing\n'
+        '900,Excepted,a.glean.x,Glean,US,google\n'
+        ',No id,a.glean.x,Glean,US,google\n'
+        '5,Bad type,a.glean.x,Other,US,google\n'
+    )
+    assert statuses == [
+        "Success",
+        "Success",
+        "Duplicate",
+        "Success (Skipped invalid: a.glean.missing)",
+        "Error: No valid metrics found. Invalid: a.glean.missing.",
+        "Error: TCID '900' is on the exception list.",
+        "Error: TC ID is missing.",
+        "Error: Unknown metric type 'Other'.",
+    ]
+    assert counts == (4, 1, 4, 0)
+    assert _links(catalogue) == {
+        ('1', 'First', 'a.glean.x', 'Glean', 'US', 'google'),
+        ('1', 'First', 'a.glean.y', 'Glean', 'US', 'google'),
+        ('2', 'Second', 'b.telemetry.z', 'Legacy', 'DE', None),
+        ('3', 'Third', 'a.glean.x', 'Glean', 'FR', 'bing'),
+    }
+
+
+def test_rows_spanning_chunks(catalogue, monkeypatch):
+    monkeypatch.setattr(db_service, '_IMPORT_CHUNK_SIZE', 2)
+    rows = [f"{tc_id},T{tc_id},a.glean.x,Glean,US,google\n" for tc_id in (1, 2, 3, 1, 2, 4, 3)]
+    statuses, counts = _import(''.join(rows))
+
+    assert statuses == ["Success"] * 3 + ["Duplicate"] * 2 + ["Success", "Duplicate"]
+    assert counts == (4, 3, 0, 0)
+    assert {row[0] for row in _links(catalogue)} == {'1', '2', '3', '4'}
+
+
+def test_links_that_exist_are_duplicates(catalogue):
+    _import('1,T,a.glean.x,Glean,US,google\n')
+    catalogue.execute("UPDATE coverage_to_metric_link SET is_deleted = TRUE")
+    catalogue.commit()
+    # A soft-deleted link is not recreated. (The titles differ so the rows are not skipped as already imported.)
+    statuses, counts = _import('1,T2,a.glean.x,Glean,US,google\n1,T2,a.glean.x,Glean,DE,google\n')
+    assert statuses == ["Duplicate", "Success"]
+    assert counts == (1, 1, 0, 0)
+
+
+def test_file_level_error_writes_nothing(catalogue, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("fingerprint write failed")
+    monkeypatch.setattr(db_service, '_record_fingerprints', fail)
+
+    report, *counts = db_service.bulk_import_coverage_from_csv(
+        io.BytesIO((HEADER + '1,T,a.glean.x,Glean,US,google\n').encode('utf-8')), 1)
+    assert list(csv.reader(io.StringIO(report)))[-1] == ["File-level error", "fingerprint write failed", "Error"]
+    assert counts == [0, 0, 1, 0]
+    assert _links(catalogue) == set()
+    assert catalogue.execute("SELECT COUNT(*) FROM coverage").fetchone()[0] == 0
@@ -0,0 +1,103 @@
+# C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/tests/test_coverage_matrix.py
+
+import random
+import pytest
+from app.services import database as db_service
+from app.services.coverage_matrix import CoverageMatrix
+
+REGIONS = ['US', 'DE', 'FR']
+ENGINES = ['google', 'bing']
+METRICS = [(f'a.glean.m{n}', 'Glean' if n % 2 else 'Legacy', f'P{n % 3}') for n in range(12)]
+
+
+@pytest.fixture(scope='module')
+def links():
+    generator = random.Random(7)
+    return {(name, type_, generator.choice(REGIONS), generator.choice(ENGINES))
+            for name, type_, _ in METRICS for _ in range(generator.randint(0, 5))}
+
+
+def _matrix(links):
+    matrix = CoverageMatrix([region.lower() for region in REGIONS], [engine.upper() for engine in ENGINES], METRICS)
+    for name, type_, region, engine in links:
+        assert matrix.add(name, type_.lower(), region, engine)
+    assert not matrix.add(METRICS[0][0], METRICS[0][1], 'JP', 'google')
+    return matrix
+
+
+@pytest.mark.parametrize('metric_type, priority, regions, engines', [
+    (None, None, None, None),
+    ('glean', None, ['de', 'FR'], None),
+    (None, 'p1', None, ['Bing']),
+    ('Legacy', 'P2', ['US'], ['google']),
+])
+def test_bitset_operations_match_a_direct_computation(links, metric_type, priority, regions, engines):
+    matrix = _matrix(links)
+    metric_mask = matrix.metric_mask(metric_type, priority)
+    combos = matrix.combo_mask(regions, engines)
+
+    selected = [metric for metric in METRICS
+                if (not metric_type or metric[1].lower() == metric_type.lower())
+                and (not priority or metric[2] == priority.upper())]
+    wanted = [(region, engine.lower()) for region in REGIONS for engine in ENGINES
+              if (not regions or region in [r.upper() for r in regions])
+              and (not engines or engine in [e.lower() for e in engines])]
+    assert metric_mask.bit_count() == len(selected)
+    assert combos.bit_count() == len(wanted)
+
+    for uncovered in (True, False):
+        expected = {}
+        for name, type_, priority_ in selected:
+            pairs = [pair for pair in wanted if ((name, type_) + pair in links) != uncovered]
+            if pairs:
+                expected[(name, type_, priority_)] = sorted(pairs)
+        actual = {metric: sorted(pairs) for metric, pairs in matrix.metric_slice(metric_mask, combos, uncovered)}
+        assert actual == expected
+
+    heatmap = matrix.heatmap(metric_mask, combos)
+    for region_index, region in enumerate(REGIONS):
+        for engine_index, engine in enumerate(ENGINES):
+            cell = heatmap[region_index][engine_index]
+            if (region, engine) in wanted:
+                assert cell == sum((name, type_, region, engine) in links for name, type_, _ in selected)
+            else:
+                assert cell is None
+
+
+def test_unknown_filter_values_are_rejected(links):
+    with pytest.raises(ValueError, match="region"):
+        _matrix(links).combo_mask(['XX'])
+
+
+@pytest.fixture
+def seeded(conn):
+    conn.executescript("""
+        INSERT INTO glean_metrics (glean_name, metric_type, priority) VALUES
+            ('a.glean.x', 'counter', 'P1'), ('a.glean.y', 'counter', 'P2');
+        INSERT INTO coverage (tc_id) VALUES ('101'), ('102');
+        INSERT INTO coverage_to_metric_link (coverage_id, metric_name, metric_type, region, engine) VALUES
+            (1, 'a.glean.x', 'Glean', 'us', 'Google'),
+            (2, 'a.glean.x', 'Glean', 'DE', 'google'),
+            (1, 'a.glean.y', 'Glean', 'US', NULL);
+        INSERT INTO exceptions (tc_id) VALUES ('102');
+    """)
+    conn.commit()
+    return conn
+
+
+def test_slice_reads_effective_links(seeded):
+    result = db_service.get_coverage_matrix_slice('glean', 'P1', ['US', 'DE'], ['google'], 'covered')
+    assert (result['metric_count'], result['combination_count']) == (1, 2)
+    # The DE link's TCID is excepted, so only US counts.
+    assert result['metrics'] == [{'metric_name': 'a.glean.x', 'metric_type': 'Glean', 'priority': 'P1',
+                                  'combinations': [{'region': 'US', 'engine': 'google'}]}]
+    # A link without an engine covers no combination.
+    uncovered = db_service.get_coverage_matrix_slice('glean', 'P2', ['US'], ['google'])
+    assert [metric['metric_name'] for metric in uncovered['metrics']] == ['a.glean.y']
+
+
+def test_matrix_endpoints(seeded, client):
+    data = client.get('/reports/coverage-matrix?metric_type=glean&region=US&engine=google').get_json()
+    assert data['heatmap'][data['regions'].index('US')][data['engines'].index('google')] == 1
+    assert client.get('/reports/coverage-matrix?status=sometimes').status_code == 400
+    assert client.get('/reports/matrix').status_code == 200
@@ -0,0 +1,109 @@
+# C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/tests/test_coverage_snapshots.py
+
+import pytest
+from flask import g
+from app.services import database as db_service
+
+
+@pytest.fixture
+def seeded(conn):
+    conn.executescript("""
+        INSERT INTO glean_metrics (glean_name, metric_type) VALUES ('a.glean.x', 'counter'), ('a.glean.y', 'counter');
+        INSERT INTO legacy_metrics (legacy_name, metric_type) VALUES ('b.telemetry.z', 'scalar');
+        INSERT INTO coverage (tc_id) VALUES ('101'), ('102');
+        INSERT INTO coverage_to_metric_link (coverage_id, metric_name, metric_type, region, engine) VALUES
+            (1, 'a.glean.x', 'Glean', 'US', 'google');
+    """)
+    conn.commit()
+    return conn
+
+
+CHANGES = [
+    # Nothing changes between the first two snapshots.
+    [],
+    ["INSERT INTO coverage_to_metric_link (coverage_id, metric_name, metric_type, region, engine) VALUES "
+     "(2, 'a.glean.x', 'Glean', 'DE', 'bing'), (1, 'b.telemetry.z', 'Legacy', 'US', NULL)"],
+    ["UPDATE glean_metrics SET is_deleted = TRUE WHERE glean_name = 'a.glean.y'",
+     "INSERT INTO glean_metrics (glean_name, metric_type) VALUES ('a.glean.new', 'event')"],
+    ["UPDATE coverage_to_metric_link SET is_deleted = TRUE WHERE metric_name = 'b.telemetry.z'",
+     "UPDATE glean_metrics SET is_deleted = FALSE WHERE glean_name = 'a.glean.y'"],
+]
+
+
+def _delta_count(conn, snapshot_id):
+    return conn.execute("SELECT COUNT(*) FROM coverage_snapshot_deltas WHERE snapshot_id = ?",
+                        (snapshot_id,)).fetchone()[0]
+
+
+def _reread(conn):
+    # Written outside the writer, so the data version is bumped by hand (and re-read) to drop cached reads.
+    conn.execute("UPDATE data_version SET version = version + 1")
+    conn.commit()
+    g.pop('data_version', None)
+
+
+def test_deltas_rebuild_every_snapshot(seeded):
+    recorded = {}
+    previous = {}
+    for statements in [[]] + CHANGES:
+        for sql in statements:
+            seeded.execute(sql)
+        seeded.commit()
+        state = db_service._current_coverage_state(seeded)
+        snapshot = db_service.take_coverage_snapshot('cli')
+        recorded[snapshot['snapshot_id']] = state
+
+        changed = {key for key in state.keys() | previous.keys() if state.get(key) != previous.get(key)}
+        assert snapshot['changed'] == _delta_count(seeded, snapshot['snapshot_id']) == len(changed)
+        previous = state
+
+    assert _delta_count(seeded, 2) == 0
+    for snapshot_id, state in recorded.items():
+        assert db_service._snapshot_state(seeded, snapshot_id) == state, snapshot_id
+    assert db_service._snapshot_state(seeded) == previous
+
+
+def test_totals_and_trend(seeded):
+    snapshot = db_service.take_coverage_snapshot('manual', user_id=1)
+    assert snapshot['totals'] == {
+        'Glean': {'metric_count': 2, 'covered_count': 1},
+        'Legacy': {'metric_count': 1, 'covered_count': 0},
+    }
+    assert db_service.take_coverage_snapshot('schedule', min_interval_hours=24) is None
+
+    seeded.execute(CHANGES[1][0])
+    seeded.commit()
+    db_service.take_coverage_snapshot('cli')
+    _reread(seeded)
+
+    trend = db_service.get_coverage_trend(30)
+    assert [point['coverage_percent'] for point in trend['series']['Glean']] == [50.0, 50.0]
+    assert [point['coverage_percent'] for point in trend['series']['Legacy']] == [0.0, 100.0]
+    assert list(db_service.get_coverage_trend(30, 'legacy')['series']) == ['Legacy']
+
+
+@pytest.mark.parametrize('kwargs', [{'days': 0}, {'days': '30'}, {'metric_type': 'other'}])
+def test_trend_rejects_invalid_arguments(conn, kwargs):
+    with pytest.raises(ValueError):
+        db_service.get_coverage_trend(**kwargs)
+
+
+def test_unknown_source_is_rejected(conn):
+    with pytest.raises(ValueError):
+        db_service.take_coverage_snapshot('nightly')
+
+
+def test_metric_history_lists_changes_and_removal(seeded):
+    db_service.take_coverage_snapshot('cli')
+    seeded.execute(CHANGES[1][0])
+    seeded.commit()
+    db_service.take_coverage_snapshot('cli')
+    db_service.take_coverage_snapshot('cli')
+    seeded.execute("UPDATE glean_metrics SET is_deleted = TRUE WHERE glean_name = 'a.glean.x'")
+    seeded.commit()
+    db_service.take_coverage_snapshot('cli')
+    _reread(seeded)
+
+    history = db_service.get_metric_coverage_history('a.glean.x', 'glean')
+    assert [(point['snapshot_id'], point['tcid_count'], point['region_count'], point['removed'])
+            for point in history] == [(1, 1, 1, False), (2, 2, 2, False), (4, 0, 0, True)]
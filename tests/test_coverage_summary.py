@@ -0,0 +1,73 @@
+# C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/tests/test_coverage_summary.py
+
+import pytest
+
+
+def _recomputed(conn):
+    """The summary as the v3 backfill computes it from the effective links."""
+    return {tuple(row) for row in conn.execute("""
+        SELECT metric_name, metric_type, COUNT(DISTINCT coverage_id), COUNT(DISTINCT region), COUNT(DISTINCT engine)
+        FROM effective_coverage_links
+        GROUP BY metric_name, metric_type
+    """)}
+
+
+def _maintained(conn):
+    return {tuple(row) for row in conn.execute("""
+        SELECT metric_name, metric_type, tcid_count, region_count, engine_count
+        FROM metric_coverage_summary
+        WHERE tcid_count > 0 OR region_count > 0 OR engine_count > 0
+    """)}
+
+
+@pytest.fixture
+def seeded(conn):
+    conn.executescript("""
+        INSERT INTO glean_metrics (glean_name, metric_type) VALUES ('a.glean.x', 'counter'), ('a.glean.y', 'counter');
+        INSERT INTO coverage (tc_id) VALUES ('1'), ('2'), ('3');
+        INSERT INTO coverage_to_metric_link (coverage_id, metric_name, metric_type, region, engine) VALUES
+            (1, 'a.glean.x', 'Glean', 'US', 'google'),
+            (1, 'a.glean.x', 'Glean', 'DE', 'google'),
+            (2, 'a.glean.x', 'Glean', 'US', 'bing'),
+            (2, 'a.glean.y', 'Glean', 'FR', NULL),
+            (3, 'a.glean.y', 'Glean', 'FR', 'bing');
+        INSERT INTO exceptions (tc_id) VALUES ('3');
+    """)
+    conn.commit()
+    return conn
+
+
+CHANGES = {
+    'add exception': "INSERT INTO exceptions (tc_id) VALUES ('2')",
+    'soft-delete exception': "UPDATE exceptions SET is_deleted = TRUE WHERE tc_id = '3'",
+    'restore exception': "UPDATE exceptions SET is_deleted = FALSE WHERE tc_id = '3'",
+    'delete exception': "DELETE FROM exceptions WHERE tc_id = '3'",
+    'insert': "INSERT INTO coverage_to_metric_link (coverage_id, metric_name, metric_type, region, engine) "
+              "VALUES (3, 'a.glean.x', 'Glean', 'JP', 'yahoo')",
+    'update region': "UPDATE coverage_to_metric_link SET region = 'GB' WHERE link_id = 2",
+    'move to another metric': "UPDATE coverage_to_metric_link SET metric_name = 'a.glean.y' WHERE link_id = 3",
+    'soft-delete link': "UPDATE coverage_to_metric_link SET is_deleted = TRUE WHERE link_id = 1",
+    'restore link': "UPDATE coverage_to_metric_link SET is_deleted = FALSE WHERE link_id = 1",
+    'delete link': "DELETE FROM coverage_to_metric_link WHERE link_id = 5",
+    'soft-delete test case': "UPDATE coverage SET is_deleted = TRUE WHERE coverage_id = 2",
+    'rename test case': "UPDATE coverage SET tc_id = '9' WHERE coverage_id = 1",
+    'delete test case': "DELETE FROM coverage WHERE coverage_id = 3",
+}
+
+
+def test_summary_matches_recomputation_after_seeding(seeded):
+    assert _maintained(seeded) == _recomputed(seeded)
+
+
+@pytest.mark.parametrize('change', CHANGES)
+def test_summary_matches_recomputation_after(seeded, change):
+    seeded.execute(CHANGES[change])
+    seeded.commit()
+    assert _maintained(seeded) == _recomputed(seeded)
+
+
+def test_summary_matches_recomputation_after_every_change_in_turn(seeded):
+    for sql in CHANGES.values():
+        seeded.execute(sql)
+        seeded.commit()
+        assert _maintained(seeded) == _recomputed(seeded), sql
@@ -0,0 +1,96 @@
+# C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/tests/test_db_writer.py
+
+import sqlite3
+import threading
+import pytest
+from app.db import get_db
+from app.db_writer import get_writer
+from app.services.database import log_edit
+
+
+def _add_exception(tc_id):
+    get_db().execute("INSERT INTO exceptions (tc_id) VALUES (?)", (tc_id,))
+    return tc_id
+
+
+def _add_exception_then_fail(tc_id):
+    _add_exception(tc_id)
+    log_edit(1, 'add_exception', 'exceptions', tc_id, "Should be discarded with the job.")
+    raise RuntimeError("job failed")
+
+
+def _add_exception_then_roll_back(tc_id):
+    conn = get_db()
+    _add_exception(tc_id)
+    conn.rollback()
+    conn.commit()
+    return 'rolled back'
+
+
+def _submit_batch(writer, jobs):
+    """Queues `jobs` while the writer is blocked, so they all run in one batch."""
+    started, release = threading.Event(), threading.Event()
+
+    def block():
+        started.set()
+        release.wait(5)
+
+    blocker = writer.submit(block)
+    assert started.wait(5)
+    futures = [writer.submit(fn, *args) for fn, *args in jobs]
+    release.set()
+    blocker.result(5)
+    return futures
+
+
+def _exceptions(conn):
+    return {row[0] for row in conn.execute("SELECT tc_id FROM exceptions")}
+
+
+def test_failed_job_rolls_back_only_its_own_savepoint(app, conn):
+    writer = get_writer()
+    before = conn.execute("SELECT COUNT(*) FROM edit_history").fetchone()[0]
+    first, failing, last = _submit_batch(writer, [
+        (_add_exception, 'T1'), (_add_exception_then_fail, 'T2'), (_add_exception, 'T3'),
+    ])
+
+    assert first.result(5) == 'T1' and last.result(5) == 'T3'
+    with pytest.raises(RuntimeError, match="job failed"):
+        failing.result(5)
+    assert _exceptions(conn) == {'T1', 'T3'}
+    # The failed job's deferred audit entry went with it.
+    assert conn.execute("SELECT COUNT(*) FROM edit_history").fetchone()[0] == before
+
+
+def test_rollback_inside_a_job_is_scoped_to_the_job(app, conn):
+    writer = get_writer()
+    first, rolled_back = _submit_batch(writer, [(_add_exception, 'T1'), (_add_exception_then_roll_back, 'T2')])
+
+    assert first.result(5) == 'T1' and rolled_back.result(5) == 'rolled back'
+    assert _exceptions(conn) == {'T1'}
+
+
+def test_batch_with_changes_bumps_the_data_version(app, conn):
+    version = conn.execute("SELECT version FROM data_version").fetchone()[0]
+    get_writer().run(_add_exception, 'T1')
+    assert conn.execute("SELECT version FROM data_version").fetchone()[0] == version + 1
+
+    get_writer().run(lambda: None)
+    assert conn.execute("SELECT version FROM data_version").fetchone()[0] == version + 1
+
+
+def _add_exception_then_release_the_savepoint(tc_id):
+    conn = get_db()
+    _add_exception(tc_id)
+    # Leaves nothing for the writer's own RELEASE, which then raises.
+    conn.execute(f"RELEASE {conn.job_savepoint}")
+    return tc_id
+
+
+def test_writer_recovers_when_a_batch_fails_outside_its_jobs(app, conn):
+    writer = get_writer()
+    with pytest.raises(sqlite3.OperationalError, match="no such savepoint"):
+        writer.run(_add_exception_then_release_the_savepoint, 'T1')
+
+    assert writer.run(_add_exception, 'T2') == 'T2'
+    assert _exceptions(conn) == {'T2'}
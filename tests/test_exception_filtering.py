@@ -0,0 +1,56 @@
+# C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/tests/test_exception_filtering.py
+
+import pytest
+from flask import g
+from app.services import database as db_service
+
+
+@pytest.fixture
+def seeded(conn):
+    conn.executescript("""
+        INSERT INTO glean_metrics (glean_name, metric_type) VALUES ('a.glean.x', 'counter'), ('a.glean.y', 'counter');
+        INSERT INTO coverage (tc_id) VALUES ('101'), ('900');
+        INSERT INTO coverage_to_metric_link (coverage_id, metric_name, metric_type, region, engine) VALUES
+            (1, 'a.glean.x', 'Glean', 'US', 'google'),
+            (2, 'a.glean.x', 'Glean', 'DE', 'bing'),
+            (2, 'a.glean.y', 'Glean', 'DE', 'bing');
+        INSERT INTO exceptions (tc_id) VALUES ('900'), ('555');
+        UPDATE exceptions SET is_deleted = TRUE WHERE tc_id = '555';
+    """)
+    conn.commit()
+    return conn
+
+
+def _reread(conn):
+    # Written outside the writer, so the data version is bumped by hand (and re-read) to drop cached reads.
+    conn.execute("UPDATE data_version SET version = version + 1")
+    conn.commit()
+    g.pop('data_version', None)
+
+
+def _covering_tcids(metric_name):
+    details = db_service.get_metric_status_details('glean', metric_name)
+    return [row['tc_id'] for row in details['existing_coverage']]
+
+
+def test_excepted_tcids_are_hidden_from_reads(seeded):
+    assert _covering_tcids('a.glean.x') == ['101']
+    assert _covering_tcids('a.glean.y') == []
+    report, _ = db_service.get_report_data()
+    assert {row['name']: row['covered'] for row in report} == {'a.glean.x': True, 'a.glean.y': False}
+    assert db_service.get_general_stats()['glean_covered_tcs'] == 1
+
+    seeded.execute("UPDATE exceptions SET is_deleted = TRUE WHERE tc_id = '900'")
+    _reread(seeded)
+    assert _covering_tcids('a.glean.x') == ['101', '900']
+    assert db_service.get_general_stats()['glean_covered_tcs'] == 2
+
+
+def test_coverage_cannot_be_added_for_an_excepted_tcid(seeded):
+    form = {'tc_id': 'C900', 'metric_type': 'glean', 'metrics': 'a.glean.y', 'region': 'US', 'engine': 'google'}
+    success, message = db_service.add_coverage_entry(form, 1)
+    assert not success and "exception list" in message
+
+    # A deleted exception no longer blocks the TCID.
+    success, _ = db_service.add_coverage_entry(dict(form, tc_id='C555'), 1)
+    assert success
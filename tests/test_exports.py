@@ -0,0 +1,79 @@
+# C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/tests/test_exports.py
+
+import csv
+import gzip
+import io
+import json
+import pytest
+from app.services import database as db_service
+
+
+def _rows(response):
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+
+
+@pytest.fixture
+def seeded(conn):
+    conn.executescript("""
+        INSERT INTO glean_metrics (glean_name, metric_type) VALUES ('a.glean.x', 'counter');
+        INSERT INTO legacy_metrics (legacy_name, metric_type, is_deleted) VALUES ('b.telemetry.z', 'scalar', TRUE);
+        INSERT INTO coverage (tc_id, tcid_title, created_at, updated_at) VALUES
+            ('101', 'First', '2020-01-01 00:00:00', '2020-01-01 00:00:00'),
+            ('102', 'Second', '2020-01-01 00:00:00', '2020-01-01 00:00:00');
+        INSERT INTO coverage_to_metric_link (coverage_id, metric_name, metric_type, region, engine, is_deleted) VALUES
+            (1, 'a.glean.x', 'Glean', 'US', 'google', FALSE),
+            (2, 'a.glean.x', 'Glean', 'DE', 'bing', FALSE),
+            (2, 'b.telemetry.z', 'Legacy', 'US', NULL, TRUE);
+        INSERT INTO exceptions (tc_id, title) VALUES ('102', 'Flaky');
+    """)
+    conn.commit()
+    return conn
+
+
+def test_filters_and_deleted_rows(seeded, client):
+    rows = _rows(client.get('/export/coverage'))
+    assert [(row['tc_id'], row['region'], row['is_excepted']) for row in rows] == [('101', 'US', '0'), ('102', 'DE', '1')]
+    assert [row['tc_id'] for row in _rows(client.get('/export/coverage?region=us&engine=Google'))] == ['101']
+    assert len(_rows(client.get('/export/coverage?include_deleted=1'))) == 3
+    assert [row['metric_name'] for row in _rows(client.get('/export/metrics?metric_type=legacy'))] == []
+    assert [row['metric_name'] for row in _rows(client.get('/export/metrics?metric_type=legacy&include_deleted=1'))] == \
+        ['b.telemetry.z']
+
+
+def test_ndjson_and_gzip_carry_the_same_rows(seeded, client):
+    ndjson = client.get('/export/coverage?format=ndjson').get_data(as_text=True)
+    assert [json.loads(line)['tc_id'] for line in ndjson.splitlines()] == ['101', '102']
+    compressed = client.get('/export/coverage?gzip=1').get_data()
+    assert gzip.decompress(compressed).decode('utf-8') == client.get('/export/coverage').get_data(as_text=True)
+
+
+@pytest.mark.parametrize('query', [
+    '/export/exceptions?region=US',
+    '/export/planning?updated_since=2024-01-01',
+    '/export/coverage?updated_since=yesterday',
+    '/export/coverage?format=xml',
+    '/export/nothing',
+])
+def test_unsupported_filters_are_rejected(seeded, client, query):
+    response = client.get(query)
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_delta_sync_sees_removed_exceptions(seeded, client):
+    seeded.execute("UPDATE exceptions SET created_at = '2020-01-01 00:00:00', updated_at = '2020-01-01 00:00:00'")
+    seeded.execute("UPDATE coverage_to_metric_link SET updated_at = '2020-01-01 00:00:00'")
+    seeded.commit()
+    assert _rows(client.get('/export/exceptions?updated_since=2024-01-01&include_deleted=1')) == []
+    assert _rows(client.get('/export/coverage?updated_since=2024-01-01')) == []
+
+    exception_id = seeded.execute("SELECT exception_id FROM exceptions WHERE tc_id = '102'").fetchone()[0]
+    assert db_service.soft_delete_item('exceptions', exception_id, 1)
+
+    rows = _rows(client.get('/export/exceptions?updated_since=2024-01-01&include_deleted=1'))
+    assert [(row['tc_id'], row['is_deleted']) for row in rows] == [('102', '1')]
+    assert _rows(client.get('/export/exceptions?updated_since=2024-01-01')) == []
+    # Removing the exception un-excludes the TCID's links, so they count as changed too.
+    rows = _rows(client.get('/export/coverage?updated_since=2024-01-01'))
+    assert [(row['tc_id'], row['is_excepted']) for row in rows] == [('102', '0')]
@@ -0,0 +1,46 @@
+# C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/tests/test_extraction_matcher.py
+
+import io
+import pytest
+from app.services import extraction
+from app.services import database as db_service
+
+ENGINES = ('google', 'yahoo', 'yahoo japan')
+REGIONS = ('US', 'DE')
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("Search in US with Google, then DE with BING", (set(), {'US', 'DE'}, {'Google'})),
+    ("Check search.glean.impression and browser.telemetry.counts", (
+        {'search.glean.impression', 'browser.telemetry.counts'}, set(), set())),
+    # Whole words only: no region in "USB" or "DEV", no engine in "googles".
+    ("USB DEV googles", (set(), set(), set())),
+    # Regions are case-sensitive, engines are not.
+    ("us de GOOGLE", (set(), set(), {'GOOGLE'})),
+    # The longest engine name wins.
+    ("Yahoo Japan results", (set(), set(), {'Yahoo Japan'})),
+    # A probe consumes its text, so codes inside it are not reported.
+    ("google.glean.US_click", ({'google.glean.US_click'}, set(), set())),
+    # Names with empty segments are not probes.
+    ("a..b.glean.c and .x.glean.y", (set(), set(), set())),
+])
+def test_scan(text, expected):
+    assert extraction.get_matcher(ENGINES, REGIONS).scan(text) == expected
+
+
+def test_first_region_and_engine():
+    matcher = extraction.get_matcher(ENGINES, REGIONS)
+    assert matcher.first_region_and_engine("DE yahoo, then US google") == ('DE', 'yahoo')
+    assert matcher.first_region_and_engine("nothing here") == (None, None)
+
+
+def test_matchers_are_cached_per_engine_and_region_list():
+    assert extraction.get_matcher(ENGINES, REGIONS) is extraction.get_matcher(ENGINES, REGIONS)
+    assert extraction.get_matcher(ENGINES, REGIONS + ('FR',)) is not extraction.get_matcher(ENGINES, REGIONS)
+
+
+def test_managed_regions_reach_the_extraction(conn):
+    assert db_service.add_supported_region('BR', 1)
+    output = ''.join(db_service.extract_probes_from_csv(
+        io.BytesIO(b"ID,Title\n1,Search in BR with Qwant\n")))
+    assert output.splitlines()[1].startswith('1,Search in BR with Qwant,N/A,BR,Qwant')
@@ -0,0 +1,34 @@
+# C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/tests/test_extraction_pool.py
+
+import csv
+import io
+from app.services import database as db_service
+
+
+def _export():
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['ID', 'Title', 'Steps'])
+    for n in range(4500):
+        writer.writerow([str(n), f"Search in {'US' if n % 2 else 'DE'} with Bing", f'Open\nsearch.glean.m{n % 7}'])
+    return buffer.getvalue().encode('utf-8')
+
+
+def _extract(app, workers, content):
+    app.config['EXTRACTION_WORKERS'] = workers
+    progress = []
+    output = ''.join(db_service.extract_probes_from_csv(io.BytesIO(content), progress=lambda *args: progress.append(args)))
+    return output, progress
+
+
+def test_pool_output_matches_serial_output(app, conn):
+    conn.execute("INSERT INTO glean_metrics (glean_name, metric_type) VALUES ('search.glean.m3', 'counter')")
+    conn.commit()
+    content = _export()
+
+    serial, serial_progress = _extract(app, 1, content)
+    pooled, pooled_progress = _extract(app, 2, content)
+    assert pooled == serial
+    assert pooled_progress == serial_progress
+    # Workers got the metric index through the pool initializer.
+    assert 'search.glean.m3 (Glean)' in pooled
@@ -0,0 +1,50 @@
+# C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/tests/test_extraction_streaming.py
+
+import csv
+import io
+import pytest
+from app.services import database as db_service
+
+ROWS = 2500  # Three chunks of output after the header
+
+
+@pytest.fixture
+def app(app):
+    app.config['EXTRACTION_WORKERS'] = 1
+    return app
+
+
+def _export(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['ID', 'Title', 'Steps'])
+    writer.writerows(rows)
+    return io.BytesIO(buffer.getvalue().encode('utf-8'))
+
+
+def test_output_is_streamed_in_row_aligned_chunks(conn):
+    rows = [[str(n), f'Search in US with Google {n}', f'Check\nsearch.glean.m{n}\n"quoted"'] for n in range(ROWS)]
+    progress = []
+    chunks = list(db_service.extract_probes_from_csv(_export(rows), progress=lambda *args: progress.append(args)))
+
+    assert len(chunks) == 4
+    parsed = [list(csv.reader(io.StringIO(chunk))) for chunk in chunks]
+    assert parsed[0] == [['ID', 'Title', 'Steps', 'Found Probes', 'Found Region', 'Found Engine',
+                          'Known Probes', 'Unknown Probes']]
+    assert [len(chunk) for chunk in parsed[1:]] == [1000, 1000, 500]
+    # Fields spanning lines stay within their row.
+    output_rows = [row for chunk in parsed[1:] for row in chunk]
+    assert [row[:3] for row in output_rows] == rows
+    assert output_rows[7][3:6] == ['search.glean.m7', 'US', 'Google']
+    assert progress == [(1000, None), (2000, None), (2500, None), (2500, 2500)]
+
+
+def test_rotation_extraction_streams_too(conn):
+    chunks = db_service.extract_from_rotation_csv(_export([['C1', 'DE with Bing', 'Glean, a.glean.x']]))
+    assert next(chunks).startswith('ID,Title,Steps,Found Region')
+    assert list(csv.reader(io.StringIO(''.join(chunks))))[0][3:7] == ['DE', 'bing', 'Glean', 'a.glean.x']
+
+
+def test_unreadable_file_raises(conn):
+    with pytest.raises(ValueError, match="malformed"):
+        list(db_service.extract_probes_from_csv(io.BytesIO(b'\xff\xfe\x00not utf-8')))
@@ -0,0 +1,83 @@
+# C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/tests/test_full_text_search.py
+
+import pytest
+from flask import g
+from app.services import database as db_service
+
+
+def _recomputed(conn):
+    """The indexed documents as the v6 backfill builds them."""
+    return {tuple(row) for row in conn.execute("""
+        SELECT 'glean', glean_name, glean_name, description, notes FROM glean_metrics WHERE is_deleted = FALSE
+        UNION ALL
+        SELECT 'legacy', legacy_name, legacy_name, description, notes FROM legacy_metrics WHERE is_deleted = FALSE
+        UNION ALL
+        SELECT 'tcid', tc_id, tc_id, tcid_title, NULL FROM coverage WHERE is_deleted = FALSE
+    """)}
+
+
+def _maintained(conn):
+    # Every document is exactly one row of search_index_docs and one row of search_index.
+    assert conn.execute("SELECT COUNT(*) FROM search_index").fetchone()[0] == \
+        conn.execute("SELECT COUNT(*) FROM search_index_docs").fetchone()[0]
+    # Fails if the full-text index no longer matches the stored text.
+    conn.execute("INSERT INTO search_index (search_index) VALUES ('integrity-check')")
+    return {tuple(row) for row in conn.execute("""
+        SELECT d.kind, d.ref, s.name, s.body, s.notes
+        FROM search_index_docs d JOIN search_index s ON s.rowid = d.doc_id
+    """)}
+
+
+def _search(conn, text, search_type='all'):
+    # Written outside the writer, so the data version is bumped by hand (and re-read) to drop cached results.
+    conn.execute("UPDATE data_version SET version = version + 1")
+    conn.commit()
+    g.pop('data_version', None)
+    return {(result['kind'], result['name']) for result in db_service.search_full_text(text, search_type)['results']}
+
+
+@pytest.fixture
+def seeded(conn):
+    conn.executescript("""
+        INSERT INTO glean_metrics (glean_name, metric_type, description, notes) VALUES
+            ('search.glean.impression', 'event', 'Recorded when the results page is shown', 'Check the partner code'),
+            ('search.glean.click', 'event', 'Recorded on a result click', NULL);
+        INSERT INTO legacy_metrics (legacy_name, metric_type, description) VALUES
+            ('browser.telemetry.counts', 'keyed', 'Searches per engine');
+        INSERT INTO coverage (tc_id, tcid_title) VALUES ('101', 'Verify the results page in Germany');
+    """)
+    conn.commit()
+    return conn
+
+
+CHANGES = [
+    "UPDATE glean_metrics SET description = 'Recorded when the SERP is displayed' WHERE glean_name = 'search.glean.impression'",
+    "UPDATE glean_metrics SET notes = 'Needs a Nightly build' WHERE glean_name = 'search.glean.click'",
+    "UPDATE glean_metrics SET glean_name = 'search.glean.ad_click' WHERE glean_name = 'search.glean.click'",
+    "UPDATE glean_metrics SET is_deleted = TRUE WHERE glean_name = 'search.glean.impression'",
+    "UPDATE glean_metrics SET is_deleted = FALSE WHERE glean_name = 'search.glean.impression'",
+    "DELETE FROM legacy_metrics WHERE legacy_name = 'browser.telemetry.counts'",
+    "INSERT INTO coverage (tc_id, tcid_title) VALUES ('102', 'Private browsing results')",
+    "UPDATE coverage SET tcid_title = 'Verify the results page in France' WHERE tc_id = '101'",
+    "UPDATE coverage SET tc_id = '103' WHERE tc_id = '102'",
+    "UPDATE coverage SET is_deleted = TRUE WHERE tc_id = '101'",
+    "DELETE FROM coverage WHERE tc_id = '103'",
+]
+
+
+def test_index_matches_recomputation_after_each_change(seeded):
+    assert _maintained(seeded) == _recomputed(seeded)
+    for sql in CHANGES:
+        seeded.execute(sql)
+        seeded.commit()
+        assert _maintained(seeded) == _recomputed(seeded), sql
+
+
+def test_search_follows_edits(seeded):
+    assert _search(seeded, 'results page') == {('glean', 'search.glean.impression'), ('tcid', '101')}
+    assert _search(seeded, 'results page', 'metric') == {('glean', 'search.glean.impression')}
+
+    seeded.execute("UPDATE coverage SET tcid_title = 'Verify the SERP in France' WHERE tc_id = '101'")
+    seeded.execute("UPDATE glean_metrics SET is_deleted = TRUE WHERE glean_name = 'search.glean.impression'")
+    assert _search(seeded, 'results page') == set()
+    assert _search(seeded, 'serp') == {('tcid', '101')}
@@ -0,0 +1,69 @@
+# C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/tests/test_gap_planning.py
+
+import pytest
+from app.services import database as db_service
+
+POLICIES = [
+    {'metric_type': 'Glean', 'priority': 'P1', 'regions': ['US', 'DE'], 'engines': ['google', 'bing']},
+    # Overlaps the first policy for a.glean.x in US; the gap is reported once.
+    {'metric_type': 'glean', 'regions': ['US'], 'engines': ['bing']},
+]
+
+
+def _planned(conn):
+    return {tuple(row) for row in conn.execute("SELECT metric_name, metric_type, region, engine FROM planning")}
+
+
+@pytest.fixture
+def seeded(conn):
+    conn.executescript("""
+        INSERT INTO glean_metrics (glean_name, metric_type, priority) VALUES
+            ('a.glean.x', 'counter', 'P1'), ('a.glean.y', 'counter', 'P2');
+        INSERT INTO legacy_metrics (legacy_name, metric_type, priority) VALUES ('b.telemetry.z', 'scalar', 'P1');
+        INSERT INTO coverage (tc_id) VALUES ('101'), ('102');
+        INSERT INTO coverage_to_metric_link (coverage_id, metric_name, metric_type, region, engine) VALUES
+            (1, 'a.glean.x', 'Glean', 'US', 'google'),
+            (1, 'a.glean.x', 'Glean', 'DE', 'bing'),
+            (2, 'a.glean.y', 'Glean', 'US', 'bing');
+        INSERT INTO exceptions (tc_id) VALUES ('102');
+        -- Planned by hand already, with different case.
+        INSERT INTO planning (metric_name, metric_type, region, engine) VALUES ('a.glean.x', 'Glean', 'us', 'BING');
+    """)
+    conn.commit()
+    return conn
+
+
+def test_gaps_follow_the_policies(seeded):
+    assert sorted(db_service.find_coverage_gaps(POLICIES)) == [
+        ('a.glean.x', 'Glean', 'DE', 'google'),
+        ('a.glean.x', 'Glean', 'US', 'bing'),
+        # a.glean.y's only link is on an excepted TCID, so it does not count.
+        ('a.glean.y', 'Glean', 'US', 'bing'),
+    ]
+
+
+def test_only_unplanned_gaps_are_added_and_a_rerun_adds_nothing(seeded):
+    before = _planned(seeded)
+    assert db_service.plan_coverage_gaps(POLICIES, 1) == {'gaps': 3, 'added': 2, 'already_planned': 1}
+    assert _planned(seeded) - before == {
+        ('a.glean.x', 'Glean', 'DE', 'google'),
+        ('a.glean.y', 'Glean', 'US', 'bing'),
+    }
+    entry = seeded.execute("SELECT manifest FROM edit_history WHERE action = 'plan_coverage_gaps'").fetchone()
+    assert entry is not None and 'a.glean.y' in entry['manifest']
+
+    assert db_service.plan_coverage_gaps(POLICIES, 1) == {'gaps': 3, 'added': 0, 'already_planned': 3}
+    assert seeded.execute("SELECT COUNT(*) FROM planning").fetchone()[0] == 3
+    assert seeded.execute("SELECT COUNT(*) FROM edit_history WHERE action = 'plan_coverage_gaps'").fetchone()[0] == 1
+
+
+def test_unknown_region_is_rejected(seeded):
+    with pytest.raises(ValueError):
+        db_service.find_coverage_gaps([{'regions': ['XX']}])
+
+
+def test_plan_gaps_route(seeded, client, app):
+    app.config['COVERAGE_POLICIES'] = POLICIES
+    response = client.post('/planning/plan-gaps')
+    assert response.status_code == 302
+    assert len(_planned(seeded)) == 3
@@ -0,0 +1,44 @@
+# C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/tests/test_history_search.py
+
+import pytest
+from app.services import database as db_service
+
+
+def _matches(search_term):
+    items, _, _ = db_service.get_history(search_term=search_term)
+    return {item['record_pk'] for item in items}
+
+
+@pytest.fixture
+def seeded(conn):
+    conn.executescript("""
+        INSERT INTO edit_history (user_id, action, table_name, record_pk, details, manifest) VALUES
+            (1, 'add_coverage', 'coverage', 'C101', 'Linked search.glean.impression', NULL),
+            (1, 'set_priority', 'glean_metrics', 'search.glean.click', 'Set priority to P1', NULL),
+            (1, 'bulk_add_coverage', 'coverage_to_metric_link', '2 rows', 'Imported 2 coverage links from CSV.',
+             '[{"tc_id": "C202", "metric": "browser.telemetry.partner"}]');
+    """)
+    conn.commit()
+    return conn
+
+
+def _check_index(conn):
+    # Compares the external-content index with edit_history; raises if they differ.
+    conn.execute("INSERT INTO edit_history_fts (edit_history_fts) VALUES ('integrity-check')")
+
+
+def test_search_covers_details_records_and_manifests(seeded):
+    _check_index(seeded)
+    assert _matches('impression') == {'C101'}
+    assert _matches('search.glean.click') == {'search.glean.click'}
+    assert _matches('partner') == {'2 rows'}
+
+
+def test_index_follows_updates_and_deletes(seeded):
+    seeded.execute("UPDATE edit_history SET details = 'Set priority to P2' WHERE record_pk = 'search.glean.click'")
+    seeded.execute("DELETE FROM edit_history WHERE record_pk = 'C101'")
+    seeded.commit()
+    _check_index(seeded)
+    assert _matches('P2') == {'search.glean.click'}
+    assert _matches('P1') == set()
+    assert _matches('impression') == set()
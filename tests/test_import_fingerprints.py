@@ -0,0 +1,94 @@
+# C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/tests/test_import_fingerprints.py
+
+import csv
+import io
+import pytest
+from app.services import database as db_service
+
+ROW_UNCHANGED = "Unchanged: this row was already imported."
+
+
+def _statuses(report):
+    return [row[-1] for row in list(csv.reader(io.StringIO(report)))[1:]]
+
+
+def _import_coverage(text):
+    report, *counts = db_service.bulk_import_coverage_from_csv(
+        io.BytesIO(("tcid,title,metrics,type,region,engine\n" + text).encode('utf-8')), 1)
+    return _statuses(report), tuple(counts)
+
+
+def _import_metrics(text):
+    report, *counts = db_service.bulk_import_metrics_from_csv(
+        'glean', io.BytesIO(("name,type,description,expiration\n" + text).encode('utf-8')), 1)
+    return _statuses(report), tuple(counts)
+
+
+def _files_recorded(conn, kind):
+    return conn.execute("SELECT COUNT(*) FROM import_file_fingerprints WHERE kind = ?", (kind,)).fetchone()[0]
+
+
+@pytest.fixture
+def catalogue(conn):
+    conn.execute("INSERT INTO glean_metrics (glean_name, metric_type) VALUES ('a.glean.x', 'counter')")
+    conn.commit()
+    return conn
+
+
+def test_identical_file_is_not_processed_again(catalogue):
+    text = '1,T,a.glean.x,Glean,US,google\n2,T,a.glean.x,Glean,US,bing\n'
+    assert _import_coverage(text) == (["Success", "Success"], (2, 0, 0, 0))
+    assert _files_recorded(catalogue, 'coverage') == 1
+
+    statuses, counts = _import_coverage(text)
+    assert all(status.startswith("Unchanged: this file was already imported on ") for status in statuses)
+    assert counts == (0, 0, 0, 2)
+
+
+def test_reimport_skips_applied_rows_and_retries_failed_ones(catalogue):
+    text = '1,T,a.glean.x,Glean,US,google\n2,T,a.glean.missing,Glean,US,google\n'
+    assert _import_coverage(text)[0] == ["Success", "Error: No valid metrics found. Invalid: a.glean.missing."]
+    assert _files_recorded(catalogue, 'coverage') == 0
+
+    catalogue.execute("INSERT INTO glean_metrics (glean_name, metric_type) VALUES ('a.glean.missing', 'counter')")
+    catalogue.commit()
+    assert _import_coverage(text) == ([ROW_UNCHANGED, "Success"], (1, 0, 0, 1))
+    assert _files_recorded(catalogue, 'coverage') == 1
+
+
+def test_rows_with_skipped_metrics_are_retried(catalogue):
+    text = '1,T,"a.glean.x, a.glean.later",Glean,US,google\n'
+    assert _import_coverage(text)[0] == ["Success (Skipped invalid: a.glean.later)"]
+    assert _import_coverage(text)[0] == ["Duplicate (Skipped invalid: a.glean.later)"]
+    assert _files_recorded(catalogue, 'coverage') == 0
+
+    catalogue.execute("INSERT INTO glean_metrics (glean_name, metric_type) VALUES ('a.glean.later', 'counter')")
+    catalogue.commit()
+    assert _import_coverage(text)[0] == ["Success"]
+    assert {row[0] for row in catalogue.execute("SELECT metric_name FROM coverage_to_metric_link")} == \
+        {'a.glean.x', 'a.glean.later'}
+    assert _import_coverage(text)[0][0].startswith("Unchanged: this file was already imported on ")
+
+
+def test_metric_rows_with_invalid_names_are_retried(catalogue):
+    text = 'a.glean.new,counter,,\n"a.glean.other, bogus",counter,,\nbogus,counter,,\n'
+    assert _import_metrics(text) == ([
+        "Success",
+        "Success (Skipped invalid: bogus)",
+        "Error: No valid metric names found in 'bogus'.",
+    ], (2, 0, 1, 0))
+
+    assert _import_metrics(text) == ([
+        ROW_UNCHANGED,
+        "Duplicate (Skipped invalid: bogus)",
+        "Error: No valid metric names found in 'bogus'.",
+    ], (0, 1, 1, 1))
+    assert _files_recorded(catalogue, 'glean') == 0
+
+
+def test_fingerprints_are_kept_per_kind(catalogue):
+    _import_metrics('a.glean.new,counter,,\n')
+    # The same row imported as a legacy metric is not treated as already imported.
+    report, inserted, *_ = db_service.bulk_import_metrics_from_csv(
+        'legacy', io.BytesIO(b"name,type,description,expiration\na.glean.new,counter,,\n"), 1)
+    assert (_statuses(report), inserted) == (["Success"], 1)
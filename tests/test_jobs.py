@@ -0,0 +1,68 @@
+# C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/tests/test_jobs.py
+
+import io
+import os
+import subprocess
+import sys
+import time
+import pytest
+from app.db import connect
+
+
+@pytest.fixture
+def app(app):
+    app.config.update(JOB_POLL_INTERVAL=0.05, JOB_MAX_ATTEMPTS=2)
+    return app
+
+
+def _upload(client, url, content):
+    response = client.post(url, data={'file': (io.BytesIO(content), 'upload.csv')},
+                           headers={'Accept': 'application/json'})
+    assert response.status_code == 202
+    return response.get_json()
+
+
+def _wait(client, status_url):
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        job = client.get(status_url).get_json()
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.05)
+    pytest.fail("The job did not finish.")
+
+
+def test_import_runs_in_the_background(conn, client):
+    conn.execute("INSERT INTO glean_metrics (glean_name, metric_type) VALUES ('a.glean.x', 'counter')")
+    conn.commit()
+    queued = _upload(client, '/manage/bulk-import/coverage',
+                     b"tcid,title,metrics,type,region,engine\n1,T,a.glean.x,Glean,US,google\n")
+
+    job = _wait(client, queued['status_url'])
+    assert job['status'] == 'done', job['error']
+    assert (job['result']['added'], job['rows_done'], job['rows_total']) == (1, 1, 1)
+    report = client.get(job['report_url']).get_data(as_text=True)
+    assert report.splitlines()[-1].endswith(',Success')
+    assert conn.execute("SELECT COUNT(*) FROM coverage_to_metric_link").fetchone()[0] == 1
+
+
+def test_a_failing_job_is_marked_failed(client):
+    queued = _upload(client, '/manage/extract-probes', b"\xff\xfe\x00broken")
+    job = _wait(client, queued['status_url'])
+    assert job['status'] == 'failed' and job['error']
+    assert job['report_url'] is None
+
+
+def test_jobs_of_a_dead_process_are_requeued_then_failed(app):
+    exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+    exited.wait()
+    conn = connect(app.config['JOBS_DATABASE'], app.config)
+    conn.executemany(
+        "INSERT INTO jobs (job_id, kind, status, owner_pid, attempts) VALUES (?, 'import_coverage', 'running', ?, ?)",
+        [('retry', exited.pid, 1), ('give-up', exited.pid, 2), ('alive', os.getpid(), 1)])
+    conn.commit()
+
+    app.extensions['job_runner']._requeue_orphans(conn)
+    statuses = dict(conn.execute("SELECT job_id, status FROM jobs").fetchall())
+    assert statuses == {'retry': 'queued', 'give-up': 'failed', 'alive': 'running'}
+    conn.close()
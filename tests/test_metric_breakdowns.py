@@ -0,0 +1,59 @@
+# C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/tests/test_metric_breakdowns.py
+
+import pytest
+from app.services import database as db_service
+
+
+@pytest.fixture
+def seeded(conn):
+    conn.executescript("""
+        INSERT INTO glean_metrics (glean_name, metric_type) VALUES ('a.glean.x', 'counter'), ('a.glean.y', 'counter');
+        INSERT INTO legacy_metrics (legacy_name, metric_type) VALUES ('a.glean.x', 'scalar');
+        INSERT INTO coverage (tc_id, tcid_title) VALUES ('101', 'First'), ('900', 'Excepted');
+        INSERT INTO coverage_to_metric_link (coverage_id, metric_name, metric_type, region, engine) VALUES
+            (1, 'a.glean.x', 'Glean', 'US', 'google'),
+            (2, 'a.glean.x', 'Glean', 'DE', 'bing'),
+            (1, 'a.glean.x', 'Legacy', 'FR', NULL);
+        INSERT INTO exceptions (tc_id) VALUES ('900');
+        INSERT INTO planning (metric_name, metric_type, region, engine) VALUES
+            ('a.glean.y', 'Glean', 'US', 'bing'), ('a.glean.y', 'Glean', 'JP', 'google');
+        UPDATE planning SET is_deleted = TRUE WHERE region = 'JP';
+    """)
+    conn.commit()
+    return conn
+
+
+def _summary(breakdown):
+    return (breakdown['metric_name'], breakdown['metric_type'],
+            [(row['tc_id'], row['region'], row['engine']) for row in breakdown['existing']],
+            [(row['region'], row['engine']) for row in breakdown['planned']])
+
+
+@pytest.mark.parametrize('chunk_size', [1, 250])
+def test_breakdowns_in_the_requested_order(seeded, monkeypatch, chunk_size):
+    monkeypatch.setattr(db_service, '_BREAKDOWN_CHUNK_SIZE', chunk_size)
+    metrics = [('a.glean.y', 'Glean'), ('a.glean.x', 'Legacy'), ('a.glean.x', 'Glean'), ('a.glean.y', 'Glean')]
+    assert [_summary(breakdown) for breakdown in db_service.get_metric_breakdowns(metrics)] == [
+        ('a.glean.y', 'Glean', [], [('US', 'bing')]),
+        ('a.glean.x', 'Legacy', [('101', 'FR', None)], []),
+        ('a.glean.x', 'Glean', [('101', 'US', 'google')], []),
+    ]
+
+
+def test_planned_counts_on_the_planning_page(seeded):
+    counts = {(row['metric_name'], row['metric_type']): row['planned_count']
+              for row in db_service.get_planning_page_data()['planning_data']}
+    assert counts == {('a.glean.x', 'Glean'): 0, ('a.glean.y', 'Glean'): 1, ('a.glean.x', 'Legacy'): 0}
+
+
+def test_breakdown_endpoints(seeded, client, app):
+    single = client.get('/metric-details/Glean/a.glean.x').get_json()
+    assert _summary(single) == ('a.glean.x', 'Glean', [('101', 'US', 'google')], [])
+
+    batch = client.post('/metric-details', json={'metrics': [{'metric_name': 'a.glean.y', 'metric_type': 'Glean'}]})
+    assert [_summary(item) for item in batch.get_json()['metrics']] == [('a.glean.y', 'Glean', [], [('US', 'bing')])]
+
+    app.config['METRIC_DETAILS_MAX_BATCH'] = 1
+    for body in ({'metrics': 'a.glean.x'}, {'metrics': [{'metric_name': 'a.glean.x'}]},
+                 {'metrics': [{'metric_name': 'a', 'metric_type': 'Glean'}] * 2}):
+        assert client.post('/metric-details', json=body).status_code == 400
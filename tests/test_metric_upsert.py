@@ -0,0 +1,101 @@
+# C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/tests/test_metric_upsert.py
+
+import csv
+import io
+import pytest
+from app.services import database as db_service
+
+HEADER = "name,type,description,expiration\n"
+
+
+def _upsert(text):
+    report, added, updated, unchanged, errors = db_service.bulk_upsert_metrics_from_csv(
+        'glean', io.BytesIO((HEADER + text).encode('utf-8')), 1)
+    statuses = [row[-1] for row in list(csv.reader(io.StringIO(report)))[1:]]
+    return statuses, (added, updated, unchanged, errors)
+
+
+def _stored(conn):
+    return {row[0]: tuple(row[1:]) for row in conn.execute(
+        "SELECT glean_name, metric_type, description, expiration FROM glean_metrics")}
+
+
+@pytest.fixture
+def stored(conn):
+    conn.execute("""
+        INSERT INTO glean_metrics (glean_name, metric_type, description, expiration)
+        VALUES ('a.glean.x', 'counter', 'Counts things', '2027-01-01')
+    """)
+    conn.commit()
+    return conn
+
+
+def test_adds_updates_and_leaves_current_metrics_alone(stored):
+    statuses, counts = _upsert(
+        'a.glean.new,event,Fresh,never\n'
+        'a.glean.x,counter,Counts things,2027-01-01\n'
+        'a.glean.x,counter,Counts more things,2027-01-01\n'
+    )
+    assert statuses == ["Added", "Unchanged", "Updated"]
+    assert counts == (1, 1, 1, 0)
+    assert _stored(stored) == {
+        'a.glean.new': ('event', 'Fresh', 'never'),
+        'a.glean.x': ('counter', 'Counts more things', '2027-01-01'),
+    }
+
+
+@pytest.mark.parametrize('cells', [',,', '  ,  ,  ', ',\t,'])
+def test_blank_cells_keep_the_stored_values(stored, cells):
+    statuses, counts = _upsert(f'a.glean.x,{cells}\n')
+    assert statuses == ["Unchanged"]
+    assert counts == (0, 0, 1, 0)
+    assert _stored(stored)['a.glean.x'] == ('counter', 'Counts things', '2027-01-01')
+
+
+def test_only_the_filled_cells_are_updated(stored):
+    _upsert('a.glean.x, ,New description, \n')
+    assert _stored(stored)['a.glean.x'] == ('counter', 'New description', '2027-01-01')
+
+
+def test_several_names_per_row_and_invalid_names(stored):
+    statuses, counts = _upsert('"a.glean.x, a.glean.y, not-a-metric",counter,,\nnot-a-metric,counter,,\n')
+    assert statuses == [
+        "Success: 1 added, 1 unchanged. (Skipped invalid: not-a-metric)",
+        "Error: No valid metric names found in 'not-a-metric'.",
+    ]
+    assert counts == (1, 0, 1, 1)
+    assert _stored(stored)['a.glean.y'] == ('counter', None, None)
+
+
+def test_insert_import_keeps_not_defined_for_a_blank_expiration(conn):
+    db_service.bulk_import_metrics_from_csv('glean', io.BytesIO(f"{HEADER}a.glean.z,counter,  ,  \n".encode()), 1)
+    assert _stored(conn)['a.glean.z'] == ('counter', None, 'Not defined')
+
+
+def test_failed_import_is_rolled_back(conn, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("fingerprint write failed")
+    monkeypatch.setattr(db_service, '_record_fingerprints', fail)
+
+    _, inserted, _, errors, _ = db_service.bulk_import_metrics_from_csv(
+        'glean', io.BytesIO(f"{HEADER}a.glean.z,counter,,\n".encode()), 1)
+    assert (inserted, errors) == (0, 1)
+    assert _stored(conn) == {}
+    assert conn.execute("SELECT COUNT(*) FROM edit_history WHERE action = 'bulk_add_glean'").fetchone()[0] == 0
+
+
+def test_deleted_metrics_are_restored(stored):
+    stored.execute("UPDATE glean_metrics SET is_deleted = TRUE")
+    stored.commit()
+
+    statuses, counts = _upsert('"a.glean.x, a.glean.new",,Restored description,\n')
+    assert statuses == ["Success: 1 added, 1 restored."]
+    assert counts == (2, 0, 0, 0)
+    assert _stored(stored)['a.glean.x'] == ('counter', 'Restored description', '2027-01-01')
+    assert stored.execute("SELECT COUNT(*) FROM glean_metrics WHERE is_deleted = TRUE").fetchone()[0] == 0
+
+    # Restored even when the file matches the stored definition.
+    stored.execute("UPDATE glean_metrics SET is_deleted = TRUE WHERE glean_name = 'a.glean.x'")
+    stored.commit()
+    assert _upsert('a.glean.x,counter,Restored description,2027-01-01\n') == (["Restored"], (1, 0, 0, 0))
+    assert stored.execute("SELECT is_deleted FROM glean_metrics WHERE glean_name = 'a.glean.x'").fetchone()[0] == 0
@@ -0,0 +1,65 @@
+# C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/tests/test_metrics_pages.py
+
+import pytest
+
+
+@pytest.fixture
+def seeded(conn):
+    conn.executescript("""
+        INSERT INTO glean_metrics (glean_name, metric_type, expiration) VALUES
+            ('a.glean.b', 'counter', '2026'), ('a.glean.a', 'event', '2027'),
+            ('a.glean.c', 'counter', '2025'), ('a.glean.gone', 'counter', NULL);
+        UPDATE glean_metrics SET is_deleted = TRUE WHERE glean_name = 'a.glean.gone';
+        INSERT INTO legacy_metrics (legacy_name, metric_type) VALUES ('b.telemetry.z', 'scalar');
+        INSERT INTO coverage (tc_id) VALUES ('101'), ('102'), ('900');
+        INSERT INTO coverage_to_metric_link (coverage_id, metric_name, metric_type, region, engine) VALUES
+            (1, 'a.glean.a', 'Glean', 'US', 'google'),
+            (2, 'a.glean.a', 'Glean', 'DE', 'bing'),
+            (1, 'a.glean.b', 'Glean', 'US', 'bing'),
+            (2, 'b.telemetry.z', 'Legacy', 'FR', 'google'),
+            (3, 'a.glean.c', 'Glean', 'US', 'google');
+        INSERT INTO exceptions (tc_id) VALUES ('900');
+    """)
+    conn.commit()
+    return conn
+
+
+def _page(client, table, query=''):
+    response = client.get(f'/metrics/data/{table}?{query}')
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()
+
+
+def _names(page, key):
+    return [item[key] for item in page['items']]
+
+
+def test_coverage_pages_filters_and_sort(seeded, client):
+    # a.glean.c is only covered by an excepted TCID.
+    page = _page(client, 'coverage', 'per_page=2')
+    assert (page['total'], page['total_pages'], _names(page, 'metric_name')) == (3, 2, ['a.glean.a', 'a.glean.b'])
+    assert _names(_page(client, 'coverage', 'per_page=2&page=9'), 'metric_name') == ['b.telemetry.z']
+
+    assert _names(_page(client, 'coverage', 'engine=BING'), 'metric_name') == ['a.glean.a', 'a.glean.b']
+    assert _names(_page(client, 'coverage', 'metric_type=legacy'), 'metric_name') == ['b.telemetry.z']
+    assert _names(_page(client, 'coverage', 'search=102'), 'metric_name') == ['a.glean.a', 'b.telemetry.z']
+    page = _page(client, 'coverage', 'sort=tcid_count&direction=desc')
+    assert [(item['metric_name'], item['tcid_count']) for item in page['items']][0] == ('a.glean.a', 2)
+
+
+def test_definition_pages(seeded, client):
+    assert _names(_page(client, 'glean'), 'name') == ['a.glean.a', 'a.glean.b', 'a.glean.c']
+    assert _names(_page(client, 'glean', 'sort=expiration&direction=desc'), 'name') == ['a.glean.a', 'a.glean.b', 'a.glean.c']
+    assert _names(_page(client, 'glean', 'metric_type=count'), 'name') == ['a.glean.b', 'a.glean.c']
+    assert _names(_page(client, 'glean', 'region=us'), 'name') == ['a.glean.a', 'a.glean.b']
+    assert _names(_page(client, 'legacy', 'search=TELEMETRY'), 'name') == ['b.telemetry.z']
+
+
+def test_page_size_is_capped(seeded, client, app):
+    app.config['METRICS_MAX_PAGE_SIZE'] = 2
+    assert _page(client, 'glean', 'per_page=500')['per_page'] == 2
+
+
+def test_invalid_requests(seeded, client):
+    assert client.get('/metrics/data/coverage?sort=password').status_code == 400
+    assert client.get('/metrics/data/users').status_code == 404
@@ -0,0 +1,58 @@
+# C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/tests/test_probe_catalogue.py
+
+import csv
+import io
+import pytest
+from app.services import extraction
+from app.services import database as db_service
+
+INDEX = {'a.glean.x': 'Glean', 'b.telemetry.z': 'Legacy', 'c.both.m': 'Glean/Legacy'}
+
+
+@pytest.fixture
+def catalogue(conn):
+    conn.executescript("""
+        INSERT INTO glean_metrics (glean_name, metric_type) VALUES ('a.glean.x', 'counter'), ('c.both.m', 'event');
+        INSERT INTO glean_metrics (glean_name, metric_type, is_deleted) VALUES ('d.glean.gone', 'counter', TRUE);
+        INSERT INTO legacy_metrics (legacy_name, metric_type) VALUES ('b.telemetry.z', 'scalar'), ('c.both.m', 'scalar');
+    """)
+    conn.commit()
+    return conn
+
+
+def _rows(chunks):
+    return list(csv.reader(io.StringIO(''.join(chunks))))
+
+
+def test_classify_probes():
+    assert extraction.classify_probes({'c.both.m', 'x.unknown.y', 'a.glean.x'}, INDEX) == (
+        "a.glean.x (Glean), c.both.m (Glean/Legacy)", "x.unknown.y")
+    assert extraction.classify_probes(set(), INDEX) == ("N/A", "N/A")
+
+
+def test_classify_rotation_metrics_needs_the_listed_type():
+    names = ['a.glean.x', 'b.telemetry.z', 'c.both.m', 'x.unknown.y']
+    assert extraction.classify_rotation_metrics(names, 'Glean', INDEX) == (
+        "a.glean.x, c.both.m", "b.telemetry.z (Legacy), x.unknown.y")
+    assert extraction.classify_rotation_metrics(names, 'Legacy', INDEX) == (
+        "b.telemetry.z, c.both.m", "a.glean.x (Glean), x.unknown.y")
+
+
+def test_metric_name_index_skips_deleted_metrics(catalogue):
+    assert db_service.get_metric_name_index() == INDEX
+
+
+def test_probe_extraction_lists_known_and_unknown_probes(catalogue):
+    rows = _rows(db_service.extract_probes_from_csv(
+        io.BytesIO(b"ID,Title\n1,Check a.glean.x and d.glean.gone\n2,Nothing here\n")))
+    assert rows[0][-2:] == ["Known Probes", "Unknown Probes"]
+    assert rows[1][-2:] == ["a.glean.x (Glean)", "d.glean.gone"]
+    assert rows[2][-2:] == ["N/A", "N/A"]
+
+
+def test_rotation_extraction_lists_known_and_unknown_metrics(catalogue):
+    rows = _rows(db_service.extract_from_rotation_csv(io.BytesIO(
+        b'tcsid,title,rotation\n1,US google,"legacy, b.telemetry.z, a.glean.x"\n2,DE,no type\n')))
+    assert rows[0][-2:] == ["Known Metrics", "Unknown Metrics"]
+    assert rows[1][3:] == ["US", "google", "Legacy", "b.telemetry.z, a.glean.x", "b.telemetry.z", "a.glean.x (Glean)"]
+    assert rows[2][3:] == ["DE", "N/A", "N/A", "N/A", "N/A", "N/A"]
@@ -0,0 +1,51 @@
+# C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/tests/test_query_plans.py
+
+import pytest
+from app.commands import QUERY_PLAN_CHECKS, _FULL_SCAN_REGEX, _seed_plan_check_db, run_query_plan_check
+
+
+@pytest.fixture
+def app(app):
+    # Every check must actually run its queries.
+    app.config['CACHE_MAX_ENTRIES'] = 0
+    return app
+
+
+@pytest.fixture
+def seeded_conn(conn):
+    _seed_plan_check_db(conn)
+    return conn
+
+
+@pytest.mark.parametrize('name, call', QUERY_PLAN_CHECKS, ids=[name for name, _ in QUERY_PLAN_CHECKS])
+def test_read_service_uses_indexes(seeded_conn, name, call):
+    statement_count, failures = run_query_plan_check(seeded_conn, name, call)
+    assert statement_count > 0
+    assert not failures, "\n".join(
+        f"full scan of {', '.join(scans)}: {' '.join(sql.split())}" for sql, scans, _ in failures)
+
+
+def test_full_scan_is_reported(seeded_conn):
+    # Guards against a plan format the scan check no longer recognises, which would pass every check.
+    _, failures = run_query_plan_check(seeded_conn, 'unindexed', lambda db: db.get_db().execute(
+        "SELECT * FROM coverage_to_metric_link l WHERE l.region || '' = 'US'").fetchall())
+    assert [scans for _, scans, _ in failures] == [['coverage_to_metric_link']]
+
+
+@pytest.mark.parametrize('detail, table', [
+    ('SCAN l', 'l'),
+    ('SCAN coverage_to_metric_link', 'coverage_to_metric_link'),
+    ('SCAN TABLE coverage_to_metric_link AS l', 'coverage_to_metric_link'),
+    ('SCAN TABLE planning', 'planning'),
+])
+def test_full_scan_regex_matches_old_and_new_formats(detail, table):
+    assert _FULL_SCAN_REGEX.match(detail).group(1) == table
+
+
+@pytest.mark.parametrize('detail', [
+    'SCAN l USING INDEX idx_link_metric',
+    'SCAN TABLE planning USING COVERING INDEX idx_planning_metric_active',
+    'SEARCH c USING INTEGER PRIMARY KEY (rowid=?)',
+])
+def test_full_scan_regex_ignores_index_scans(detail):
+    assert _FULL_SCAN_REGEX.match(detail) is None
@@ -0,0 +1,56 @@
+# C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/tests/test_read_cache.py
+
+import pytest
+from flask import g
+from app.services import database as db_service
+from app.utils import cache
+
+
+@pytest.fixture
+def seeded(conn):
+    conn.execute("INSERT INTO glean_metrics (glean_name, metric_type) VALUES ('a.glean.x', 'counter')")
+    conn.commit()
+    return conn
+
+
+def test_results_are_served_until_a_write_changes_the_version(seeded):
+    assert db_service.get_metric_page_counts()['glean'] == 1
+
+    # Not written through the writer: the version is unchanged, so the cached count stays.
+    seeded.execute("INSERT INTO glean_metrics (glean_name, metric_type) VALUES ('a.glean.y', 'counter')")
+    seeded.commit()
+    g.pop('data_version', None)
+    assert db_service.get_metric_page_counts()['glean'] == 1
+
+    # Any write through the writer bumps the version, and the request re-reads it.
+    assert db_service.add_supported_engine('startpage', 1)
+    assert db_service.get_metric_page_counts()['glean'] == 2
+
+
+def test_cache_is_bounded(seeded, app):
+    app.config['CACHE_MAX_ENTRIES'] = 2
+    cache.clear_cache()
+    for page in (1, 2, 3):
+        db_service.get_coverage_page(page=page)
+    assert len(cache._cache) == 2
+
+
+def test_disabled_cache_reads_every_time(seeded, app):
+    app.config['CACHE_MAX_ENTRIES'] = 0
+    assert db_service.get_metric_page_counts()['glean'] == 1
+    seeded.execute("INSERT INTO glean_metrics (glean_name, metric_type) VALUES ('a.glean.y', 'counter')")
+    seeded.commit()
+    assert db_service.get_metric_page_counts()['glean'] == 2
+
+
+def test_conditional_get(seeded, client):
+    first = client.get('/metrics/data/glean')
+    etag = first.headers['ETag'].strip('"')
+    assert client.get('/metrics/data/glean', headers={'If-None-Match': f'"{etag}"'}).status_code == 304
+    # Another URL has its own tag.
+    assert client.get('/metrics/data/legacy', headers={'If-None-Match': f'"{etag}"'}).status_code == 200
+
+    assert db_service.soft_delete_item('glean_metrics', 'a.glean.x', 1)
+    changed = client.get('/metrics/data/glean', headers={'If-None-Match': f'"{etag}"'})
+    assert changed.status_code == 200
+    assert changed.get_json()['total'] == 0
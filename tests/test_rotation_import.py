@@ -0,0 +1,79 @@
+# C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/tests/test_rotation_import.py
+
+import csv
+import io
+import pytest
+from app.services import database as db_service
+
+ROTATION = (
+    "tcsid,title,rotation\n"
+    'C101,Search in US with Google,"Glean, a.glean.x, a.glean.y"\n'
+    'C102,Search in DE with Bing,"Glean, a.glean.x, a.glean.missing, a.glean.x"\n'
+    'C900,Search in US with Google,"Glean, a.glean.x"\n'
+    'C103,Search in FR with Bing,Nothing listed\n'
+)
+
+
+def _lines(report):
+    return [tuple(line) for line in list(csv.reader(io.StringIO(report)))[1:]]
+
+
+def _links(conn):
+    return {tuple(row) for row in conn.execute("""
+        SELECT c.tc_id, l.metric_name, l.metric_type, l.region, l.engine
+        FROM coverage_to_metric_link l JOIN coverage c ON c.coverage_id = l.coverage_id
+    """)}
+
+
+@pytest.fixture
+def seeded(conn):
+    conn.executescript("""
+        INSERT INTO glean_metrics (glean_name, metric_type) VALUES ('a.glean.x', 'counter'), ('a.glean.y', 'counter');
+        INSERT INTO coverage (tc_id, tcid_title) VALUES ('101', 'Search in US with Google');
+        INSERT INTO coverage_to_metric_link (coverage_id, metric_name, metric_type, region, engine) VALUES
+            (1, 'a.glean.x', 'Glean', 'US', 'google');
+        INSERT INTO exceptions (tc_id) VALUES ('900');
+    """)
+    conn.commit()
+    return conn
+
+
+def _preview():
+    return db_service.preview_rotation_import(io.BytesIO(ROTATION.encode('utf-8')))
+
+
+def test_preview_diffs_against_existing_links_without_writing(seeded):
+    before = _links(seeded)
+    report, counts = _preview()
+    assert [(line[0], line[2], line[4], line[5], line[6]) for line in _lines(report)] == [
+        ('101', 'a.glean.x', 'US', 'google', 'Already present'),
+        ('101', 'a.glean.y', 'US', 'google', 'New'),
+        ('102', 'a.glean.x', 'DE', 'bing', 'New'),
+        ('102', 'a.glean.missing', 'DE', 'bing', 'Invalid metric'),
+        ('900', 'a.glean.x', 'US', 'google', 'Excepted TCID'),
+        ('103', '', 'FR', 'bing', 'Error: The rotation lists no Glean or Legacy metrics.'),
+    ]
+    assert counts == {'new': 2, 'present': 1, 'invalid': 1, 'excepted': 1, 'errors': 1}
+    assert _links(seeded) == before
+
+
+def test_commit_imports_only_new_links(seeded):
+    report, _ = _preview()
+    # Added after the preview; the commit must not import it twice.
+    seeded.execute("""
+        INSERT INTO coverage_to_metric_link (coverage_id, metric_name, metric_type, region, engine)
+        VALUES (1, 'a.glean.y', 'Glean', 'US', 'google')
+    """)
+    seeded.commit()
+
+    result, processed, duplicates, errors = db_service.commit_rotation_import(io.BytesIO(report.encode('utf-8')), 1)
+    assert [line[-1] for line in _lines(result)] == ['Duplicate', 'Success']
+    assert (processed, duplicates, errors) == (1, 1, 0)
+    assert ('102', 'a.glean.x', 'Glean', 'DE', 'bing') in _links(seeded)
+    assert len(_links(seeded)) == 3
+
+
+def test_commit_rejects_a_file_that_is_not_a_preview(seeded):
+    result, processed, _, errors = db_service.commit_rotation_import(io.BytesIO(ROTATION.encode('utf-8')), 1)
+    assert (processed, errors) == (0, 1)
+    assert _lines(result)[-1][1] == "The file is not a rotation import preview."
@@ -0,0 +1,79 @@
+# C:/Users/Adi/PycharmProjects/R-W-TCS/pythonProject/tests/test_search_terms.py
+
+import pytest
+from flask import g
+from app.services import database as db_service
+
+
+def _recomputed(conn):
+    """The vocabulary as the v5 backfill computes it."""
+    return {tuple(row) for row in conn.execute("""
+        SELECT 'glean', glean_name, lower(glean_name), 1 FROM glean_metrics WHERE is_deleted = FALSE
+        UNION ALL
+        SELECT 'legacy', legacy_name, lower(legacy_name), 1 FROM legacy_metrics WHERE is_deleted = FALSE
+        UNION ALL
+        SELECT 'tcid', tc_id, lower(tc_id), 1 FROM coverage WHERE is_deleted = FALSE
+        UNION ALL
+        SELECT 'region', region, lower(region), COUNT(*) FROM coverage_to_metric_link
+        WHERE is_deleted = FALSE AND region IS NOT NULL GROUP BY region
+        UNION ALL
+        SELECT 'engine', engine, lower(engine), COUNT(*) FROM coverage_to_metric_link
+        WHERE is_deleted = FALSE AND engine IS NOT NULL GROUP BY engine
+    """)}
+
+
+def _maintained(conn):
+    return {tuple(row) for row in conn.execute(
+        "SELECT kind, term, term_key, ref_count FROM search_terms WHERE ref_count > 0")}
+
+
+@pytest.fixture
+def seeded(conn):
+    conn.executescript("""
+        INSERT INTO glean_metrics (glean_name, metric_type) VALUES ('Search.Glean.X', 'counter'), ('search.glean.y', 'counter');
+        INSERT INTO legacy_metrics (legacy_name, metric_type) VALUES ('browser.telemetry.z', 'scalar');
+        INSERT INTO coverage (tc_id) VALUES ('101'), ('102');
+        INSERT INTO coverage_to_metric_link (coverage_id, metric_name, metric_type, region, engine) VALUES
+            (1, 'Search.Glean.X', 'Glean', 'US', 'google'),
+            (1, 'search.glean.y', 'Glean', 'US', 'bing'),
+            (2, 'search.glean.y', 'Glean', 'DE', NULL);
+    """)
+    conn.commit()
+    return conn
+
+
+CHANGES = [
+    "INSERT INTO glean_metrics (glean_name, metric_type) VALUES ('search.glean.new', 'counter')",
+    "UPDATE glean_metrics SET glean_name = 'search.glean.renamed' WHERE glean_name = 'search.glean.new'",
+    "UPDATE glean_metrics SET is_deleted = TRUE WHERE glean_name = 'search.glean.y'",
+    "UPDATE glean_metrics SET is_deleted = FALSE WHERE glean_name = 'search.glean.y'",
+    "DELETE FROM legacy_metrics WHERE legacy_name = 'browser.telemetry.z'",
+    "UPDATE coverage SET tc_id = '103' WHERE tc_id = '102'",
+    "UPDATE coverage SET is_deleted = TRUE WHERE tc_id = '101'",
+    "DELETE FROM coverage WHERE tc_id = '103'",
+    "UPDATE coverage_to_metric_link SET region = 'FR' WHERE link_id = 1",
+    "UPDATE coverage_to_metric_link SET engine = NULL WHERE link_id = 2",
+    "UPDATE coverage_to_metric_link SET is_deleted = TRUE WHERE link_id = 1",
+    "DELETE FROM coverage_to_metric_link WHERE link_id = 2",
+]
+
+
+def test_vocabulary_matches_recomputation_after_each_change(seeded):
+    assert _maintained(seeded) == _recomputed(seeded)
+    for sql in CHANGES:
+        seeded.execute(sql)
+        seeded.commit()
+        assert _maintained(seeded) == _recomputed(seeded), sql
+
+
+def test_suggestions_match_prefixes_case_insensitively(seeded):
+    assert db_service.get_search_suggestions('search.g') == ['Search.Glean.X', 'search.glean.y']
+    assert db_service.get_search_suggestions('U', 'region') == ['US']
+
+    # Written outside the writer, so the data version is bumped by hand (and re-read) to drop cached suggestions.
+    seeded.execute("UPDATE glean_metrics SET is_deleted = TRUE WHERE glean_name = 'search.glean.y'")
+    seeded.execute("UPDATE data_version SET version = version + 1")
+    seeded.commit()
+    g.pop('data_version', None)
+    assert db_service.get_search_suggestions('search.g') == ['Search.Glean.X']
+    assert db_service.get_search_suggestions('SEARCH.G') == ['Search.Glean.X']